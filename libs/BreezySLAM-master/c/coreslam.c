@@ -124,7 +124,7 @@ static void interpolate_scan(scan_t * scan, float * lidar_angles_deg, int * lida
 
 /* Local helpers--------------------------------------------------- */
 
-static void * safe_malloc(size_t size)
+void * safe_malloc(size_t size)
 {
     void * v = malloc(size);
     
@@ -303,6 +303,233 @@ static void
 }
 
 
+/* Inclusive rows and columns of the map that a map update may write */
+typedef struct map_region_t
+{
+    int row_min;
+    int row_max;
+    int col_min;
+    int col_max;
+
+} map_region_t;
+
+/* One step of the obstacle profile drawn around the scanned point: the pixel
+   value ramps from NO_OBSTACLE to the scan value over derrorv pixels, then
+   back over the next derrorv pixels (the hole width). */
+static void
+        ray_profile_step(
+        int x,
+        int peak,
+        int derrorv,
+        int incv,
+        int incerrorv,
+        int sincv,
+        int * pixval,
+        int * errorv)
+{
+    if (x <= peak)
+    {
+        *pixval += incv;
+        *errorv += incerrorv;
+        if (*errorv > derrorv)
+        {
+            *pixval += sincv;
+            *errorv -= derrorv;
+        }
+    }
+    else
+    {
+        *pixval -= incv;
+        *errorv -= incerrorv;
+        if (*errorv < 0)
+        {
+            *pixval -= sincv;
+            *errorv += derrorv;
+        }
+    }
+}
+
+/* Same pixels and values as map_laser_ray(), restricted to the rows and
+   columns of region.  Rays that miss the region are rejected from their
+   extent; rays entirely inside it run without per-pixel bounds checks; the
+   stretch before the obstacle profile, where the value is constant, runs
+   without the profile arithmetic.  On tiled maps the pointer cannot simply
+   step by rows and columns, so every pixel's offset is computed. */
+static void
+        map_laser_ray_region(
+        map_t * map,
+        int x1,
+        int y1,
+        int x2,
+        int y2,
+        int xp,
+        int yp,
+        int value,
+        int alpha,
+        const map_region_t * region)
+{
+    pixel_t * map_pixels = map->pixels;
+    int map_size = map->size_pixels;
+    int x2c = x2;
+    int y2c = y2;
+    
+    if (out_of_bounds(x1, map_size) || out_of_bounds(y1, map_size))
+    {
+        return;
+    }
+    
+    if (clip(&x2c, &y2c, x1, y1, map_size) || clip(&y2c, &x2c, y1, x1, map_size))
+    {
+        return;
+    }
+    
+    int col_lo = (x1 < x2c) ? x1 : x2c;
+    int col_hi = (x1 < x2c) ? x2c : x1;
+    int row_lo = (y1 < y2c) ? y1 : y2c;
+    int row_hi = (y1 < y2c) ? y2c : y1;
+    
+    if (row_hi < region->row_min || row_lo > region->row_max ||
+        col_hi < region->col_min || col_lo > region->col_max)
+    {
+        return;
+    }
+    
+    int inside = !map->tile_shift &&
+        row_lo >= region->row_min && row_hi <= region->row_max &&
+        col_lo >= region->col_min && col_hi <= region->col_max;
+    
+    int dx = abs(x2 - x1);
+    int dy = abs(y2 - y1);
+    int dxc = abs(x2c - x1);
+    int dyc = abs(y2c - y1);
+    int stepcol = (x2 > x1) ? 1 : -1;
+    int steprow = (y2 > y1) ? 1 : -1;
+    int sincv = (value > NO_OBSTACLE) ? 1 : -1;
+    
+    /* Major (one pixel per iteration) and minor (on error) steps, as column and row increments */
+    int majcol = stepcol, majrow = 0, mincol = 0, minrow = steprow;
+    int derrorv = 0;
+    
+    if (dx > dy)
+    {
+        derrorv = abs(xp - x2);
+    }
+    else
+    {
+        swap(&dx, &dy);
+        swap(&dxc, &dyc);
+        majcol = 0;
+        majrow = steprow;
+        mincol = stepcol;
+        minrow = 0;
+        derrorv = abs(yp - y2);
+    }
+    
+    if (!derrorv)
+    {   /* XXX should probably throw an exception */
+        fprintf(stderr, "map_update: No error gradient: try increasing hole width\n");
+        exit(1);
+    }
+    
+    int error = 2 * dyc - dxc;
+    int horiz = 2 * dyc;
+    int diago = 2 * (dyc - dxc);
+    int errorv = derrorv / 2;
+    
+    int incv = (value - NO_OBSTACLE) / derrorv;
+    int incerrorv = value - NO_OBSTACLE - derrorv * incv;
+    
+    int incmajor = majrow * map_size + majcol;
+    int incminor = minrow * map_size + mincol;
+    
+    int beta = 256 - alpha;
+    int peak = dx - derrorv;
+    int flat_end = dx - 2 * derrorv;   /* pixval stays NO_OBSTACLE up to here */
+    if (flat_end > dxc)
+    {
+        flat_end = dxc;
+    }
+    
+    pixel_t * ptr = map_pixels + y1 * map_size + x1;
+    int pixval = NO_OBSTACLE;
+    int x = 0;
+    
+    if (inside)
+    {
+        int flat = alpha * NO_OBSTACLE;
+        
+        for (x = 0; x <= flat_end; x++, ptr += incmajor)
+        {
+            *ptr = (beta * (*ptr) + flat) >> 8;
+            
+            if (error > 0)
+            {
+                ptr += incminor;
+                error += diago;
+            } else
+            {
+                error += horiz;
+            }
+        }
+        
+        for (; x <= dxc; x++, ptr += incmajor)
+        {
+            ray_profile_step(x, peak, derrorv, incv, incerrorv, sincv, &pixval, &errorv);
+            
+            *ptr = (beta * (*ptr) + alpha * pixval) >> 8;
+            
+            if (error > 0)
+            {
+                ptr += incminor;
+                error += diago;
+            } else
+            {
+                error += horiz;
+            }
+        }
+    }
+    
+    else
+    {
+        int row = y1;
+        int col = x1;
+        
+        for (x = 0; x <= dxc; x++, ptr += incmajor, row += majrow, col += majcol)
+        {
+            if (x > flat_end)
+            {
+                ray_profile_step(x, peak, derrorv, incv, incerrorv, sincv, &pixval, &errorv);
+            }
+            
+            if (row >= region->row_min && row <= region->row_max &&
+                col >= region->col_min && col <= region->col_max)
+            {
+                pixel_t * pixel = map->tile_shift ? map_pixels + map_pixel_offset(map, col, row) : ptr;
+                *pixel = (beta * (*pixel) + alpha * pixval) >> 8;
+            }
+            
+            /* Rows and columns only move one way: stop once past the region */
+            else if ((steprow > 0 ? row > region->row_max : row < region->row_min) ||
+                     (stepcol > 0 ? col > region->col_max : col < region->col_min))
+            {
+                break;
+            }
+            
+            if (error > 0)
+            {
+                ptr += incminor;
+                row += minrow;
+                col += mincol;
+                error += diago;
+            } else
+            {
+                error += horiz;
+            }
+        }
+    }
+}
+
+
 static void
         scan_update_xy(
         scan_t * scan,
@@ -351,19 +578,42 @@ void
         int size_pixels,
         double size_meters)
 {
-    int npix = size_pixels * size_pixels;
+    map_init_tiled(map, size_pixels, size_meters, 0);
+}
+
+void
+        map_init_tiled(
+        map_t * map,
+        int size_pixels,
+        double size_meters,
+        int tile_size)
+{
+    int tile_shift = 0;
+    while ((2 << tile_shift) <= tile_size)
+    {
+        tile_shift++;
+    }
+    
+    /* Tiled maps are padded to a whole number of tiles per side */
+    int tile = 1 << tile_shift;
+    int tiles_per_row = (size_pixels + tile - 1) >> tile_shift;
+    int side = tiles_per_row << tile_shift;
+    int npix = side * side;
 
     int k = 0;
     
-    map->pixels = (pixel_t *)safe_malloc(npix * sizeof(pixel_t));
+    /* One spare pixel keeps the 32-bit gathers of the SIMD kernels in bounds */
+    map->pixels = (pixel_t *)safe_malloc((npix + 1) * sizeof(pixel_t));
     
-    for (k=0; k<npix; ++k)
+    for (k=0; k<=npix; ++k)
     {
         map->pixels[k] = (OBSTACLE + NO_OBSTACLE) / 2;
     }
     
     map->size_pixels = size_pixels;
     map->size_meters = size_meters;
+    map->tile_shift = tile_shift;
+    map->tiles_per_row = tiles_per_row;
     
     /* precompute scale for efficiency */
     map->scale_pixels_per_mm =  size_pixels / (size_meters * 1000);
@@ -382,6 +632,44 @@ void map_string(
 {
     sprintf(str, "size = %d x %d pixels | = %f meters",
             map.size_pixels, map.size_pixels, map.size_meters);
+    
+    if (map.tile_shift)
+    {
+        sprintf(str + strlen(str), " | %d x %d tiles", 1 << map.tile_shift, 1 << map.tile_shift);
+    }
+}
+
+/* Endpoints of the laser ray for scan point i, in map pixels, following the
+   original CoreSLAM construction: the ray runs from the robot through the
+   scanned point (xp, yp) and extends hole_width_mm / 2 beyond it. */
+static void
+        scan_point_ray(
+        map_t * map,
+        scan_t * scan,
+        position_t position,
+        double costheta,
+        double sintheta,
+        double hole_width_mm,
+        int i,
+        int * x2,
+        int * y2,
+        int * xp,
+        int * yp)
+{
+    double x2p = costheta * scan->x_mm[i] - sintheta * scan->y_mm[i];
+    double y2p = sintheta * scan->x_mm[i] + costheta * scan->y_mm[i];
+    
+    *xp = roundup((position.x_mm + x2p) * map->scale_pixels_per_mm);
+    *yp = roundup((position.y_mm + y2p) * map->scale_pixels_per_mm);
+    
+    double dist = sqrt(x2p * x2p + y2p * y2p);
+    double add = hole_width_mm / 2 / dist;
+    
+    x2p *= map->scale_pixels_per_mm * (1 + add);
+    y2p *= map->scale_pixels_per_mm * (1 + add);
+    
+    *x2 = roundup(position.x_mm * map->scale_pixels_per_mm + x2p);
+    *y2 = roundup(position.y_mm * map->scale_pixels_per_mm + y2p);
 }
 
 void
@@ -392,6 +680,76 @@ void
         int map_quality,
         double hole_width_mm)
 {
+    map_update_region(map, scan, position, map_quality, hole_width_mm,
+        0, map->size_pixels - 1, 0, map->size_pixels - 1);
+}
+
+void
+        map_update_region(
+        map_t * map,
+        scan_t * scan,
+        position_t position,
+        int map_quality,
+        double hole_width_mm,
+        int row_min,
+        int row_max,
+        int col_min,
+        int col_max)
+{
+    map_region_t region;
+    
+    region.row_min = (row_min < 0) ? 0 : row_min;
+    region.row_max = (row_max >= map->size_pixels) ? map->size_pixels - 1 : row_max;
+    region.col_min = (col_min < 0) ? 0 : col_min;
+    region.col_max = (col_max >= map->size_pixels) ? map->size_pixels - 1 : col_max;
+    
+    if (region.row_min > region.row_max || region.col_min > region.col_max)
+    {
+        return;
+    }
+    
+    double position_theta_radians = radians(position.theta_degrees);
+    double costheta = cos(position_theta_radians);
+    double sintheta = sin(position_theta_radians);
+    
+    int x1 = roundup(position.x_mm * map->scale_pixels_per_mm);
+    int y1 = roundup(position.y_mm * map->scale_pixels_per_mm);
+    
+    int i = 0;
+    for (i = 0; i != scan->npoints; i++)
+    {        
+        int x2 = 0, y2 = 0, xp = 0, yp = 0;
+        
+        scan_point_ray(map, scan, position, costheta, sintheta, hole_width_mm, i, &x2, &y2, &xp, &yp);
+        
+        int value = OBSTACLE;
+        int q = map_quality;
+        
+        if (scan->value[i] == NO_OBSTACLE)
+        {
+            q = map_quality / 4;
+            value = NO_OBSTACLE;
+        }
+        
+        map_laser_ray_region(map, x1, y1, x2, y2, xp, yp, value, q, &region);
+    }
+}
+
+/* The original CoreSLAM map update, kept as the reference for benchmarks and
+   regression checks of map_update() */
+void
+        map_update_reference(
+        map_t * map,
+        scan_t * scan,
+        position_t position,
+        int map_quality,
+        double hole_width_mm)
+{
+    if (map->tile_shift)
+    {
+        map_update(map, scan, position, map_quality, hole_width_mm);
+        return;
+    }
     
     double position_theta_radians = radians(position.theta_degrees);
     double costheta = cos(position_theta_radians);
@@ -439,6 +797,20 @@ void
         char * bytes)
 {
     int k;
+    
+    if (map->tile_shift)
+    {
+        int x, y;
+        for (y=0, k=0; y<map->size_pixels; ++y)
+        {
+            for (x=0; x<map->size_pixels; ++x, ++k)
+            {
+                bytes[k] = map->pixels[map_pixel_offset(map, x, y)] >> 8;
+            }
+        }
+        return;
+    }
+    
     for (k=0; k<map->size_pixels*map->size_pixels; ++k)
     {
         bytes[k] = map->pixels[k] >> 8;
@@ -452,6 +824,22 @@ void
         char * bytes)
 {
     int k;
+    
+    if (map->tile_shift)
+    {
+        int x, y;
+        for (y=0, k=0; y<map->size_pixels; ++y)
+        {
+            for (x=0; x<map->size_pixels; ++x, ++k)
+            {
+                pixel_t * pixel = &map->pixels[map_pixel_offset(map, x, y)];
+                *pixel = bytes[k];
+                *pixel <<= 8;
+            }
+        }
+        return;
+    }
+    
     for (k=0; k<map->size_pixels*map->size_pixels; ++k)
     {
         map->pixels[k] = bytes[k];
@@ -582,15 +970,36 @@ scan_update(
     }
 }
 
+void
+        distance_scan_to_map_batch(
+        map_t *  map,
+        scan_t * scan,
+        const double * poses,
+        int count,
+        int * distances)
+{
+    int k = 0;
+    for (k=0; k<count; ++k)
+    {
+        position_t position;
+        position.x_mm = poses[3*k];
+        position.y_mm = poses[3*k+1];
+        position.theta_degrees = poses[3*k+2];
+        
+        distances[k] = distance_scan_to_map(map, scan, position);
+    }
+}
+
 position_t
-        rmhc_position_search(
+        rmhc_climb(
         position_t start_pos,
         map_t * map,
         scan_t * scan,
         double sigma_xy_mm,
         double sigma_theta_degrees,
         int max_search_iter,
-        void * randomizer)
+        void * randomizer,
+        int * lowest_distance_out)
 {
     position_t currentpos = start_pos;
     position_t bestpos = start_pos;
@@ -638,5 +1047,23 @@ position_t
         
     }
     
+    *lowest_distance_out = lowest_distance;
+    
     return bestpos;
 }
+
+position_t
+        rmhc_position_search(
+        position_t start_pos,
+        map_t * map,
+        scan_t * scan,
+        double sigma_xy_mm,
+        double sigma_theta_degrees,
+        int max_search_iter,
+        void * randomizer)
+{
+    int lowest_distance = 0;
+    
+    return rmhc_climb(start_pos, map, scan, sigma_xy_mm, sigma_theta_degrees, 
+        max_search_iter, randomizer, &lowest_distance);
+}
@@ -50,8 +50,34 @@ typedef struct map_t {
     
     double scale_pixels_per_mm;
     
+    /* Memory layout of pixels: row-major when tile_shift is 0; otherwise
+       square tiles of (1 << tile_shift) pixels per side, stored one after the
+       other in row-major tile order, each tile row-major inside.  Pixel (x, y)
+       lives at map_pixel_offset(map, x, y).  map_get() and map_set() always
+       exchange row-major bytes. */
+    int tile_shift;
+    int tiles_per_row;
+    
 } map_t;
 
+/* Offset of pixel (x, y) in map->pixels */
+static inline int
+map_pixel_offset(
+    const map_t * map,
+    int x,
+    int y)
+{
+    int shift = map->tile_shift;
+    int mask = (1 << shift) - 1;
+    
+    if (!shift)
+    {
+        return y * map->size_pixels + x;
+    }
+    
+    return ((((y >> shift) * map->tiles_per_row + (x >> shift)) << shift) + (y & mask)) << shift | (x & mask);
+}
+
 
 typedef struct scan_t
 {
@@ -99,6 +125,16 @@ map_init(
     int size_pixels, 
     double size_meters);
 
+/* Like map_init(), with the pixels stored in square tiles of tile_size pixels
+   per side (a power of two, e.g. 8) instead of row-major; 0 or 1 means row-major.
+   Tiles keep the points of a scan that spans many rows in fewer cache lines. */
+void 
+map_init_tiled(
+    map_t * map, 
+    int size_pixels, 
+    double size_meters,
+    int tile_size);
+
 void
 map_free(
     map_t * map);
@@ -115,6 +151,43 @@ map_update(
     int map_quality, 
     double hole_width_mm);
 
+/* Like map_update(), writing only the pixels in rows row_min..row_max and
+   columns col_min..col_max (inclusive); the pixels written get exactly the
+   values map_update() would give them */
+void
+map_update_region(
+    map_t * map, 
+    scan_t * scan, 
+    position_t position,
+    int map_quality, 
+    double hole_width_mm,
+    int row_min,
+    int row_max,
+    int col_min,
+    int col_max);
+
+/* Splits map_update() across nthreads threads, each writing its own band of
+   rows; the result is identical to map_update().  Without POSIX threads
+   (Windows) it warns once and runs map_update() */
+void
+map_update_parallel(
+    map_t * map, 
+    scan_t * scan, 
+    position_t position,
+    int map_quality, 
+    double hole_width_mm,
+    int nthreads);
+
+/* The original CoreSLAM map update, for benchmarks and regression checks;
+   tiled maps are updated with map_update() */
+void
+map_update_reference(
+    map_t * map, 
+    scan_t * scan, 
+    position_t position,
+    int map_quality, 
+    double hole_width_mm);
+
 void scan_init(
     scan_t * scan, 
     int span,
@@ -161,6 +234,21 @@ distance_scan_to_map(
     position_t position);
 
 
+/* Name of the distance_scan_to_map implementation in use on this host,
+   e.g. "sisd", "neon", "sse3", "avx2" or "avx512" */
+const char *
+distance_scan_to_map_kernel(void);
+
+/* Scores count poses packed as (x_mm, y_mm, theta_degrees) triples, writing
+   one distance per pose into distances; -1 indicates infinity */
+void
+distance_scan_to_map_batch(
+    map_t *  map,
+    scan_t * scan,
+    const double * poses,
+    int count,
+    int * distances);
+
 /* Random-Mutation Hill-Climbing search */
 position_t 
 rmhc_position_search(
@@ -172,6 +260,37 @@ rmhc_position_search(
 	int max_search_iter,
 	void * randomizer);
 
+/* Pool of worker threads for multi-start RMHC search, each climb with its
+   own random-number generator (seeded from seed).  If only some threads can
+   be started the pool is smaller (see rmhc_pool_size); if none can, returns
+   NULL.  Without POSIX threads (Windows) the pool is clamped to one climb */
+typedef struct rmhc_pool_t rmhc_pool_t;
+
+rmhc_pool_t *
+rmhc_pool_new(
+    int nthreads,
+    int seed);
+
+void
+rmhc_pool_free(
+    rmhc_pool_t * pool);
+
+int
+rmhc_pool_size(
+    rmhc_pool_t * pool);
+
+/* Runs one RMHC climb per pool thread, the first from start_pos and the
+   others from randomly perturbed starts, and returns the best position found */
+position_t 
+rmhc_position_search_parallel(
+    rmhc_pool_t * pool,
+    position_t start_pos,
+    map_t * map,
+    scan_t * scan,
+    double sigma_xy_mm,
+    double sigma_theta_degrees,
+    int max_search_iter);
+
 #ifdef __cplusplus 
 }
 #endif
@@ -107,7 +107,7 @@ distance_scan_to_map(
 	    /* Add point if in map bounds */
 	    if (x >= 0 && x < map->size_pixels && y >= 0 && y < map->size_pixels) 
 	    {
-		    sum += map->pixels[y * map->size_pixels + x];
+		    sum += map->pixels[map_pixel_offset(map, x, y)];
 		    npoints++;
 	    }
 	}
@@ -115,3 +115,9 @@ distance_scan_to_map(
 
     return npoints ? (int)(sum * 1024 / npoints) : -1;  
 }
+
+const char *
+distance_scan_to_map_kernel(void)
+{
+    return "neon";
+}
@@ -1,6 +1,11 @@
 /*
 coreslam_i686.c Intel Streaming SIMD Extensions for CoreSLAM
 
+The SSE3 kernel below is the baseline. AVX2 and AVX-512 kernels are compiled
+alongside it with per-function target attributes (GCC/Clang), and
+distance_scan_to_map() picks the best one for the running CPU on first use,
+so a single build runs optimally on every x86 host.
+
 Based on
 
 @InProceedings{,
@@ -37,6 +42,9 @@ typedef __int64 int64_t;       /* Define it from MSVC's internal type */
 #endif
 
 #include <math.h>
+#include <stdlib.h>
+#include <stdio.h>
+#include <string.h>
 
 #include "coreslam.h"
 #include "coreslam_internals.h"
@@ -60,8 +68,8 @@ typedef union
 } cs_pos_mmx_t;
 
 
-int 
-distance_scan_to_map(
+static int 
+distance_scan_to_map_sse3(
     map_t *  map,
     scan_t * scan,
     position_t position)
@@ -105,7 +113,7 @@ distance_scan_to_map(
             /* Add point if in map bounds */
             if (x >= 0 && x < map->size_pixels && y >= 0 && y < map->size_pixels) 
             {
-                sum += map->pixels[y * map->size_pixels + x];
+                sum += map->pixels[map_pixel_offset(map, x, y)];
                 npoints++;
             } 
         }
@@ -115,3 +123,258 @@ distance_scan_to_map(
     return npoints ? (int)(sum * 1024 / npoints) : -1;  
 }
 
+#if defined(__GNUC__) && !defined(_MSC_VER)
+
+#include <immintrin.h>
+
+#define HAVE_WIDE_KERNELS
+
+/* The wide kernels must round exactly like the SSE3 one, or the kernel picked
+   for the CPU would change SLAM results.  With the avx512f target (which
+   implies FMA) GCC's default -ffp-contract=fast fuses the rotate-and-translate
+   multiplies and adds, so contraction is turned off per function. */
+#if defined(__clang__)
+#define NO_FP_CONTRACT
+#else
+#define NO_FP_CONTRACT __attribute__((optimize("fp-contract=off")))
+#endif
+
+/* AVX2: eight obstacle points per iteration.  Map pixels are 16-bit, so they
+   are fetched with 32-bit gathers at a 2-byte scale and masked down (map_init
+   pads the pixel array by one element so the last gather stays in bounds).
+   Offsets follow map_pixel_offset(); row-major maps keep the plain
+   y * size_pixels + x. */
+__attribute__((target("avx2"))) NO_FP_CONTRACT
+static int 
+distance_scan_to_map_avx2(
+    map_t *  map,
+    scan_t * scan,
+    position_t position)
+{
+    double position_theta_radians = radians(position.theta_degrees);
+    float costheta = (float)(cos(position_theta_radians) * map->scale_pixels_per_mm);
+    float sintheta = (float)(sin(position_theta_radians) * map->scale_pixels_per_mm);
+    
+    __m256 cos8 = _mm256_set1_ps(costheta);
+    __m256 sin8 = _mm256_set1_ps(sintheta);
+    __m256 nsin8 = _mm256_set1_ps(-sintheta);
+    __m256 posx8 = _mm256_set1_ps((float)(position.x_mm * map->scale_pixels_per_mm));
+    __m256 posy8 = _mm256_set1_ps((float)(position.y_mm * map->scale_pixels_per_mm));
+    __m256i size8 = _mm256_set1_epi32(map->size_pixels);
+    __m256i minus1 = _mm256_set1_epi32(-1);
+    __m256i low16 = _mm256_set1_epi32(0xFFFF);
+    __m256i lane8 = _mm256_setr_epi32(0, 1, 2, 3, 4, 5, 6, 7);
+    int tiled = map->tile_shift;
+    __m128i shift = _mm_cvtsi32_si128(map->tile_shift);
+    __m256i tiles8 = _mm256_set1_epi32(map->tiles_per_row);
+    __m256i mask8 = _mm256_set1_epi32((1 << map->tile_shift) - 1);
+    
+    __m256i sum_lo = _mm256_setzero_si256();
+    __m256i sum_hi = _mm256_setzero_si256();
+    int npoints = 0;
+    
+    int i = 0;
+    for (i=0; i<scan->obst_npoints; i+=8)
+    {
+        /* Lanes past the last obstacle point are masked off */
+        __m256i valid = _mm256_cmpgt_epi32(_mm256_set1_epi32(scan->obst_npoints - i), lane8);
+        __m256 x_mm = _mm256_maskload_ps(&scan->obst_x_mm[i], valid);
+        __m256 y_mm = _mm256_maskload_ps(&scan->obst_y_mm[i], valid);
+        
+        /* Same operation order as the SSE3 kernel: rotate, translate, round */
+        __m256i x = _mm256_cvtps_epi32(_mm256_add_ps(
+            _mm256_add_ps(_mm256_mul_ps(nsin8, y_mm), _mm256_mul_ps(cos8, x_mm)), posx8));
+        __m256i y = _mm256_cvtps_epi32(_mm256_add_ps(
+            _mm256_add_ps(_mm256_mul_ps(cos8, y_mm), _mm256_mul_ps(sin8, x_mm)), posy8));
+        
+        /* Keep points inside the map */
+        __m256i inside = _mm256_and_si256(valid,
+            _mm256_and_si256(
+                _mm256_and_si256(_mm256_cmpgt_epi32(x, minus1), _mm256_cmpgt_epi32(size8, x)),
+                _mm256_and_si256(_mm256_cmpgt_epi32(y, minus1), _mm256_cmpgt_epi32(size8, y))));
+        
+        __m256i offset;
+        if (tiled)
+        {
+            __m256i tile = _mm256_add_epi32(_mm256_mullo_epi32(_mm256_srl_epi32(y, shift), tiles8), 
+                _mm256_srl_epi32(x, shift));
+            offset = _mm256_or_si256(_mm256_sll_epi32(_mm256_add_epi32(_mm256_sll_epi32(tile, shift), 
+                _mm256_and_si256(y, mask8)), shift), _mm256_and_si256(x, mask8));
+        }
+        else
+        {
+            offset = _mm256_add_epi32(_mm256_mullo_epi32(y, size8), x);
+        }
+        __m256i pixels = _mm256_mask_i32gather_epi32(_mm256_setzero_si256(), 
+            (const int *)map->pixels, offset, inside, 2);
+        pixels = _mm256_and_si256(pixels, low16);
+        
+        sum_lo = _mm256_add_epi64(sum_lo, _mm256_cvtepu32_epi64(_mm256_castsi256_si128(pixels)));
+        sum_hi = _mm256_add_epi64(sum_hi, _mm256_cvtepu32_epi64(_mm256_extracti128_si256(pixels, 1)));
+        npoints += __builtin_popcount(_mm256_movemask_ps(_mm256_castsi256_ps(inside)));
+    }
+    
+    int64_t lanes[4];
+    _mm256_storeu_si256((__m256i *)lanes, _mm256_add_epi64(sum_lo, sum_hi));
+    int64_t sum = lanes[0] + lanes[1] + lanes[2] + lanes[3];
+    
+    return npoints ? (int)(sum * 1024 / npoints) : -1;
+}
+
+/* AVX-512: sixteen obstacle points per iteration, using mask registers for the
+   tail and the bounds test */
+__attribute__((target("avx512f"))) NO_FP_CONTRACT
+static int 
+distance_scan_to_map_avx512(
+    map_t *  map,
+    scan_t * scan,
+    position_t position)
+{
+    double position_theta_radians = radians(position.theta_degrees);
+    float costheta = (float)(cos(position_theta_radians) * map->scale_pixels_per_mm);
+    float sintheta = (float)(sin(position_theta_radians) * map->scale_pixels_per_mm);
+    
+    __m512 cos16 = _mm512_set1_ps(costheta);
+    __m512 sin16 = _mm512_set1_ps(sintheta);
+    __m512 nsin16 = _mm512_set1_ps(-sintheta);
+    __m512 posx16 = _mm512_set1_ps((float)(position.x_mm * map->scale_pixels_per_mm));
+    __m512 posy16 = _mm512_set1_ps((float)(position.y_mm * map->scale_pixels_per_mm));
+    __m512i size16 = _mm512_set1_epi32(map->size_pixels);
+    __m512i zero16 = _mm512_setzero_si512();
+    __m512i low16 = _mm512_set1_epi32(0xFFFF);
+    int tiled = map->tile_shift;
+    __m128i shift = _mm_cvtsi32_si128(map->tile_shift);
+    __m512i tiles16 = _mm512_set1_epi32(map->tiles_per_row);
+    __m512i mask16 = _mm512_set1_epi32((1 << map->tile_shift) - 1);
+    
+    __m512i sum = _mm512_setzero_si512();
+    int npoints = 0;
+    
+    int i = 0;
+    for (i=0; i<scan->obst_npoints; i+=16)
+    {
+        int remaining = scan->obst_npoints - i;
+        __mmask16 valid = remaining >= 16 ? (__mmask16)0xFFFF : (__mmask16)((1u << remaining) - 1);
+        __m512 x_mm = _mm512_maskz_loadu_ps(valid, &scan->obst_x_mm[i]);
+        __m512 y_mm = _mm512_maskz_loadu_ps(valid, &scan->obst_y_mm[i]);
+        
+        __m512i x = _mm512_cvtps_epi32(_mm512_add_ps(
+            _mm512_add_ps(_mm512_mul_ps(nsin16, y_mm), _mm512_mul_ps(cos16, x_mm)), posx16));
+        __m512i y = _mm512_cvtps_epi32(_mm512_add_ps(
+            _mm512_add_ps(_mm512_mul_ps(cos16, y_mm), _mm512_mul_ps(sin16, x_mm)), posy16));
+        
+        __mmask16 inside = valid &
+            _mm512_cmpge_epi32_mask(x, zero16) & _mm512_cmplt_epi32_mask(x, size16) &
+            _mm512_cmpge_epi32_mask(y, zero16) & _mm512_cmplt_epi32_mask(y, size16);
+        
+        __m512i offset;
+        if (tiled)
+        {
+            __m512i tile = _mm512_add_epi32(_mm512_mullo_epi32(_mm512_srl_epi32(y, shift), tiles16), 
+                _mm512_srl_epi32(x, shift));
+            offset = _mm512_or_si512(_mm512_sll_epi32(_mm512_add_epi32(_mm512_sll_epi32(tile, shift), 
+                _mm512_and_si512(y, mask16)), shift), _mm512_and_si512(x, mask16));
+        }
+        else
+        {
+            offset = _mm512_add_epi32(_mm512_mullo_epi32(y, size16), x);
+        }
+        __m512i pixels = _mm512_mask_i32gather_epi32(zero16, inside, offset, 
+            (const int *)map->pixels, 2);
+        pixels = _mm512_and_si512(pixels, low16);
+        
+        sum = _mm512_add_epi64(sum, _mm512_cvtepu32_epi64(_mm512_castsi512_si256(pixels)));
+        sum = _mm512_add_epi64(sum, _mm512_cvtepu32_epi64(_mm512_extracti64x4_epi64(pixels, 1)));
+        npoints += __builtin_popcount(inside);
+    }
+    
+    int64_t total = _mm512_reduce_add_epi64(sum);
+    
+    return npoints ? (int)(total * 1024 / npoints) : -1;
+}
+
+#endif /* __GNUC__ */
+
+typedef int (*distance_kernel_t)(map_t *, scan_t *, position_t);
+
+static distance_kernel_t distance_kernel = NULL;
+static const char * distance_kernel_name = NULL;
+
+/* Picks the widest kernel the CPU supports.  BREEZYSLAM_KERNEL=sse3|avx2|avx512
+   caps the choice at that kernel (e.g. for benchmarking or for comparing
+   kernels on a log); if the CPU lacks it, the widest supported kernel below
+   it is used.  Unknown values are reported and ignored. */
+static void
+select_distance_kernel(void)
+{
+    const char * forced = getenv("BREEZYSLAM_KERNEL");
+    
+    distance_kernel_t kernel = distance_scan_to_map_sse3;
+    const char * name = "sse3";
+    
+    /* 0 = sse3, 1 = avx2, 2 = avx512 */
+    int cap = 2;
+    
+    if (forced && *forced)
+    {
+        if (!strcmp(forced, "sse3"))
+        {
+            cap = 0;
+        }
+        else if (!strcmp(forced, "avx2"))
+        {
+            cap = 1;
+        }
+        else if (strcmp(forced, "avx512"))
+        {
+            fprintf(stderr, "BREEZYSLAM_KERNEL=%s not recognized (sse3, avx2, avx512); "
+                    "using the widest supported kernel\n", forced);
+        }
+    }
+    
+#ifdef HAVE_WIDE_KERNELS
+    __builtin_cpu_init();
+    
+    if (cap >= 2 && __builtin_cpu_supports("avx512f"))
+    {
+        kernel = distance_scan_to_map_avx512;
+        name = "avx512";
+    }
+    else if (cap >= 1 && __builtin_cpu_supports("avx2"))
+    {
+        kernel = distance_scan_to_map_avx2;
+        name = "avx2";
+    }
+#else
+    (void)cap;
+#endif
+    
+    /* Benign race: concurrent first calls all store the same values */
+    distance_kernel_name = name;
+    distance_kernel = kernel;
+}
+
+int 
+distance_scan_to_map(
+    map_t *  map,
+    scan_t * scan,
+    position_t position)
+{
+    if (!distance_kernel)
+    {
+        select_distance_kernel();
+    }
+    
+    return distance_kernel(map, scan, position);
+}
+
+const char *
+distance_scan_to_map_kernel(void)
+{
+    if (!distance_kernel)
+    {
+        select_distance_kernel();
+    }
+    
+    return distance_kernel_name;
+}
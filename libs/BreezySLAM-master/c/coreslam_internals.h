@@ -30,8 +30,24 @@ typedef __int64 int64_t;       /* Define it from MSVC's internal type */
 static const int NO_OBSTACLE            = 65500;
 static const int OBSTACLE               = 0;
 
-static double 
+static inline double 
 radians(double degrees)
 {
     return degrees * M_PI / 180;
 }
+
+/* malloc that exits with a message when memory runs out */
+void * safe_malloc(size_t size);
+
+/* One Random-Mutation Hill-Climbing run; also reports the distance of the
+   returned position (-1 for infinity) so that several runs can be compared */
+position_t
+rmhc_climb(
+    position_t start_pos,
+    map_t * map,
+    scan_t * scan,
+    double sigma_xy_mm,
+    double sigma_theta_degrees,
+    int max_search_iter,
+    void * randomizer,
+    int * lowest_distance_out);
@@ -0,0 +1,169 @@
+/*
+map_update_parallel.c Map update split across threads by bands of map rows
+
+Every thread draws all the rays of the scan but writes only the pixels of its
+own band of rows (map_update_region), so no two threads ever write the same
+pixel and each pixel still receives its updates in ray order: the map is
+identical to the one map_update() produces, with no locking.  The bands split
+the rows the scan can reach from the robot's position, not the whole map.
+
+Threads are created per call; a map update takes milliseconds, far more than
+starting a thread.  A band whose thread fails to start is updated on the
+calling thread.  On Windows, where the build does not link POSIX threads,
+the update runs on the calling thread (with a warning the first time).
+
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http:#www.gnu.org/licenses/>.
+*/
+
+#include <math.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+#include "coreslam.h"
+#include "coreslam_internals.h"
+
+#ifndef _WIN32
+#define MAP_UPDATE_THREADS
+#include <pthread.h>
+#endif
+
+#ifdef MAP_UPDATE_THREADS
+
+typedef struct map_band_t
+{
+    map_t * map;
+    scan_t * scan;
+    position_t position;
+    int map_quality;
+    double hole_width_mm;
+    int row_min;
+    int row_max;
+
+} map_band_t;
+
+static void
+update_band(map_band_t * band)
+{
+    map_update_region(band->map, band->scan, band->position, band->map_quality, band->hole_width_mm,
+        band->row_min, band->row_max, 0, band->map->size_pixels - 1);
+}
+
+static void *
+band_main(void * arg)
+{
+    update_band((map_band_t *)arg);
+
+    return NULL;
+}
+
+#endif
+
+void
+map_update_parallel(
+    map_t * map,
+    scan_t * scan,
+    position_t position,
+    int map_quality,
+    double hole_width_mm,
+    int nthreads)
+{
+#ifdef MAP_UPDATE_THREADS
+    /* Farthest the rays can reach from the robot, in pixels */
+    double reach_mm = 0;
+    int i = 0;
+    for (i=0; i<scan->npoints; ++i)
+    {
+        double dist = sqrt(scan->x_mm[i] * scan->x_mm[i] + scan->y_mm[i] * scan->y_mm[i]);
+        if (dist > reach_mm)
+        {
+            reach_mm = dist;
+        }
+    }
+
+    int reach = (int)((reach_mm + hole_width_mm / 2) * map->scale_pixels_per_mm) + 2;
+    int robot_row = (int)floor(position.y_mm * map->scale_pixels_per_mm + 0.5);
+
+    int row_min = robot_row - reach;
+    int row_max = robot_row + reach;
+    if (row_min < 0)
+    {
+        row_min = 0;
+    }
+    if (row_max > map->size_pixels - 1)
+    {
+        row_max = map->size_pixels - 1;
+    }
+
+    int rows = row_max - row_min + 1;
+    if (nthreads > rows)
+    {
+        nthreads = rows;
+    }
+
+    if (nthreads < 2)
+    {
+        map_update(map, scan, position, map_quality, hole_width_mm);
+        return;
+    }
+
+    map_band_t * bands = (map_band_t *)safe_malloc(nthreads * sizeof(map_band_t));
+    pthread_t * threads = (pthread_t *)safe_malloc(nthreads * sizeof(pthread_t));
+    char * started = (char *)safe_malloc(nthreads);
+
+    int k = 0;
+    for (k=0; k<nthreads; ++k)
+    {
+        map_band_t * band = &bands[k];
+        band->map = map;
+        band->scan = scan;
+        band->position = position;
+        band->map_quality = map_quality;
+        band->hole_width_mm = hole_width_mm;
+        band->row_min = row_min + (int)((long)rows * k / nthreads);
+        band->row_max = row_min + (int)((long)rows * (k + 1) / nthreads) - 1;
+
+        /* Band 0, and any band whose thread fails to start, runs on the
+           calling thread (bands never share pixels, so in any order) */
+        started[k] = k > 0 && !pthread_create(&threads[k], NULL, band_main, band);
+        if (k > 0 && !started[k])
+        {
+            update_band(band);
+        }
+    }
+
+    update_band(&bands[0]);
+
+    for (k=1; k<nthreads; ++k)
+    {
+        if (started[k])
+        {
+            pthread_join(threads[k], NULL);
+        }
+    }
+
+    free(started);
+    free(threads);
+    free(bands);
+#else
+    static int warned = 0;
+    if (nthreads > 1 && !warned)
+    {
+        fprintf(stderr, "Map update: no threads on this platform; updating on 1 thread instead of %d\n",
+            nthreads);
+        warned = 1;
+    }
+
+    map_update(map, scan, position, map_quality, hole_width_mm);
+#endif
+}
@@ -0,0 +1,339 @@
+/*
+rmhc_parallel.c Multi-start Random-Mutation Hill-Climbing search on a thread pool
+
+Runs several independent RMHC climbs per search, one per pool thread: the
+calling thread climbs from the odometry-predicted start position, as the
+sequential search does, and each worker climbs from a start perturbed with
+the search sigmas.  Every climb owns its ziggurat generator, so the workers
+share nothing but the (read-only) map and scan.  The best position wins.
+
+Worker threads are created once with the pool and sleep on a condition
+variable between searches.  On Windows, where the build does not link POSIX
+threads, the pool is clamped to a single climb (with a warning): N climbs one
+after the other would cost N times the CPU of the sequential search.
+
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http:#www.gnu.org/licenses/>.
+*/
+
+#include <math.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include "coreslam.h"
+#include "coreslam_internals.h"
+#include "random.h"
+
+#ifndef _WIN32
+#define RMHC_POOL_THREADS
+#include <pthread.h>
+#endif
+
+typedef struct rmhc_job_t
+{
+    position_t start_pos;
+    map_t * map;
+    scan_t * scan;
+    double sigma_xy_mm;
+    double sigma_theta_degrees;
+    int max_search_iter;
+
+} rmhc_job_t;
+
+typedef struct rmhc_result_t
+{
+    position_t position;
+    int distance;
+
+} rmhc_result_t;
+
+struct rmhc_pool_t
+{
+    int nthreads;
+    void ** randomizers;        /* one generator per climb */
+    rmhc_result_t * results;    /* one result per climb */
+    rmhc_job_t job;
+
+#ifdef RMHC_POOL_THREADS
+    pthread_t * threads;        /* nthreads-1 workers; climb 0 runs on the caller */
+    pthread_mutex_t search_mutex;   /* serializes searches sharing the pool */
+    pthread_mutex_t mutex;
+    pthread_cond_t work_ready;
+    pthread_cond_t work_done;
+    unsigned int generation;
+    int pending;
+    int shutdown;
+#endif
+};
+
+typedef struct rmhc_worker_t
+{
+    rmhc_pool_t * pool;
+    int index;
+
+} rmhc_worker_t;
+
+static void
+run_climb(rmhc_pool_t * pool, int index)
+{
+    rmhc_job_t * job = &pool->job;
+    void * randomizer = pool->randomizers[index];
+
+    position_t start_pos = job->start_pos;
+
+    /* Climb 0 starts exactly where the sequential search would */
+    if (index > 0)
+    {
+        start_pos.x_mm = random_normal(randomizer, start_pos.x_mm, job->sigma_xy_mm);
+        start_pos.y_mm = random_normal(randomizer, start_pos.y_mm, job->sigma_xy_mm);
+        start_pos.theta_degrees = random_normal(randomizer, start_pos.theta_degrees, job->sigma_theta_degrees);
+    }
+
+    rmhc_result_t * result = &pool->results[index];
+
+    result->position = rmhc_climb(start_pos, job->map, job->scan, job->sigma_xy_mm,
+        job->sigma_theta_degrees, job->max_search_iter, randomizer, &result->distance);
+}
+
+#ifdef RMHC_POOL_THREADS
+
+static void *
+worker_main(void * arg)
+{
+    rmhc_worker_t * worker = (rmhc_worker_t *)arg;
+    rmhc_pool_t * pool = worker->pool;
+    int index = worker->index;
+    free(worker);
+
+    unsigned int seen_generation = 0;
+
+    pthread_mutex_lock(&pool->mutex);
+
+    while (1)
+    {
+        while (!pool->shutdown && pool->generation == seen_generation)
+        {
+            pthread_cond_wait(&pool->work_ready, &pool->mutex);
+        }
+
+        if (pool->shutdown)
+        {
+            break;
+        }
+
+        seen_generation = pool->generation;
+        pthread_mutex_unlock(&pool->mutex);
+
+        run_climb(pool, index);
+
+        pthread_mutex_lock(&pool->mutex);
+        if (--pool->pending == 0)
+        {
+            pthread_cond_signal(&pool->work_done);
+        }
+    }
+
+    pthread_mutex_unlock(&pool->mutex);
+
+    return NULL;
+}
+
+#endif
+
+rmhc_pool_t *
+rmhc_pool_new(
+    int nthreads,
+    int seed)
+{
+    if (nthreads < 1)
+    {
+        nthreads = 1;
+    }
+
+#ifndef RMHC_POOL_THREADS
+    if (nthreads > 1)
+    {
+        fprintf(stderr, "RMHC pool: no search threads on this platform; running 1 climb instead of %d\n",
+            nthreads);
+        nthreads = 1;
+    }
+#endif
+
+    rmhc_pool_t * pool = (rmhc_pool_t *)safe_malloc(sizeof(rmhc_pool_t));
+    memset(pool, 0, sizeof(rmhc_pool_t));
+
+    pool->nthreads = nthreads;
+    pool->randomizers = (void **)safe_malloc(nthreads * sizeof(void *));
+    pool->results = (rmhc_result_t *)safe_malloc(nthreads * sizeof(rmhc_result_t));
+
+    int k = 0;
+    for (k=0; k<nthreads; ++k)
+    {
+        /* Distinct, reproducible stream per climb */
+        pool->randomizers[k] = random_new(seed + 7919 * k);
+    }
+
+#ifdef RMHC_POOL_THREADS
+    pthread_mutex_init(&pool->search_mutex, NULL);
+    pthread_mutex_init(&pool->mutex, NULL);
+    pthread_cond_init(&pool->work_ready, NULL);
+    pthread_cond_init(&pool->work_done, NULL);
+
+    pool->threads = (pthread_t *)safe_malloc(nthreads * sizeof(pthread_t));
+
+    /* Workers that fail to start are dropped: the pool runs as many climbs as
+       there are threads (searches wait for exactly nthreads-1 workers) */
+    int started = 1;
+    for (k=1; k<nthreads; ++k)
+    {
+        rmhc_worker_t * worker = (rmhc_worker_t *)safe_malloc(sizeof(rmhc_worker_t));
+        worker->pool = pool;
+        worker->index = k;
+        if (pthread_create(&pool->threads[k], NULL, worker_main, worker))
+        {
+            free(worker);
+            break;
+        }
+        started++;
+    }
+
+    if (started < nthreads)
+    {
+        fprintf(stderr, "RMHC pool: started %d of %d search threads\n", started - 1, nthreads - 1);
+
+        for (k=started; k<nthreads; ++k)
+        {
+            random_free(pool->randomizers[k]);
+        }
+        pool->nthreads = started;
+
+        /* Not a single worker: no pool */
+        if (started == 1)
+        {
+            rmhc_pool_free(pool);
+            return NULL;
+        }
+    }
+#endif
+
+    return pool;
+}
+
+void
+rmhc_pool_free(
+    rmhc_pool_t * pool)
+{
+    int k = 0;
+
+#ifdef RMHC_POOL_THREADS
+    pthread_mutex_lock(&pool->mutex);
+    pool->shutdown = 1;
+    pthread_cond_broadcast(&pool->work_ready);
+    pthread_mutex_unlock(&pool->mutex);
+
+    for (k=1; k<pool->nthreads; ++k)
+    {
+        pthread_join(pool->threads[k], NULL);
+    }
+
+    free(pool->threads);
+    pthread_cond_destroy(&pool->work_done);
+    pthread_cond_destroy(&pool->work_ready);
+    pthread_mutex_destroy(&pool->mutex);
+    pthread_mutex_destroy(&pool->search_mutex);
+#endif
+
+    for (k=0; k<pool->nthreads; ++k)
+    {
+        random_free(pool->randomizers[k]);
+    }
+
+    free(pool->randomizers);
+    free(pool->results);
+    free(pool);
+}
+
+int
+rmhc_pool_size(
+    rmhc_pool_t * pool)
+{
+    return pool->nthreads;
+}
+
+position_t
+rmhc_position_search_parallel(
+    rmhc_pool_t * pool,
+    position_t start_pos,
+    map_t * map,
+    scan_t * scan,
+    double sigma_xy_mm,
+    double sigma_theta_degrees,
+    int max_search_iter)
+{
+#ifdef RMHC_POOL_THREADS
+    pthread_mutex_lock(&pool->search_mutex);
+#endif
+
+    pool->job.start_pos = start_pos;
+    pool->job.map = map;
+    pool->job.scan = scan;
+    pool->job.sigma_xy_mm = sigma_xy_mm;
+    pool->job.sigma_theta_degrees = sigma_theta_degrees;
+    pool->job.max_search_iter = max_search_iter;
+
+    int k = 0;
+
+#ifdef RMHC_POOL_THREADS
+    pthread_mutex_lock(&pool->mutex);
+    pool->pending = pool->nthreads - 1;
+    pool->generation++;
+    pthread_cond_broadcast(&pool->work_ready);
+    pthread_mutex_unlock(&pool->mutex);
+
+    run_climb(pool, 0);
+
+    pthread_mutex_lock(&pool->mutex);
+    while (pool->pending > 0)
+    {
+        pthread_cond_wait(&pool->work_done, &pool->mutex);
+    }
+    pthread_mutex_unlock(&pool->mutex);
+#else
+    for (k=0; k<pool->nthreads; ++k)
+    {
+        run_climb(pool, k);
+    }
+#endif
+
+    /* Lowest distance wins; -1 (infinity) never beats a finite distance */
+    int best = 0;
+    for (k=1; k<pool->nthreads; ++k)
+    {
+        int distance = pool->results[k].distance;
+        int best_distance = pool->results[best].distance;
+
+        if (distance > -1 && (best_distance == -1 || distance < best_distance))
+        {
+            best = k;
+        }
+    }
+
+    position_t bestpos = pool->results[best].position;
+
+#ifdef RMHC_POOL_THREADS
+    pthread_mutex_unlock(&pool->search_mutex);
+#endif
+
+    return bestpos;
+}
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+'''
+kernel_check.py : Checks that every scan-to-map distance kernel of the BreezySLAM
+                  C core (sse3, avx2, avx512 on x86) gives the same results.  For
+                  each kernel the CPU supports, runs RMHC SLAM over a logfile from
+                  Paris Mines Tech in a separate process (the kernel is chosen once
+                  per process, through BREEZYSLAM_KERNEL), scoring a cloud of
+                  candidate positions around the robot after every update, and
+                  compares the final pose, the map and the candidate scores.
+                  Exits with status 1 if any kernel differs.
+
+Copyright (C) 2014 Simon D. Levy
+
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+MAP_SIZE_METERS     = 32
+HOLE_WIDTH_MM       = 600
+RANDOM_SEED         = 9999
+CANDIDATES_PER_SCAN = 200
+SIGMA_XY_MM         = 300
+SIGMA_THETA_DEGREES = 20
+KERNELS             = ('sse3', 'avx2', 'avx512')
+
+import hashlib
+import json
+import os
+import subprocess
+
+import numpy as np
+
+import pybreezyslam
+from breezyslam.algorithms import RMHC_SLAM
+
+from mines import MinesLaser, load_data
+
+from sys import argv, executable, exit
+
+def run(dataset, map_size_pixels):
+    '''
+    One SLAM run with the kernel selected for this process; returns a summary
+    that can be compared across processes.
+    '''
+
+    _, lidars, _ = load_data('.', dataset)
+
+    slam = RMHC_SLAM(MinesLaser(), map_size_pixels, MAP_SIZE_METERS, random_seed=RANDOM_SEED,
+                     hole_width_mm=HOLE_WIDTH_MM)
+    scan_for_distance = pybreezyslam.Scan(MinesLaser(), 1)
+    mapbytes = bytearray(map_size_pixels * map_size_pixels)
+    slammap = pybreezyslam.Map(map_size_pixels, MAP_SIZE_METERS)
+
+    rng = np.random.default_rng(RANDOM_SEED)
+    scores = np.empty((len(lidars), CANDIDATES_PER_SCAN), dtype=np.int32)
+
+    for k, lidar in enumerate(lidars):
+
+        slam.update(lidar)
+
+        # Candidate positions scattered around the robot, scored against the current map
+        slam.getmap(mapbytes)
+        slammap.set(mapbytes)
+        scan_for_distance.update(scans_mm=lidar, hole_width_mm=HOLE_WIDTH_MM, velocities=(0, 0))
+        candidates = np.array(slam.getpos()) + \
+            rng.normal(0, 1, (CANDIDATES_PER_SCAN, 3)) * (SIGMA_XY_MM, SIGMA_XY_MM, SIGMA_THETA_DEGREES)
+        pybreezyslam.distanceScanToMapBatch(slammap, scan_for_distance, candidates, scores[k])
+
+    return {'kernel': pybreezyslam.distanceKernel(),
+            'position': slam.getpos(),
+            'map': hashlib.md5(mapbytes).hexdigest(),
+            'scores': hashlib.md5(scores.tobytes()).hexdigest()}
+
+def main():
+
+    # Child process: one run with the kernel from BREEZYSLAM_KERNEL
+    if len(argv) > 1 and argv[1] == '--run':
+        print(json.dumps(run(argv[2], int(argv[3]))))
+        return
+
+    # Bozo filter for input args
+    if len(argv) < 2:
+        print('Usage:   %s <dataset> [map_size_pixels]' % argv[0])
+        print('Example: %s exp2 800' % argv[0])
+        exit(1)
+
+    # Grab input args
+    dataset = argv[1]
+    map_size_pixels = int(argv[2]) if len(argv) > 2 else 800
+
+    reference = None
+    failed = False
+    for kernel in KERNELS:
+
+        env = dict(os.environ, BREEZYSLAM_KERNEL=kernel)
+        output = subprocess.run([executable, argv[0], '--run', dataset, str(map_size_pixels)],
+                                env=env, stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+        result = json.loads(output.splitlines()[-1])
+
+        # Kernels the CPU lacks fall back to a narrower one already checked
+        if result['kernel'] != kernel:
+            print('%-7s not supported on this CPU' % kernel)
+            continue
+
+        if reference is None:
+            reference = result
+
+        same = all(result[key] == reference[key] for key in ('position', 'map', 'scores'))
+        failed |= not same
+
+        x_mm, y_mm, theta_degrees = result['position']
+        print('%-7s pose (%8.1f, %8.1f, %6.2f deg)  map %s  scores %s  %s' %
+              (kernel, x_mm, y_mm, theta_degrees, result['map'][:8], result['scores'][:8],
+               'same' if same else 'DIFFERS'))
+
+    exit(1 if failed else 0)
+
+main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+'''
+maplayout_bench.py : Benchmarks the row-major and tiled map layouts of the BreezySLAM
+                     C core.  Reads a logfile from Paris Mines Tech, computes the
+                     robot trajectory once with RMHC SLAM, then replays every scan
+                     at its position into maps of each layout, scoring a cloud of
+                     candidate positions around the robot before each map update
+                     (as RMHC search does), and checks that all layouts give the
+                     same scores and the same map.
+
+Copyright (C) 2014 Simon D. Levy
+
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+MAP_SIZE_METERS     = 32
+MAP_QUALITY         = 50
+HOLE_WIDTH_MM       = 600
+RANDOM_SEED         = 9999
+CANDIDATES_PER_SCAN = 200
+SIGMA_XY_MM         = 300
+SIGMA_THETA_DEGREES = 20
+TILE_SIZES          = (0, 8, 16, 32)
+
+import numpy as np
+
+import pybreezyslam
+from breezyslam.algorithms import RMHC_SLAM
+
+from mines import MinesLaser, load_data
+
+from sys import argv, exit
+from time import perf_counter
+
+def replay(lidars, positions, candidates, map_size_pixels, tile_size):
+
+    slammap = pybreezyslam.Map(map_size_pixels, MAP_SIZE_METERS, tile_size=tile_size)
+    scan_for_distance = pybreezyslam.Scan(MinesLaser(), 1)
+    scan_for_mapbuild = pybreezyslam.Scan(MinesLaser(), 3)
+
+    scores = np.empty((len(lidars), CANDIDATES_PER_SCAN), dtype=np.int32)
+
+    score_time = 0
+    update_time = 0
+    for k, (lidar, (x_mm, y_mm, theta_degrees)) in enumerate(zip(lidars, positions)):
+
+        scan_for_distance.update(scans_mm=lidar, hole_width_mm=HOLE_WIDTH_MM, velocities=(0, 0))
+        scan_for_mapbuild.update(scans_mm=lidar, hole_width_mm=HOLE_WIDTH_MM, velocities=(0, 0))
+
+        start = perf_counter()
+        pybreezyslam.distanceScanToMapBatch(slammap, scan_for_distance, candidates[k], scores[k])
+        score_time += perf_counter() - start
+
+        start = perf_counter()
+        slammap.update(scan_for_mapbuild, pybreezyslam.Position(x_mm, y_mm, theta_degrees),
+                       MAP_QUALITY, HOLE_WIDTH_MM)
+        update_time += perf_counter() - start
+
+    mapbytes = bytearray(map_size_pixels * map_size_pixels)
+    slammap.get(mapbytes)
+
+    return score_time, update_time, scores, mapbytes
+
+def main():
+
+    # Bozo filter for input args
+    if len(argv) < 2:
+        print('Usage:   %s <dataset> [map_size_pixels] [tile_size]' % argv[0])
+        print('Example: %s exp2 4000 16' % argv[0])
+        exit(1)
+
+    # Grab input args
+    dataset = argv[1]
+    map_size_pixels = int(argv[2]) if len(argv) > 2 else 4000
+    tile_sizes = (0, int(argv[3])) if len(argv) > 3 else TILE_SIZES
+
+    # Load the data from the file, ignoring timestamps and odometry
+    _, lidars, _ = load_data('.', dataset)
+
+    # One SLAM run gives the positions every layout replays
+    slam = RMHC_SLAM(MinesLaser(), 800, MAP_SIZE_METERS, random_seed=RANDOM_SEED,
+                     hole_width_mm=HOLE_WIDTH_MM)
+    positions = []
+    for lidar in lidars:
+        slam.update(lidar)
+        positions.append(slam.getpos())
+
+    # Candidate positions scattered around the robot, as RMHC search would try
+    rng = np.random.default_rng(RANDOM_SEED)
+    candidates = np.repeat(np.array(positions)[:, np.newaxis, :], CANDIDATES_PER_SCAN, axis=1)
+    candidates += rng.normal(0, 1, candidates.shape) * (SIGMA_XY_MM, SIGMA_XY_MM, SIGMA_THETA_DEGREES)
+
+    print('%d scans, %d x %d pixels, %d candidates per scan, %s kernel' %
+          (len(lidars), map_size_pixels, map_size_pixels, CANDIDATES_PER_SCAN,
+           pybreezyslam.distanceKernel()))
+
+    reference = None
+    for tile_size in tile_sizes:
+
+        score_time, update_time, scores, mapbytes = \
+            replay(lidars, positions, candidates, map_size_pixels, tile_size)
+
+        if reference is None:
+            reference = score_time, update_time, scores, mapbytes
+
+        same = (scores == reference[2]).all() and mapbytes == reference[3]
+
+        print('%-10s score %6.3f us/pose %5.2fx   update %6.3f ms/scan %5.2fx  %s' %
+              ('tiles=%d' % tile_size if tile_size > 1 else 'row-major',
+               1e6 * score_time / scores.size, reference[0] / score_time,
+               1e3 * update_time / len(lidars), reference[1] / update_time,
+               'same' if same else 'DIFFERS'))
+
+main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+'''
+mapupdate_bench.py : Benchmarks the map update of the BreezySLAM C core.  Reads a
+                     logfile from Paris Mines Tech, computes the robot trajectory
+                     once with RMHC SLAM, then replays every scan at its position
+                     into fresh maps with the original CoreSLAM routine
+                     (Map.updateReference), the optimized one (Map.update) and
+                     the multithreaded one (Map.update with threads > 1), checking
+                     that all produce the same map.
+
+Copyright (C) 2014 Simon D. Levy
+
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+MAP_SIZE_METERS = 32
+MAP_QUALITY     = 50
+RANDOM_SEED     = 9999
+
+import pybreezyslam
+from breezyslam.algorithms import RMHC_SLAM
+
+from mines import MinesLaser, load_data
+
+from sys import argv, exit
+from time import perf_counter
+
+def replay(name, lidars, positions, map_size_pixels, hole_width_mm, threads):
+
+    slammap = pybreezyslam.Map(map_size_pixels, MAP_SIZE_METERS)
+    scan = pybreezyslam.Scan(MinesLaser(), 3)
+
+    elapsed = 0
+    for lidar, (x_mm, y_mm, theta_degrees) in zip(lidars, positions):
+        scan.update(scans_mm=lidar, hole_width_mm=hole_width_mm, velocities=(0, 0))
+        position = pybreezyslam.Position(x_mm, y_mm, theta_degrees)
+        start = perf_counter()
+        if name == 'reference':
+            slammap.updateReference(scan, position, MAP_QUALITY, hole_width_mm)
+        else:
+            slammap.update(scan, position, MAP_QUALITY, hole_width_mm, threads)
+        elapsed += perf_counter() - start
+
+    mapbytes = bytearray(map_size_pixels * map_size_pixels)
+    slammap.get(mapbytes)
+
+    return elapsed, mapbytes
+
+def main():
+
+    # Bozo filter for input args
+    if len(argv) < 2:
+        print('Usage:   %s <dataset> [hole_width_mm] [map_size_pixels] [threads]' % argv[0])
+        print('Example: %s exp2 1200 2000 4' % argv[0])
+        exit(1)
+
+    # Grab input args
+    dataset = argv[1]
+    hole_width_mm = float(argv[2]) if len(argv) > 2 else 600
+    map_size_pixels = int(argv[3]) if len(argv) > 3 else 800
+    threads = int(argv[4]) if len(argv) > 4 else 4
+
+    # Load the data from the file, ignoring timestamps and odometry
+    _, lidars, _ = load_data('.', dataset)
+
+    # One SLAM run gives the positions every variant replays
+    slam = RMHC_SLAM(MinesLaser(), map_size_pixels, MAP_SIZE_METERS, random_seed=RANDOM_SEED,
+                     hole_width_mm=hole_width_mm)
+    positions = []
+    for lidar in lidars:
+        slam.update(lidar)
+        positions.append(slam.getpos())
+
+    print('%d scans, %d x %d pixels, hole width %d mm' %
+          (len(lidars), map_size_pixels, map_size_pixels, hole_width_mm))
+
+    reference_time, reference_map = replay('reference', lidars, positions, map_size_pixels, hole_width_mm, 1)
+
+    for name, nthreads in (('reference', 1), ('optimized', 1), ('threads=%d' % threads, threads)):
+        elapsed, mapbytes = (reference_time, reference_map) if name == 'reference' else \
+            replay(name, lidars, positions, map_size_pixels, hole_width_mm, nthreads)
+        print('%-12s %7.3f ms/scan  %5.2fx  %s' %
+              (name, 1000 * elapsed / len(lidars), reference_time / elapsed,
+               'same map' if mapbytes == reference_map else 'MAP DIFFERS'))
+
+main()
@@ -30,12 +30,19 @@ You should have received a copy of the GNU Lesser General Public License
 along with this code.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
+import os
+
 from breezyslam.vehicles import WheeledVehicle
 from breezyslam.sensors import URG04LX
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 
-# Method to load all from file ------------------------------------------------
+# Methods to load from file ---------------------------------------------------
 # Each line in the file has the format:
 #
 #  TIMESTAMP  ... Q1  Q1 ... Distances
@@ -43,39 +50,123 @@ from breezyslam.sensors import URG04LX
 #  0          ... 2   3  ... 24 ... 
 #  
 #where Q1, Q2 are odometry values
+#
+# The first load_data() of a dataset converts the text file, one line at a time,
+# into a binary cache next to it (DATASET.lidar.npy, DATASET.odometry.npy);
+# later loads memory-map the cache and start instantly.  Without NumPy,
+# load_data() reads the text file into lists as before.
+
+def _parse_line(s):
+
+    toks = s.split()[0:-1] # ignore ''
+
+    timestamp = int(toks[0])
+
+    odometry = timestamp, int(toks[2]), int(toks[3])
+
+    return timestamp, toks[24:], odometry
+
+def iter_data(datadir, dataset):
+    '''
+    Streams (timestamp, lidar, odometry) for each scan of the dataset, reading the text
+    file one line at a time: processing starts immediately, with constant memory.
+    lidar is a list of distances in mm; odometry is (timestamp, Q1, Q2).
+    '''
+
+    filename = '%s/%s.dat' % (datadir, dataset)
+
+    with open(filename, 'rt') as fd:
+
+        for s in fd:
+
+            if not s.strip():
+                continue
+
+            timestamp, lidar, odometry = _parse_line(s)
+
+            yield timestamp, [int(tok) for tok in lidar], odometry
+
+def _cache_filenames(datadir, dataset):
+
+    return '%s/%s.lidar.npy' % (datadir, dataset), '%s/%s.odometry.npy' % (datadir, dataset)
+
+def _write_cache(filename, lidar_filename, odometry_filename):
+
+    # First pass sizes the arrays, second pass fills them row by row
+    with open(filename, 'rt') as fd:
+        nscans = 0
+        scan_size = 0
+        for s in fd:
+            if s.strip():
+                if not nscans:
+                    scan_size = len(_parse_line(s)[1])
+                nscans += 1
+
+    lidar_tmp = lidar_filename + '.tmp'
+    odometry_tmp = odometry_filename + '.tmp'
+
+    lidars = np.lib.format.open_memmap(lidar_tmp, mode='w+', dtype=np.int32, shape=(nscans, scan_size))
+    odometries = np.lib.format.open_memmap(odometry_tmp, mode='w+', dtype=np.int64, shape=(nscans, 3))
+
+    with open(filename, 'rt') as fd:
+        k = 0
+        for s in fd:
+            if s.strip():
+                _, lidar, odometry = _parse_line(s)
+                lidars[k] = np.array(lidar, dtype=np.int32)
+                odometries[k] = odometry
+                k += 1
+
+    lidars.flush()
+    odometries.flush()
+    del lidars, odometries
+
+    # A half-written cache is never picked up by a later run
+    os.replace(lidar_tmp, lidar_filename)
+    os.replace(odometry_tmp, odometry_filename)
+
+def load_cached(datadir, dataset):
+    '''
+    Returns (timestamps, scans, odometries) as read-only memory-mapped NumPy arrays:
+    timestamps has shape (N,), scans (N, scan_size) int32 in mm and odometries (N, 3)
+    rows of (timestamp, Q1, Q2).  Builds the binary cache when it is missing or older
+    than the text file.
+    '''
+
+    filename = '%s/%s.dat' % (datadir, dataset)
+    lidar_filename, odometry_filename = _cache_filenames(datadir, dataset)
+
+    mtime = os.path.getmtime(filename)
+    if not all(os.path.exists(f) and os.path.getmtime(f) >= mtime for f in (lidar_filename, odometry_filename)):
+        print('Caching %s...' % filename)
+        _write_cache(filename, lidar_filename, odometry_filename)
+
+    scans = np.load(lidar_filename, mmap_mode='r')
+    odometries = np.load(odometry_filename, mmap_mode='r')
+
+    return odometries[:, 0], scans, odometries
 
 def load_data(datadir, dataset):
-    
+    '''
+    Returns (timestamps, scans, odometries) for the dataset: memory-mapped arrays from the
+    binary cache (see load_cached()) when NumPy is available, lists otherwise.
+    '''
+
     filename = '%s/%s.dat' % (datadir, dataset)
     print('Loading data from %s...' % filename)
-    
-    fd = open(filename, 'rt')
-    
+
+    if np is not None:
+        return load_cached(datadir, dataset)
+
     timestamps = []
     scans = []
     odometries = []
-    
-    while True:  
-        
-        s = fd.readline()
-        
-        if len(s) == 0:
-            break       
-            
-        toks = s.split()[0:-1] # ignore ''
-
-        timestamp = int(toks[0])
-
-        odometry = timestamp, int(toks[2]), int(toks[3])
-                        
-        lidar = [int(tok) for tok in toks[24:]]
 
+    for timestamp, lidar, odometry in iter_data(datadir, dataset):
         timestamps.append(timestamp)
         scans.append(lidar)
         odometries.append(odometry)
-        
-    fd.close()
-        
+
     return timestamps, scans, odometries
 
 class MinesLaser(URG04LX):
@@ -19,56 +19,73 @@ along with this code.  If not, see <http://www.gnu.org/licenses/>.
 Change log:
 
 20-APR-2014 - Simon D. Levy - Get params from command line
+
+Files are written as binary PGM (P5) by default, with the whole image written
+or read in one call; ASCII PGM (P2) is still written on request and read.
 '''
 
+def _pgm_header(data):
+    '''
+    Parses the PGM header at the start of data, skipping # comments.  Returns
+    (magic, width, height, maxval, offset of the first pixel byte).
+    '''
+
+    toks = []
+    pos = 0
+    while len(toks) < 4:
+        while data[pos:pos+1].isspace():
+            pos += 1
+        if data[pos:pos+1] == b'#':
+            pos = data.index(b'\n', pos)
+            continue
+        end = pos
+        while end < len(data) and not data[end:end+1].isspace():
+            end += 1
+        toks.append(data[pos:end])
+        pos = end
+
+    # Exactly one whitespace byte separates the header from binary pixels
+    return toks[0].decode(), int(toks[1]), int(toks[2]), int(toks[3]), pos + 1
+
 def pgm_load(filename):
 
     print('Loading image from file %s...' % filename)
-    
-    fd = open(filename, 'rt')
-    
-    # Skip constant header
-    fd.readline()
-    
-    # Grab image size (assume square)
-    imgsize = [int(tok) for tok in fd.readline().split()]
-        
-    # Start with empty list
-    imglist = []
-    
-    # Read lines and append them to list until done
-    while True:  
-        
-        line = fd.readline()
-        
-        if len(line) == 0:
-            break       
-            
-        imglist.extend([int(tok) for tok in line.split()])   
-
-    fd.close()
-    
-    # Convert list into bytes
-    imgbytes = bytearray(imglist)     
-
-    return imgbytes, imgsize
-    
-def pgm_save(filename, imgbytes, imgsize):    
-    
+
+    with open(filename, 'rb') as fd:
+        data = fd.read()
+
+    magic, wid, hgt, maxval, offset = _pgm_header(data)
+
+    if magic == 'P5':
+        imgbytes = bytearray(data[offset:offset + wid * hgt])
+
+    elif magic == 'P2':
+        imgbytes = bytearray(map(int, data[offset:].split()))
+
+    else:
+        raise ValueError('%s is not a grayscale PGM file' % filename)
+
+    if len(imgbytes) != wid * hgt:
+        raise ValueError('%s is truncated' % filename)
+
+    return imgbytes, [wid, hgt]
+
+def pgm_save(filename, imgbytes, imgsize, binary=True):
+
     print('\nSaving image to file %s' % filename)
-        
-    output = open(filename, 'wt')
-    
-    output.write('P2\n%d %d 255\n' % imgsize)
-    
+
     wid, hgt = imgsize
-    
-    for y in range(hgt):
-        for x in range(wid):
-            output.write('%d ' % imgbytes[y * wid + x])
-        output.write('\n')
 
-    output.close()
+    # bytes() accepts bytearray, bytes, memoryview and NumPy uint8 arrays alike
+    pixels = bytes(imgbytes)[:wid * hgt]
+
+    with open(filename, 'wb') as output:
+
+        if binary:
+            output.write(b'P5\n%d %d 255\n' % (wid, hgt))
+            output.write(pixels)
 
-     
-                                        
+        else:
+            output.write(b'P2\n%d %d 255\n' % (wid, hgt))
+            output.write(b''.join(b' '.join(b'%d' % v for v in pixels[y * wid:(y + 1) * wid]) + b' \n'
+                                  for y in range(hgt)))
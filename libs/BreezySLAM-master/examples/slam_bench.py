@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+
+'''
+slam_bench.py : Benchmark suite for the BreezySLAM core.  Times the scan update,
+                the scan-to-map distance, the map update and full RMHC_SLAM /
+                Deterministic_SLAM updates on the Paris Mines Tech logs and on
+                synthetic scans of a room with pillars, reporting updates per
+                second and nanoseconds per scan point.
+
+                Results can be saved as a baseline (--save) and later runs
+                compared against it (--baseline): the script exits with status 1
+                when any benchmark is slower per point than the baseline by
+                more than the tolerance.
+
+Example:
+
+    ./slam_bench.py --save baseline.json
+    (change something, rebuild)
+    ./slam_bench.py --baseline baseline.json --tolerance 0.15
+
+Copyright (C) 2014 Simon D. Levy
+
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+MAP_SIZE_PIXELS     = 800
+MAP_SIZE_METERS     = 32
+MAP_QUALITY         = 50
+HOLE_WIDTH_MM       = 600
+RANDOM_SEED         = 9999
+CANDIDATES_PER_SCAN = 32
+SIGMA_XY_MM         = 100
+SIGMA_THETA_DEGREES = 20
+
+# Synthetic scans: a 360-degree Lidar in a 12 x 9 m room with round pillars,
+# the robot driving a circle around the room center
+SYNTHETIC_SCANS         = 500
+SYNTHETIC_SCAN_SIZE     = 1440
+SYNTHETIC_RANGE_MM      = 8000
+SYNTHETIC_NOISE_MM      = 10
+SYNTHETIC_ROOM_MM       = (12000, 9000)
+SYNTHETIC_PILLARS_MM    = ((-3000, -2000, 300), (3000, -2000, 300), (-3000, 2000, 300), (3000, 2000, 300))
+SYNTHETIC_PATH_RADIUS_MM = 2000
+
+import argparse
+import json
+import sys
+from time import perf_counter
+
+import numpy as np
+
+import pybreezyslam
+from breezyslam.algorithms import Deterministic_SLAM, RMHC_SLAM
+from breezyslam.sensors import Laser
+
+from mines import MinesLaser, load_data
+
+class SyntheticLaser(Laser):
+
+    def __init__(self):
+
+        Laser.__init__(self, SYNTHETIC_SCAN_SIZE, 10, 360, SYNTHETIC_RANGE_MM)
+
+def synthetic_scans(laser, nscans):
+    '''
+    Ray-casts nscans scans of the synthetic room.  Returns the scans (int32 rows, 0 for
+    no detection) and the true positions (x_mm, y_mm, theta_degrees) in map coordinates.
+    '''
+
+    rng = np.random.default_rng(RANDOM_SEED)
+    center_mm = 500 * MAP_SIZE_METERS
+    half_w, half_h = SYNTHETIC_ROOM_MM[0] / 2, SYNTHETIC_ROOM_MM[1] / 2
+
+    # Same ray angles as scan_update() in the C core
+    k = np.arange(laser.scan_size)
+    ray_angles = np.radians(-laser.detection_angle_degrees / 2 +
+                            k * laser.detection_angle_degrees / (laser.scan_size - 1))
+
+    scans = np.zeros((nscans, laser.scan_size), dtype=np.int32)
+    positions = []
+
+    for i in range(nscans):
+
+        phase = 2 * np.pi * i / nscans
+        x = SYNTHETIC_PATH_RADIUS_MM * np.cos(phase)
+        y = SYNTHETIC_PATH_RADIUS_MM * np.sin(phase)
+        theta = phase + np.pi / 2
+
+        c = np.cos(theta + ray_angles)
+        s = np.sin(theta + ray_angles)
+
+        # Walls of the room, from inside (axis-parallel rays never reach the other pair)
+        cx = np.where(np.abs(c) > 1e-9, c, 1e-9)
+        sy = np.where(np.abs(s) > 1e-9, s, 1e-9)
+        tx = np.where(cx > 0, half_w - x, -half_w - x) / cx
+        ty = np.where(sy > 0, half_h - y, -half_h - y) / sy
+        dist = np.minimum(tx, ty)
+
+        # Pillars: nearest positive root of |p + t d - center|^2 = r^2
+        for px, py, r in SYNTHETIC_PILLARS_MM:
+            ox, oy = x - px, y - py
+            b = ox * c + oy * s
+            disc = b * b - (ox * ox + oy * oy - r * r)
+            hit = disc >= 0
+            t = -b - np.sqrt(np.where(hit, disc, 0))
+            dist = np.where(hit & (t > 0) & (t < dist), t, dist)
+
+        dist += rng.normal(0, SYNTHETIC_NOISE_MM, dist.shape)
+        scans[i] = np.where(dist < SYNTHETIC_RANGE_MM, dist, 0).astype(np.int32)
+        positions.append((center_mm + x, center_mm + y, np.degrees(theta) % 360))
+
+    return scans, positions
+
+def log_scans(dataset):
+    '''
+    Loads a Mines log.  The positions come from one seeded RMHC_SLAM pass (the Mines logs
+    have no ground truth); every benchmark replays the same positions.
+    '''
+
+    _, lidars, _ = load_data('.', dataset)
+
+    slam = RMHC_SLAM(MinesLaser(), MAP_SIZE_PIXELS, MAP_SIZE_METERS, random_seed=RANDOM_SEED)
+    positions = []
+    for lidar in lidars:
+        slam.update(lidar)
+        positions.append(slam.getpos())
+
+    return np.array(lidars, dtype=np.int32), positions
+
+def best_time(run, repeat):
+
+    best = None
+    for _ in range(repeat):
+        elapsed = run()
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+def bench_scan_update(laser, scans, repeat):
+
+    scan = pybreezyslam.Scan(laser, 3)
+
+    def run():
+        start = perf_counter()
+        for lidar in scans:
+            scan.update(scans_mm=lidar, hole_width_mm=HOLE_WIDTH_MM, velocities=(0, 0))
+        return perf_counter() - start
+
+    return best_time(run, repeat), scans.size
+
+def built_map(laser, scans, positions):
+    '''
+    Returns the map of all the scans replayed at their positions
+    '''
+
+    slammap = pybreezyslam.Map(MAP_SIZE_PIXELS, MAP_SIZE_METERS)
+    scan = pybreezyslam.Scan(laser, 3)
+
+    for lidar, position in zip(scans, positions):
+        scan.update(scans_mm=lidar, hole_width_mm=HOLE_WIDTH_MM, velocities=(0, 0))
+        slammap.update(scan, pybreezyslam.Position(*position), MAP_QUALITY, HOLE_WIDTH_MM)
+
+    return slammap
+
+def bench_distance(laser, scans, positions, repeat):
+
+    # Score against the final map, from candidate positions around each true position
+    slammap = built_map(laser, scans, positions)
+
+    rng = np.random.default_rng(RANDOM_SEED)
+    candidates = np.repeat(np.array(positions)[:, np.newaxis, :], CANDIDATES_PER_SCAN, axis=1)
+    candidates += rng.normal(0, 1, candidates.shape) * (SIGMA_XY_MM, SIGMA_XY_MM, SIGMA_THETA_DEGREES)
+
+    scan_rows = []
+    for lidar in scans:
+        scan = pybreezyslam.Scan(laser, 1)
+        scan.update(scans_mm=lidar, hole_width_mm=HOLE_WIDTH_MM, velocities=(0, 0))
+        scan_rows.append(scan)
+
+    distances = np.empty(CANDIDATES_PER_SCAN, dtype=np.int32)
+
+    def run():
+        start = perf_counter()
+        for scan, poses in zip(scan_rows, candidates):
+            pybreezyslam.distanceScanToMapBatch(slammap, scan, poses, distances)
+        return perf_counter() - start
+
+    # Only obstacle points (non-zero distances) are scored
+    return best_time(run, repeat), int(np.count_nonzero(scans)) * CANDIDATES_PER_SCAN
+
+def bench_map_update(laser, scans, positions, repeat):
+
+    scan_rows = []
+    for lidar in scans:
+        scan = pybreezyslam.Scan(laser, 3)
+        scan.update(scans_mm=lidar, hole_width_mm=HOLE_WIDTH_MM, velocities=(0, 0))
+        scan_rows.append(scan)
+
+    positions = [pybreezyslam.Position(*position) for position in positions]
+
+    def run():
+        slammap = pybreezyslam.Map(MAP_SIZE_PIXELS, MAP_SIZE_METERS)
+        start = perf_counter()
+        for scan, position in zip(scan_rows, positions):
+            slammap.update(scan, position, MAP_QUALITY, HOLE_WIDTH_MM)
+        return perf_counter() - start
+
+    return best_time(run, repeat), scans.size
+
+def bench_slam(make_slam, scans, pose_change, repeat):
+
+    def run():
+        slam = make_slam()
+        start = perf_counter()
+        for lidar in scans:
+            slam.update(lidar, pose_change)
+        return perf_counter() - start
+
+    return best_time(run, repeat), scans.size
+
+def run_benchmarks(sources, repeat):
+
+    results = {}
+
+    for source in sources:
+
+        if source == 'synthetic':
+            laser = SyntheticLaser()
+            scans, positions = synthetic_scans(laser, SYNTHETIC_SCANS)
+        else:
+            laser = MinesLaser()
+            scans, positions = log_scans(source)
+
+        benchmarks = (
+            ('scan_update', lambda: bench_scan_update(laser, scans, repeat)),
+            ('distance_scan_to_map', lambda: bench_distance(laser, scans, positions, repeat)),
+            ('map_update', lambda: bench_map_update(laser, scans, positions, repeat)),
+            ('RMHC_SLAM.update', lambda: bench_slam(
+                lambda: RMHC_SLAM(laser, MAP_SIZE_PIXELS, MAP_SIZE_METERS, random_seed=RANDOM_SEED), scans, None, repeat)),
+            ('Deterministic_SLAM.update', lambda: bench_slam(
+                lambda: Deterministic_SLAM(laser, MAP_SIZE_PIXELS, MAP_SIZE_METERS), scans,
+                (0, 0, 1. / laser.scan_rate_hz), repeat)),
+        )
+
+        for name, bench in benchmarks:
+
+            elapsed, npoints = bench()
+            key = '%s/%s' % (source, name)
+            results[key] = {
+                'updates_per_sec': len(scans) / elapsed,
+                'ns_per_point': 1e9 * elapsed / npoints,
+            }
+            print('%-40s %10.1f updates/s %10.2f ns/point' %
+                  (key, results[key]['updates_per_sec'], results[key]['ns_per_point']))
+            sys.stdout.flush()
+
+    return results
+
+def regressions(results, baseline, tolerance):
+    '''
+    Returns one message per benchmark slower per point than its baseline by more than tolerance
+    '''
+
+    messages = []
+    for key, result in results.items():
+        if key in baseline:
+            ratio = result['ns_per_point'] / baseline[key]['ns_per_point']
+            if ratio > 1 + tolerance:
+                messages.append('%s: %.2f ns/point vs %.2f baseline (%+.0f%%)' %
+                                (key, result['ns_per_point'], baseline[key]['ns_per_point'], 100 * (ratio - 1)))
+
+    return messages
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Benchmarks the BreezySLAM core on the Mines logs and synthetic scans.')
+    parser.add_argument('--sources', nargs='+', default=['exp1', 'exp2', 'synthetic'],
+                        help='Mines datasets (in this directory) and/or "synthetic"')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark; the fastest counts')
+    parser.add_argument('--save', metavar='FILE', help='save the results as a JSON baseline')
+    parser.add_argument('--baseline', metavar='FILE', help='compare against a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown per point against the baseline (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    print('BreezySLAM benchmark: %d x %d pixel map, %s distance kernel' %
+          (MAP_SIZE_PIXELS, MAP_SIZE_PIXELS, pybreezyslam.distanceKernel()))
+
+    results = run_benchmarks(args.sources, args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print('Saved results to %s' % args.save)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        messages = regressions(results, baseline, args.tolerance)
+        for message in messages:
+            print('REGRESSION %s' % message)
+        if messages:
+            sys.exit(1)
+        print('No regressions against %s (tolerance %.0f%%)' % (args.baseline, 100 * args.tolerance))
+
+main()
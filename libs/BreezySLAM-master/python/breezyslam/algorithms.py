@@ -57,10 +57,16 @@ class CoreSLAM(object):
       _updateMapAndPointcloud(scan_mm, dxy_mm, dtheta_degrees, should_update_map)
     
     to update the point-cloud (particle cloud) and map (if should_update_map true)
+
+    Threading: the C calls behind update() (scan update, position search, map
+    update) release the GIL, so other Python threads keep running while SLAM
+    works.  Map and Scan objects lock themselves, so getmap() may be called
+    from another thread during update(); update() itself must be called from
+    one thread at a time.
     '''
     
     def __init__(self, laser, map_size_pixels, map_size_meters, 
-        map_quality=_DEFAULT_MAP_QUALITY, hole_width_mm=_DEFAULT_HOLE_WIDTH_MM):
+        map_quality=_DEFAULT_MAP_QUALITY, hole_width_mm=_DEFAULT_HOLE_WIDTH_MM, map_tile_size=0):
         '''
         Creates a CoreSLAM object suitable for updating with new Lidar and odometry data.
         laser is a Laser object representing the specifications of your Lidar unit
@@ -68,11 +74,14 @@ class CoreSLAM(object):
         map_size_meters is the size of the square map in meters
         quality from 0 through 255 determines integration speed of scan into map
         hole_width_mm determines width of obstacles (walls)
+        map_tile_size > 1 (a power of two) stores the map in square tiles instead of rows; getmap() and
+           setmap() are unchanged
         '''
     
         # Initialize parameters
         self.map_quality = map_quality
         self.hole_width_mm = hole_width_mm   
+        self.map_update_threads = 1
         
         # Store laser for later
         self.laser = laser
@@ -82,17 +91,19 @@ class CoreSLAM(object):
         self.scan_for_mapbuild = pybreezyslam.Scan(laser, 3)
                 
         # Initialize the map 
-        self.map = pybreezyslam.Map(map_size_pixels, map_size_meters)
+        self.map = pybreezyslam.Map(map_size_pixels, map_size_meters, tile_size=map_tile_size)
                 
     def update(self, scans_mm, pose_change, scan_angles_degrees=None, should_update_map=True):
         '''
         Updates the scan and odometry, and calls the the implementing class's _updateMapAndPointcloud method with
         the specified pose change.
          
-        scan_mm is a list of Lidar scan values, whose count is specified in the scan_size 
-        attribute of the Laser object passed to the CoreSlam constructor
+        scan_mm is a list or NumPy array of Lidar scan values, whose count is specified in the scan_size 
+        attribute of the Laser object passed to the CoreSlam constructor (int32 arrays are read without
+        conversion)
         pose_change is a tuple (dxy_mm, dtheta_degrees, dt_seconds) computed from odometry
-        scan_angles_degrees is an optional list of angles corresponding to the distances in scans_mm
+        scan_angles_degrees is an optional list or NumPy array of angles corresponding to the distances in
+        scans_mm (float32 arrays are read without conversion)
         should_update_map flags for whether you want to update the map
         '''
 
@@ -111,7 +122,8 @@ class CoreSLAM(object):
         
     def getmap(self, mapbytes):
         '''
-        Fills bytearray mapbytes with current map pixels, where bytearray length is square of map size passed
+        Fills mapbytes with current map pixels, where mapbytes is any writable C-contiguous byte buffer
+        (bytearray, NumPy uint8 array, memoryview, shared memory) whose length is square of map size passed
         to CoreSLAM.__init__().
         '''
         self.map.get(mapbytes)
@@ -119,11 +131,30 @@ class CoreSLAM(object):
         
     def setmap(self, mapbytes):
         '''
-        Sets current map pixels to values in bytearray, where bytearray length is square of map size passed
+        Sets current map pixels to values in mapbytes, where mapbytes is any C-contiguous byte buffer
+        (bytearray, bytes, NumPy uint8 array, memoryview) whose length is square of map size passed
         to CoreSLAM.__init__().
         '''
         self.map.set(mapbytes)
 
+    def score_positions(self, poses):
+        '''
+        Scores K candidate positions against the current map using the most recent scan, without
+        running a search or touching the map. Supports relocalization, particle filters and custom
+        search strategies in Python.
+        poses is a sequence or NumPy array of shape (K, 3) holding (x_mm, y_mm, theta_degrees) rows
+        Returns a NumPy int32 array of K scan-to-map distances (lower is better; -1 for infinity).
+        '''
+        
+        import numpy as np
+        
+        poses = np.ascontiguousarray(poses, dtype=np.float64).reshape(-1, 3)
+        distances = np.empty(len(poses), dtype=np.int32)
+        
+        pybreezyslam.distanceScanToMapBatch(self.map, self.scan_for_distance, poses, distances)
+        
+        return distances
+
     def __str__(self):
         
         return 'CoreSLAM: %s \n          map quality = %d / 255 \n          hole width = %7.0f mm' % \
@@ -153,10 +184,10 @@ class SinglePositionSLAM(CoreSLAM):
     '''
 
     def __init__(self, laser, map_size_pixels, map_size_meters, 
-                map_quality=_DEFAULT_MAP_QUALITY, hole_width_mm=_DEFAULT_HOLE_WIDTH_MM):
+                map_quality=_DEFAULT_MAP_QUALITY, hole_width_mm=_DEFAULT_HOLE_WIDTH_MM, map_tile_size=0):
 
         CoreSLAM.__init__(self, laser, map_size_pixels, map_size_meters, 
-            map_quality, hole_width_mm)                    
+            map_quality, hole_width_mm, map_tile_size)                    
                     
         # Initialize the position (x, y, theta)
         init_coord_mm = 500 * map_size_meters # center of map
@@ -190,7 +221,8 @@ class SinglePositionSLAM(CoreSLAM):
   
         # Update the map with this new position if indicated
         if should_update_map:
-            self.map.update(self.scan_for_mapbuild, new_position, self.map_quality, self.hole_width_mm)
+            self.map.update(self.scan_for_mapbuild, new_position, self.map_quality, self.hole_width_mm,
+                            self.map_update_threads)
       
     def getpos(self):
         '''
@@ -198,6 +230,12 @@ class SinglePositionSLAM(CoreSLAM):
         '''
         return (self.position.x_mm, self.position.y_mm, self.position.theta_degrees)
                 
+    def setpos(self, x_mm, y_mm, theta_degrees):
+        '''
+        Sets current position, e.g. when resuming from a saved map
+        '''
+        self.position = pybreezyslam.Position(x_mm, y_mm, theta_degrees)
+                
         
     def _costheta(self):
         
@@ -222,7 +260,7 @@ class RMHC_SLAM(SinglePositionSLAM):
     def __init__(self, laser, map_size_pixels, map_size_meters, 
                 map_quality=_DEFAULT_MAP_QUALITY, hole_width_mm=_DEFAULT_HOLE_WIDTH_MM,
                 random_seed=None, sigma_xy_mm=_DEFAULT_SIGMA_XY_MM, sigma_theta_degrees=_DEFAULT_SIGMA_THETA_DEGREES, 
-                max_search_iter=_DEFAULT_MAX_SEARCH_ITER):
+                max_search_iter=_DEFAULT_MAX_SEARCH_ITER, search_threads=1, map_update_threads=1, map_tile_size=0):
         '''
         Creates a RMHCSlam object suitable for updating with new Lidar and odometry data.
         laser is a Laser object representing the specifications of your Lidar unit
@@ -236,10 +274,16 @@ class RMHC_SLAM(SinglePositionSLAM):
         sigma_theta_degrees specifies the standard deviation in degrees of the normal distribution of 
            the rotational component of position for RMHC search
         max_search_iter specifies the maximum number of iterations for RMHC search
+        search_threads > 1 runs that many independent RMHC climbs per update in parallel (one from the
+           odometry-predicted position, the others from perturbed starts) and keeps the best position
+           (on Windows, which has no search threads, it falls back to a single climb with a warning)
+        map_update_threads > 1 splits each map update across that many threads (same map, less latency;
+           on Windows the update stays on one thread, with a warning)
+        map_tile_size > 1 (a power of two) stores the map in square tiles instead of rows (same results)
         '''
     
         SinglePositionSLAM.__init__(self, laser, map_size_pixels, map_size_meters, 
-            map_quality, hole_width_mm)
+            map_quality, hole_width_mm, map_tile_size)
             
         if not random_seed:
             random_seed = int(time.time()) & 0xFFFF
@@ -249,6 +293,10 @@ class RMHC_SLAM(SinglePositionSLAM):
         self.sigma_xy_mm = sigma_xy_mm
         self.sigma_theta_degrees = sigma_theta_degrees
         self.max_search_iter = max_search_iter
+        self.map_update_threads = max(1, map_update_threads)
+        
+        # Worker threads and per-thread generators live in C for the lifetime of this object
+        self.search_pool = pybreezyslam.SearchPool(search_threads, random_seed) if search_threads > 1 else None
         
     def update(self, scans_mm, pose_change=None, scan_angles_degrees=None, should_update_map=True):
 
@@ -265,6 +313,16 @@ class RMHC_SLAM(SinglePositionSLAM):
         '''     
         
         # RMHC search is implemented as a C extension for efficiency
+        if self.search_pool is not None:
+            return pybreezyslam.rmhcPositionSearchParallel(
+                start_position, 
+                self.map, 
+                self.scan_for_distance, 
+                self.sigma_xy_mm,
+                self.sigma_theta_degrees,
+                self.max_search_iter,
+                self.search_pool)
+                
         return pybreezyslam.rmhcPositionSearch(
             start_position, 
             self.map, 
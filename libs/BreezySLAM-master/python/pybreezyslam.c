@@ -169,27 +169,221 @@ static position_t pypos2cpos(Position * pypos)
 }
 
 
+// Per-object locks ------------------------------------------------------------
+//
+// Long-running C calls release the GIL, so Map, Scan and Randomizer objects
+// each carry a lock that is held for the whole call, GIL or not.  Concurrent
+// calls on the same object are serialized; calls on different objects run
+// in parallel.  Rules that keep this deadlock-free:
+//   - never block on an object lock while holding the GIL (lock_object()
+//     releases it while waiting);
+//   - when a call needs several objects, lock them in the order
+//     Map, Scan, Randomizer.
+
+static PyThread_type_lock new_object_lock(void)
+{
+    PyThread_type_lock lock = PyThread_allocate_lock();
+
+    if (!lock)
+    {
+        PyErr_NoMemory();
+    }
+
+    return lock;
+}
+
+static void lock_object(PyThread_type_lock lock)
+{
+    if (!PyThread_acquire_lock(lock, NOWAIT_LOCK))
+    {
+        Py_BEGIN_ALLOW_THREADS
+        PyThread_acquire_lock(lock, WAIT_LOCK);
+        Py_END_ALLOW_THREADS
+    }
+}
+
+static void unlock_object(PyThread_type_lock lock)
+{
+    PyThread_release_lock(lock);
+}
+
+static void free_object_lock(PyThread_type_lock lock)
+{
+    if (lock)
+    {
+        PyThread_free_lock(lock);
+    }
+}
+
+// Buffer helpers ------------------------------------------------------------
+
+// Returns the struct-module code of a buffer's items, accepting native or little-endian
+// prefixes like "d", "<d", "=i"; 0 for multi-field formats
+static char buffer_format_code(Py_buffer * buf)
+{
+    const char * format = buf->format ? buf->format : "B";
+    
+    if (*format == '@' || *format == '=' || *format == '<')
+    {
+        format++;
+    }
+    
+    return (format[0] && format[1] == '\0') ? format[0] : 0;
+}
+
+static int buffer_has_format(Py_buffer * buf, char code, Py_ssize_t itemsize)
+{
+    return buffer_format_code(buf) == code && buf->itemsize == itemsize;
+}
+
+#define NUMBER_FORMATS(X) \
+    X('b', signed char) \
+    X('B', unsigned char) \
+    X('h', short) \
+    X('H', unsigned short) \
+    X('i', int) \
+    X('I', unsigned int) \
+    X('l', long) \
+    X('L', unsigned long) \
+    X('q', long long) \
+    X('Q', unsigned long long) \
+    X('f', float) \
+    X('d', double)
+
+static int buffer_holds_numbers(Py_buffer * buf)
+{
+    #define X(code, type) if (buffer_has_format(buf, code, sizeof(type))) return 1;
+    NUMBER_FORMATS(X)
+    #undef X
+
+    return 0;
+}
+
+// Scan distances and angles arrive either as a Python list or as a C-contiguous
+// buffer of numbers (NumPy array, memoryview, array.array)
+typedef struct
+{
+    PyObject * list;
+    Py_buffer buffer;
+    Py_ssize_t size;
+
+} number_sequence_t;
+
+// Returns 1 on success; 0, with no exception set, if obj is neither a list nor a numeric buffer
+static int number_sequence_open(PyObject * obj, number_sequence_t * seq)
+{
+    seq->list = NULL;
+    seq->buffer.obj = NULL;
+
+    if (PyList_Check(obj))
+    {
+        seq->list = obj;
+        seq->size = PyList_Size(obj);
+        return 1;
+    }
+
+    if (!PyObject_CheckBuffer(obj) || 
+        PyObject_GetBuffer(obj, &seq->buffer, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0)
+    {
+        PyErr_Clear();
+        return 0;
+    }
+
+    if (!buffer_holds_numbers(&seq->buffer))
+    {
+        PyBuffer_Release(&seq->buffer);
+        return 0;
+    }
+
+    seq->size = seq->buffer.len / seq->buffer.itemsize;
+    return 1;
+}
+
+static void number_sequence_close(number_sequence_t * seq)
+{
+    if (!seq->list)
+    {
+        PyBuffer_Release(&seq->buffer);
+    }
+}
+
+static int number_sequence_has_format(number_sequence_t * seq, char code, Py_ssize_t itemsize)
+{
+    return !seq->list && buffer_has_format(&seq->buffer, code, itemsize);
+}
+
+static void number_sequence_to_ints(number_sequence_t * seq, int * out)
+{
+    Py_ssize_t k = 0;
+
+    if (seq->list)
+    {
+        for (k=0; k<seq->size; ++k)
+        {
+            out[k] = (int)PyFloat_AsDouble(PyList_GetItem(seq->list, k));
+        }
+        return;
+    }
+
+    #define X(code, type) \
+    if (buffer_has_format(&seq->buffer, code, sizeof(type))) \
+    { \
+        const type * values = (const type *)seq->buffer.buf; \
+        for (k=0; k<seq->size; ++k) out[k] = (int)values[k]; \
+        return; \
+    }
+    NUMBER_FORMATS(X)
+    #undef X
+}
+
+static void number_sequence_to_floats(number_sequence_t * seq, float * out)
+{
+    Py_ssize_t k = 0;
+
+    if (seq->list)
+    {
+        for (k=0; k<seq->size; ++k)
+        {
+            out[k] = (float)PyFloat_AsDouble(PyList_GetItem(seq->list, k));
+        }
+        return;
+    }
+
+    #define X(code, type) \
+    if (buffer_has_format(&seq->buffer, code, sizeof(type))) \
+    { \
+        const type * values = (const type *)seq->buffer.buf; \
+        for (k=0; k<seq->size; ++k) out[k] = (float)values[k]; \
+        return; \
+    }
+    NUMBER_FORMATS(X)
+    #undef X
+}
+
 // Scan class ------------------------------------------------------------
 
-typedef struct 
+typedef struct
 {
     PyObject_HEAD
-    
+
     scan_t scan;
     int   * lidar_distances_mm;
     float * lidar_angles_deg;
-    
+
+    PyThread_type_lock lock;
+
 } Scan;
 
 
 static void
 Scan_dealloc(Scan* self)
-{        
+{
     scan_free(&self->scan);
-    
+
     free(self->lidar_distances_mm);
     free(self->lidar_angles_deg);
-    
+    free_object_lock(self->lock);
+
     Py_TYPE(self)->tp_free((PyObject*)self);
 }
 
@@ -247,7 +441,12 @@ Scan_init(Scan *self, PyObject *args, PyObject *kwds)
  
     self->lidar_distances_mm = int_alloc(self->scan.size);
     self->lidar_angles_deg   = float_alloc(self->scan.size);
-    
+
+    if (!self->lock && !(self->lock = new_object_lock()))
+    {
+        return -1;
+    }
+
     return 0;
 }
 
@@ -270,8 +469,8 @@ Scan_update(Scan *self, PyObject *args, PyObject *kwds)
 {
     PyObject * py_lidar = NULL;
     double hole_width_mm = 0;
-    PyObject * py_velocities = NULL;
-    PyObject * py_scan_angles_degrees = NULL;
+    PyObject * py_velocities = Py_None;
+    PyObject * py_scan_angles_degrees = Py_None;
 
     static char* argnames[] = {"scans_mm", "hole_width_mm", "velocities", "scan_angles_degrees", NULL};
 
@@ -284,81 +483,130 @@ Scan_update(Scan *self, PyObject *args, PyObject *kwds)
         return null_on_raise_argument_exception("Scan", "update");
     }
 
+    // Default to no velocities
+    double dxy_mm = 0;
+    double dtheta_degrees = 0;
+
+    // Bozo filter on velocities tuple
+    if (py_velocities != Py_None)
+    {
+        if (!PyTuple_Check(py_velocities))
+        {
+            return null_on_raise_argument_exception_with_details("Scan", "update", 
+                    "velocities must be a tuple");    
+        }
+
+        if (!double_from_tuple(py_velocities, 0, &dxy_mm) ||
+                !double_from_tuple(py_velocities, 1, &dtheta_degrees))
+        {
+            return null_on_raise_argument_exception_with_details("Scan", "update", 
+                    "velocities tuple must contain at least two numbers");    
+
+        }
+    }
+
     // Bozo filter on LIDAR argument
-    if (!PyList_Check(py_lidar))
+    number_sequence_t lidar;
+    if (!number_sequence_open(py_lidar, &lidar))
     {
         return null_on_raise_argument_exception_with_details("Scan", "update", 
-            "lidar must be a list");
+            "lidar must be a list or a buffer (e.g. NumPy array) of numbers");
     }
 
+    number_sequence_t angles;
+    int have_angles = py_scan_angles_degrees != Py_None;
+    const char * details = NULL;
+
     // Scan angles provided
-    if (py_scan_angles_degrees != Py_None) 
+    if (have_angles) 
     {
-        // Bozo filter #1: SCAN_ANGLES_DEGREES  must be a list
-        if (!PyList_Check(py_scan_angles_degrees))
+        // Bozo filter #1: SCAN_ANGLES_DEGREES  must be a list or a buffer
+        if (!number_sequence_open(py_scan_angles_degrees, &angles))
         {
+            number_sequence_close(&lidar);
             return null_on_raise_argument_exception_with_details("Scan", "update", 
-                    "scan angles must be a list");
+                    "scan angles must be a list or a buffer (e.g. NumPy array) of numbers");
         }
 
         // Bozo filter #2: must have same number of scan angles as scan distances
-        if (PyList_Size(py_lidar) != PyList_Size(py_scan_angles_degrees))
+        if (lidar.size != angles.size)
         {
-            return null_on_raise_argument_exception_with_details("Scan", "update", 
-                    "number of scan angles must equal number of scan distances");
+            details = "number of scan angles must equal number of scan distances";
+        }
+
+        // Bozo filter #3: the interpolation tables hold one scan's worth of points
+        else if (lidar.size > self->scan.size)
+        {
+            details = "too many scan distances";
         }
 
-        // Extract scan angle values from argument
-        for (int k=0; k<PyList_Size(py_scan_angles_degrees); ++k)
+        if (details)
         {
-            self->lidar_angles_deg[k] = (float)PyFloat_AsDouble(PyList_GetItem(py_scan_angles_degrees, k));
+            number_sequence_close(&angles);
         }
     }
 
-    // No scan angles provided; lidar-list size must match scan size
-    else if (PyList_Size(py_lidar) != self->scan.size)
+    // No scan angles provided; lidar size must match scan size
+    else if (lidar.size != self->scan.size)
     {        
-        return null_on_raise_argument_exception_with_details("Scan", "update", 
-                "lidar size mismatch");
+        details = "lidar size mismatch";
     }
 
-    // Default to no velocities
-    double dxy_mm = 0;
-    double dtheta_degrees = 0;
+    if (details)
+    {
+        number_sequence_close(&lidar);
+        return null_on_raise_argument_exception_with_details("Scan", "update", details);
+    }
 
-    // Bozo filter on velocities tuple
-    if (py_velocities != Py_None)
+    // The staging buffers belong to the scan: fill them under its lock
+    lock_object(self->lock);
+
+    // An int32 buffer can be used in place, unless angle interpolation overwrites the distances
+    int * lidar_distances_mm = self->lidar_distances_mm;
+    if (!have_angles && number_sequence_has_format(&lidar, 'i', sizeof(int)))
     {
-        if (!PyTuple_Check(py_velocities))
+        lidar_distances_mm = (int *)lidar.buffer.buf;
+    }
+    else
+    {
+        number_sequence_to_ints(&lidar, self->lidar_distances_mm);
+    }
+
+    float * lidar_angles_deg = NULL;
+    if (have_angles)
+    {
+        if (number_sequence_has_format(&angles, 'f', sizeof(float)))
         {
-            return null_on_raise_argument_exception_with_details("Scan", "update", 
-                    "velocities must be a tuple");    
+            lidar_angles_deg = (float *)angles.buffer.buf;
         }
-
-        if (!double_from_tuple(py_velocities, 0, &dxy_mm) ||
-                !double_from_tuple(py_velocities, 1, &dtheta_degrees))
+        else
         {
-            return null_on_raise_argument_exception_with_details("Scan", "update", 
-                    "velocities tuple must contain at least two numbers");    
-
+            number_sequence_to_floats(&angles, self->lidar_angles_deg);
+            lidar_angles_deg = self->lidar_angles_deg;
         }
     }
 
-    // Extract LIDAR values from argument
-    for (int k=0; k<PyList_Size(py_lidar); ++k)
-    {
-        self->lidar_distances_mm[k] = (int)PyFloat_AsDouble(PyList_GetItem(py_lidar, k));
-    }
+    int nlidar = (int)lidar.size;
 
     // Update the scan
+    Py_BEGIN_ALLOW_THREADS
     scan_update(
             &self->scan, 
-            (py_scan_angles_degrees != Py_None) ? self->lidar_angles_deg :NULL,
-            self->lidar_distances_mm, 
-            PyList_Size(py_lidar),
+            lidar_angles_deg,
+            lidar_distances_mm, 
+            nlidar,
             hole_width_mm,
             dxy_mm,
             dtheta_degrees);
+    Py_END_ALLOW_THREADS
+
+    unlock_object(self->lock);
+
+    number_sequence_close(&lidar);
+    if (have_angles)
+    {
+        number_sequence_close(&angles);
+    }
 
     Py_RETURN_NONE;
 
@@ -368,11 +616,13 @@ Scan_update(Scan *self, PyObject *args, PyObject *kwds)
 static PyMethodDef Scan_methods[] = 
 {
     {"update", (PyCFunction)Scan_update, METH_VARARGS | METH_KEYWORDS, 
-        "Scan.update(scans_mm, hole_width_mm, velocities=None) updates scan.\n"\
-            "scans_mm is a list of integers representing scanned distances in mm.\n"\
+        "Scan.update(scans_mm, hole_width_mm, velocities=None, scan_angles_degrees=None) updates scan.\n"\
+            "scans_mm is a list or a buffer (e.g. NumPy array) of numbers representing scanned distances in mm;\n"\
+            "an int32 buffer is read in place, without conversion.\n"\
             "hole_width_mm is the width of holes (obstacles, walls) in millimeters.\n"\
             "velocities is an optional tuple containing (dxy_mm/dt, dtheta_degrees/dt);\n"\
-            "i.e., robot's (forward, rotational velocity) for improving the quality of the scan."
+            "i.e., robot's (forward, rotational velocity) for improving the quality of the scan.\n"\
+            "scan_angles_degrees is an optional list or buffer of angles, one per distance; a float32 buffer is read in place."
     },
     {NULL}  // Sentinel 
 };
@@ -381,7 +631,8 @@ static PyMethodDef Scan_methods[] =
     "A class for Lidar scans.\n" \
 "Scan.__init__(laser, span=1)\n"\
 "laser is a Laser object containing parameters of your laser rangefinder (Lidar)\n"\
-"    span supports spanning laser scan to cover the space better"
+"    span supports spanning laser scan to cover the space better\n"\
+"Thread-safe: update() holds a per-scan lock and releases the GIL while the scan is computed."
 
 
 static PyTypeObject pybreezyslam_ScanType = 
@@ -439,20 +690,26 @@ typedef struct
     PyObject_HEAD
     
     map_t map;
+
+    PyThread_type_lock lock;
     
 } Map;
 
-// Helper for Map.__init__(), Map.set()
-static int bad_mapbytes(PyObject * py_mapbytes, int size_pixels, const char * methodname)
+// Helper for Map.__init__(), Map.get(), Map.set(): exports any C-contiguous buffer of
+// size_pixels^2 bytes (bytearray, bytes, NumPy uint8 array, memoryview, shared memory)
+static int get_mapbytes(PyObject * py_mapbytes, Py_buffer * mapbytes, int size_pixels, int writable, 
+    const char * methodname)
 {    
-    if (!PyByteArray_Check(py_mapbytes))
+    int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT | (writable ? PyBUF_WRITABLE : 0);
+
+    if (PyObject_GetBuffer(py_mapbytes, mapbytes, flags) < 0)
     {
-        return error_on_raise_argument_exception_with_details("Map", methodname, 
-            "argument is not a byte array");        
+        return -1;
     }
     
-    if (PyByteArray_GET_SIZE(py_mapbytes) != (size_pixels * size_pixels))
+    if (mapbytes->itemsize != 1 || mapbytes->len != (Py_ssize_t)size_pixels * size_pixels)
     {        
+        PyBuffer_Release(mapbytes);
         return error_on_raise_argument_exception_with_details("Map", methodname, 
             "mapbytes are wrong size");
     }
@@ -464,6 +721,7 @@ static void
 Map_dealloc(Map* self)
 {            
     map_free(&self->map);
+    free_object_lock(self->lock);
     
     Py_TYPE(self)->tp_free((PyObject*)self);
 }
@@ -484,22 +742,42 @@ Map_init(Map *self, PyObject *args, PyObject *kwds)
 	int size_pixels;
 	double size_meters;
 	PyObject * py_bytes = NULL;
+	int tile_size = 0;
 	
-    static char * argnames[] = {"size_pixels", "size_meters", "bytes", NULL};
+    static char * argnames[] = {"size_pixels", "size_meters", "bytes", "tile_size", NULL};
 
-    if(!PyArg_ParseTupleAndKeywords(args, kwds,"id|O", argnames, 
+    if(!PyArg_ParseTupleAndKeywords(args, kwds,"id|Oi", argnames, 
         &size_pixels, 
         &size_meters, 
-        &py_bytes))
+        &py_bytes,
+        &tile_size))
     {
         return error_on_raise_argument_exception("Map");
     }
+    
+    if (tile_size < 0 || (tile_size & (tile_size - 1)))
+    {
+        return error_on_raise_argument_exception_with_details("Map", "__init__", 
+            "tile_size must be 0 or a power of two");
+    }
            
-    map_init(&self->map, size_pixels, size_meters);
+    if (!self->lock && !(self->lock = new_object_lock()))
+    {
+        return -1;
+    }
+
+    map_init_tiled(&self->map, size_pixels, size_meters, tile_size);
     
-    if (py_bytes && !bad_mapbytes(py_bytes, size_pixels, "__init__"))
+    if (py_bytes && py_bytes != Py_None)
     {    
-        map_set(&self->map, PyByteArray_AsString(py_bytes));
+        Py_buffer mapbytes;
+        if (get_mapbytes(py_bytes, &mapbytes, size_pixels, 0, "__init__") < 0)
+        {
+            return -1;
+        }
+
+        map_set(&self->map, (char *)mapbytes.buf);
+        PyBuffer_Release(&mapbytes);
     }
     
     return 0;
@@ -527,12 +805,20 @@ Map_get(Map * self, PyObject * args, PyObject * kwds)
         return null_on_raise_argument_exception("Map", "get");
     }
     
-    if (bad_mapbytes(py_mapbytes, self->map.size_pixels, "get"))
+    // Exporting the buffer keeps its owner from resizing it while the GIL is released
+    Py_buffer mapbytes;
+    if (get_mapbytes(py_mapbytes, &mapbytes, self->map.size_pixels, 1, "get") < 0)
     {
-        Py_RETURN_NONE;
+        return NULL;
     }
-    
-    map_get(&self->map, PyByteArray_AsString(py_mapbytes));
+
+    lock_object(self->lock);
+    Py_BEGIN_ALLOW_THREADS
+    map_get(&self->map, (char *)mapbytes.buf);
+    Py_END_ALLOW_THREADS
+    unlock_object(self->lock);
+
+    PyBuffer_Release(&mapbytes);
     
     Py_RETURN_NONE;
 }
@@ -544,75 +830,121 @@ Map_set(Map * self, PyObject * args, PyObject * kwds)
 
     if (!PyArg_ParseTuple(args, "O", &py_mapbytes))
     {
-        return null_on_raise_argument_exception("Map", "get");
+        return null_on_raise_argument_exception("Map", "set");
     }
     
-    if (bad_mapbytes(py_mapbytes, self->map.size_pixels, "get"))
+    Py_buffer mapbytes;
+    if (get_mapbytes(py_mapbytes, &mapbytes, self->map.size_pixels, 0, "set") < 0)
     {
-        Py_RETURN_NONE;
+        return NULL;
     }
-    
-    map_set(&self->map, PyByteArray_AsString(py_mapbytes));
+
+    lock_object(self->lock);
+    Py_BEGIN_ALLOW_THREADS
+    map_set(&self->map, (char *)mapbytes.buf);
+    Py_END_ALLOW_THREADS
+    unlock_object(self->lock);
+
+    PyBuffer_Release(&mapbytes);
     
     Py_RETURN_NONE;
 }
 
+// Shared by Map.update() and Map.updateReference()
 static PyObject *
-Map_update(Map *self, PyObject *args, PyObject *kwds)
+map_update_from_args(Map *self, PyObject *args, const char * methodname, int reference)
 {   
     Scan * py_scan = NULL;
     Position * py_position = NULL;
     int map_quality = 0;
     double hole_width_mm = 0;
+    int nthreads = 1;
 	
-    if (!PyArg_ParseTuple(args, "OOid",
+    if (!PyArg_ParseTuple(args, "OOid|i",
         &py_scan,
         &py_position,
         &map_quality,
-        &hole_width_mm))
+        &hole_width_mm,
+        &nthreads))
     {
-        return null_on_raise_argument_exception("Map", "update");
+        return null_on_raise_argument_exception("Map", methodname);
     }
          
     if (error_on_check_argument_type((PyObject *)py_scan, &pybreezyslam_ScanType, 0,
-            "pybreezyslam.Scan", "Map", "update") ||
+            "pybreezyslam.Scan", "Map", methodname) ||
         error_on_check_argument_type((PyObject *)py_position, &pybreezyslam_PositionType, 0,
-            "pybreezyslam.Position", "Map", "update"))
+            "pybreezyslam.Position", "Map", methodname))
     {
         return NULL;
     }
             
     position_t position = pypos2cpos(py_position);
     
-    map_update(
-        &self->map, 
-        &py_scan->scan, 
-        position,
-        map_quality, 
-        hole_width_mm);
+    lock_object(self->lock);
+    lock_object(py_scan->lock);
+
+    Py_BEGIN_ALLOW_THREADS
+    if (reference)
+    {
+        map_update_reference(&self->map, &py_scan->scan, position, map_quality, hole_width_mm);
+    }
+    else if (nthreads > 1)
+    {
+        map_update_parallel(&self->map, &py_scan->scan, position, map_quality, hole_width_mm, nthreads);
+    }
+    else
+    {
+        map_update(&self->map, &py_scan->scan, position, map_quality, hole_width_mm);
+    }
+    Py_END_ALLOW_THREADS
+
+    unlock_object(py_scan->lock);
+    unlock_object(self->lock);
 
     Py_RETURN_NONE;
 }
 
+static PyObject *
+Map_update(Map *self, PyObject *args, PyObject *kwds)
+{   
+    return map_update_from_args(self, args, "update", 0);
+}
+
+static PyObject *
+Map_update_reference(Map *self, PyObject *args, PyObject *kwds)
+{   
+    return map_update_from_args(self, args, "updateReference", 1);
+}
+
 static PyMethodDef Map_methods[] = 
 {
     {"update", (PyCFunction)Map_update, METH_VARARGS, 
-    "Map.update(Scan, Position, quality, hole_width_mm) updates map based on scan and position.\n"\
+    "Map.update(Scan, Position, quality, hole_width_mm, threads=1) updates map based on scan and position.\n"\
     "Quality from 0 through 255 determines integration speed of scan into map.\n"\
-    "Hole width determines width of obstacles (walls)."
+    "Hole width determines width of obstacles (walls).\n"\
+    "threads > 1 splits the update across that many threads (bands of map rows); the map is the same."
+    },
+    {"updateReference", (PyCFunction)Map_update_reference, METH_VARARGS, 
+    "Map.updateReference(Scan, Position, quality, hole_width_mm) updates the map with the original\n"\
+    "CoreSLAM routine, for benchmarks and regression checks of Map.update()."
     },
     {"get", (PyCFunction)Map_get, METH_VARARGS,
-    "Map.get(bytearray) fills byte array with map pixels, where bytearray length is square of size of map."
+    "Map.get(mapbytes) fills mapbytes with map pixels, where mapbytes is any writable C-contiguous buffer\n"\
+    "of bytes (bytearray, NumPy uint8 array, memoryview, shared memory) whose length is square of size of map."
     },
     {"set", (PyCFunction)Map_set, METH_VARARGS,
-    "Map.set(bytearray) fills current map with pixels in bytearray, where bytearray length is square of size of map."
+    "Map.set(mapbytes) fills current map with pixels in mapbytes, where mapbytes is any C-contiguous buffer\n"\
+    "of bytes (bytearray, bytes, NumPy uint8 array, memoryview) whose length is square of size of map."
     },
     {NULL}  // Sentinel 
 };
 
 #define TP_DOC_MAP \
 "A class for maps used in SLAM.\n"\
-"Map.__init__(size_pixels, size_meters, bytes=None)"
+"Map.__init__(size_pixels, size_meters, bytes=None, tile_size=0)\n"\
+"tile_size > 1 (a power of two) stores the pixels in square tiles instead of rows; get() and set()\n"\
+"still use row-major bytes.\n"\
+"Thread-safe: every method holds a per-map lock, and update(), get() and set() release the GIL."
 
 
 static PyTypeObject pybreezyslam_MapType = 
@@ -669,6 +1001,8 @@ typedef struct
     PyObject_HEAD
     
     void * randomizer;
+
+    PyThread_type_lock lock;
     
 } Randomizer;
 
@@ -677,6 +1011,7 @@ static void
 Randomizer_dealloc(Randomizer* self)
 {            
     random_free(self->randomizer);
+    free_object_lock(self->lock);
     
     Py_TYPE(self)->tp_free((PyObject*)self);
 }
@@ -701,6 +1036,11 @@ Randomizer_init(Randomizer *self, PyObject *args, PyObject *kwds)
         return error_on_raise_argument_exception("Randomizer");
     }
     
+    if (!self->lock && !(self->lock = new_object_lock()))
+    {
+        return -1;
+    }
+
     self->randomizer = random_new(seed);
     
     return 0;
@@ -757,6 +1097,130 @@ static PyTypeObject pybreezyslam_RandomizerType =
 };
 
 
+// SearchPool class ------------------------------------------------------------
+
+typedef struct 
+{
+    PyObject_HEAD
+    
+    rmhc_pool_t * pool;
+    
+} SearchPool;
+
+
+static void
+SearchPool_dealloc(SearchPool* self)
+{            
+    if (self->pool)
+    {
+        rmhc_pool_free(self->pool);
+    }
+    
+    Py_TYPE(self)->tp_free((PyObject*)self);
+}
+
+static PyObject *
+SearchPool_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{    
+    SearchPool *self;
+    
+    self = (SearchPool *)type->tp_alloc(type, 0);
+    
+    return (PyObject *)self;
+}
+
+static int
+SearchPool_init(SearchPool *self, PyObject *args, PyObject *kwds)
+{                    
+    int nthreads;
+	int seed;
+	
+    if (!PyArg_ParseTuple(args, "ii", &nthreads, &seed))
+    {
+        return error_on_raise_argument_exception("SearchPool");
+    }
+    
+    if (self->pool)
+    {
+        rmhc_pool_free(self->pool);
+    }
+    
+    self->pool = rmhc_pool_new(nthreads, seed);
+    
+    if (!self->pool)
+    {
+        PyErr_SetString(PyExc_RuntimeError, "SearchPool: unable to start any search thread");
+        return -1;
+    }
+    
+    return 0;
+}
+
+static PyObject *
+SearchPool_get_threads(SearchPool *self, void *closure)
+{
+    return PyLong_FromLong(self->pool ? rmhc_pool_size(self->pool) : 0);
+}
+
+static PyGetSetDef SearchPool_getset[] = 
+{
+    {"threads", (getter)SearchPool_get_threads, NULL, "Number of parallel RMHC climbs per search", NULL},
+    {NULL}  // Sentinel
+};
+
+#define TP_DOC_SEARCHPOOL \
+"SearchPool(threads, seed) holds worker threads and per-thread random-number generators\n"\
+"for multi-start RMHC search.  If some threads cannot be started the pool runs fewer climbs\n"\
+"(see SearchPool.threads); if none can, RuntimeError is raised."
+
+static PyTypeObject pybreezyslam_SearchPoolType = 
+{
+    #if PY_MAJOR_VERSION < 3
+    PyObject_HEAD_INIT(NULL)
+    0,                                          // ob_size
+    #else
+    PyVarObject_HEAD_INIT(NULL, 0)
+    #endif
+    "pybreezyslam.SearchPool",                  // tp_name
+    sizeof(SearchPool),                         // tp_basicsize
+    0,                                          // tp_itemsize
+    (destructor)SearchPool_dealloc,             // tp_dealloc
+    0,                                          // tp_print
+    0,                                          // tp_getattr
+    0,                                          // tp_setattr
+    0,                                          // tp_compare
+    0,                                          // tp_repr
+    0,                                          // tp_as_number
+    0,                                          // tp_as_sequence
+    0,                                          // tp_as_positionping
+    0,                                          // tp_hash 
+    0,                                          // tp_call
+    0,                                          // tp_str
+    0,                                          // tp_getattro
+    0,                                          // tp_setattro
+    0,                                          // tp_as_buffer
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,   // tp_flags
+    TP_DOC_SEARCHPOOL,                          // tp_doc 
+    0,                                          // tp_traverse 
+    0,                                          // tp_clear 
+    0,                                          // tp_richcompare 
+    0,                                          // tp_weaklistoffset 
+    0,                                          // tp_iter 
+    0,                                          // tp_iternext 
+    0,                         					// tp_methods 
+    0,                         					// tp_members 
+    SearchPool_getset,                          // tp_getset 
+    0,                                          // tp_base 
+    0,                                          // tp_dict 
+    0,                                          // tp_descr_get 
+    0,                                          // tp_descr_set 
+    0,                                          // tp_dictoffset 
+    (initproc)SearchPool_init,                  // tp_init 
+    0,                                          // tp_alloc 
+    SearchPool_new,                             // tp_new 
+};
+
+
 // pybreezyslam module ------------------------------------------------------------
 
 
@@ -788,8 +1252,151 @@ distanceScanToMap(PyObject *self, PyObject *args)
     // Translate position object from Python to C
     position_t c_position = pypos2cpos(py_position);
     
-    // Run C version and return Python integer
-    return PyLong_FromLong(distance_scan_to_map(&py_map->map, &py_scan->scan, c_position));
+    // A single scan is quick: keep the GIL, but respect calls running without it
+    lock_object(py_map->lock);
+    lock_object(py_scan->lock);
+    int distance = distance_scan_to_map(&py_map->map, &py_scan->scan, c_position);
+    unlock_object(py_scan->lock);
+    unlock_object(py_map->lock);
+
+    // Return Python integer
+    return PyLong_FromLong(distance);
+}
+
+static PyObject *
+distanceScanToMapBatch(PyObject *self, PyObject *args)
+{   
+    Map * py_map = NULL;
+    Scan * py_scan = NULL;
+    PyObject * py_poses = NULL;
+    PyObject * py_distances = NULL;
+    
+    if (!PyArg_ParseTuple(args, "OOOO", &py_map, &py_scan, &py_poses, &py_distances))
+    {        
+        return null_on_raise_argument_exception("breezyslam", "distanceScanToMapBatch");
+    }
+    
+    if (error_on_check_argument_type((PyObject *)py_map, &pybreezyslam_MapType, 0,
+            "pybreezyslam.Map", "pybreezyslam", "distanceScanToMapBatch") ||
+        error_on_check_argument_type((PyObject *)py_scan, &pybreezyslam_ScanType, 1,
+            "pybreezyslam.Scan", "pybreezyslam", "distanceScanToMapBatch"))
+    {
+            return NULL;
+    }
+    
+    Py_buffer poses;
+    Py_buffer distances;
+    
+    if (PyObject_GetBuffer(py_poses, &poses, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0)
+    {
+        return NULL;
+    }
+    
+    if (PyObject_GetBuffer(py_distances, &distances, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT | PyBUF_WRITABLE) < 0)
+    {
+        PyBuffer_Release(&poses);
+        return NULL;
+    }
+    
+    int count = (int)(distances.len / sizeof(int));
+    
+    // Bozo filter: K x 3 doubles in, K ints out
+    if (!buffer_has_format(&poses, 'd', sizeof(double)) || 
+        !buffer_has_format(&distances, 'i', sizeof(int)) ||
+        poses.len != (Py_ssize_t)(3 * count * sizeof(double)))
+    {
+        PyBuffer_Release(&poses);
+        PyBuffer_Release(&distances);
+        return null_on_raise_argument_exception_with_details("breezyslam", "distanceScanToMapBatch", 
+            "poses must be K x 3 float64 and distances K int32");
+    }
+    
+    // Pure C loop over the poses: let other Python threads run meanwhile
+    lock_object(py_map->lock);
+    lock_object(py_scan->lock);
+    Py_BEGIN_ALLOW_THREADS
+    distance_scan_to_map_batch(&py_map->map, &py_scan->scan, (const double *)poses.buf, count, (int *)distances.buf);
+    Py_END_ALLOW_THREADS
+    unlock_object(py_scan->lock);
+    unlock_object(py_map->lock);
+    
+    PyBuffer_Release(&poses);
+    PyBuffer_Release(&distances);
+    
+    Py_RETURN_NONE;
+}
+
+// Called internally, so minimal type-checking on arguments
+static PyObject *
+rmhcPositionSearchParallel(PyObject *self, PyObject *args)
+{   	    
+    Position * py_start_pos = NULL;
+	Map * py_map = NULL;
+    Scan * py_scan = NULL;
+	double sigma_xy_mm = 0;
+	double sigma_theta_degrees = 0;
+	int max_search_iter = 0;
+	SearchPool * py_pool = NULL;
+	
+    if (!PyArg_ParseTuple(args, "OOOddiO", 
+        &py_start_pos,
+        &py_map,
+        &py_scan,
+        &sigma_xy_mm,
+        &sigma_theta_degrees,
+        &max_search_iter,
+        &py_pool))
+    {        
+        return null_on_raise_argument_exception("breezyslam.algorithms", "rmhcPositionSearchParallel");
+    }
+    
+    if (error_on_check_argument_type((PyObject *)py_pool, &pybreezyslam_SearchPoolType, 6,
+            "pybreezyslam.SearchPool", "pybreezyslam", "rmhcPositionSearchParallel"))
+    {
+            return NULL;
+    }
+    
+    if (!py_pool->pool)
+    {
+        PyErr_SetString(PyExc_ValueError, "rmhcPositionSearchParallel: SearchPool has no threads");
+        return NULL;
+    }
+    
+    position_t start_pos = pypos2cpos(py_start_pos);
+    position_t likeliest_position;
+    
+    // The climbs run on the pool's own threads: let other Python threads run meanwhile
+    lock_object(py_map->lock);
+    lock_object(py_scan->lock);
+    Py_BEGIN_ALLOW_THREADS
+	likeliest_position = 
+    rmhc_position_search_parallel(
+        py_pool->pool,
+        start_pos,
+        &py_map->map,
+        &py_scan->scan,
+        sigma_xy_mm,
+        sigma_theta_degrees,
+        max_search_iter);
+    Py_END_ALLOW_THREADS
+    unlock_object(py_scan->lock);
+    unlock_object(py_map->lock);
+    
+    PyObject * argList = Py_BuildValue("ddd", 
+        likeliest_position.x_mm, 
+        likeliest_position.y_mm, 
+        likeliest_position.theta_degrees); 
+    PyObject * py_likeliest_position = 
+    PyObject_CallObject((PyObject *) &pybreezyslam_PositionType, argList);
+    Py_DECREF(argList);	
+    
+    return py_likeliest_position;
+}
+
+static PyObject *
+distanceKernel(PyObject *self, PyObject *args)
+{
+    return PyUnicode_FromString(distance_scan_to_map_kernel());
 }
 
 // Called internally, so minimal type-checking on arguments
@@ -821,8 +1428,14 @@ rmhcPositionSearch(PyObject *self, PyObject *args)
     
     // Convert Python objects to C structures
     position_t start_pos = pypos2cpos(py_start_pos);
-
-	position_t likeliest_position = 
+    position_t likeliest_position;
+
+    // Pure C search: let other Python threads run meanwhile
+    lock_object(py_map->lock);
+    lock_object(py_scan->lock);
+    lock_object(py_randomizer->lock);
+    Py_BEGIN_ALLOW_THREADS
+	likeliest_position = 
     rmhc_position_search(
         start_pos,
         &py_map->map,
@@ -831,6 +1444,10 @@ rmhcPositionSearch(PyObject *self, PyObject *args)
         sigma_theta_degrees,
         max_search_iter,
         py_randomizer->randomizer);    
+    Py_END_ALLOW_THREADS
+    unlock_object(py_randomizer->lock);
+    unlock_object(py_scan->lock);
+    unlock_object(py_map->lock);
     
     
     // Convert C position back to Python object
@@ -857,10 +1474,24 @@ static PyMethodDef module_methods[] =
     "scan is a breezyslam.components.Scan object\n"\
     "position is a breezyslam.components.Position object\n"\
     },
+    {"distanceScanToMapBatch", distanceScanToMapBatch, METH_VARARGS,
+        "distanceScanToMapBatch(map, scan, poses, distances)\n"
+    "Scores K hypothetical positions at once, releasing the GIL during the loop.\n"\
+    "poses is a C-contiguous buffer of K x 3 float64 values (x_mm, y_mm, theta_degrees)\n"\
+    "distances is a writable C-contiguous buffer of K int32 values that receives the scores (-1 for infinity)\n"\
+    },
+    {"distanceKernel", distanceKernel, METH_NOARGS,
+        "distanceKernel()\n"
+    "Returns the name of the scan-to-map distance kernel selected for this CPU (e.g. \"avx2\").\n"\
+    },
     {"rmhcPositionSearch", rmhcPositionSearch, METH_VARARGS,
         "rmhcPositionSearch(startpos, map, scan, laser, sigma_xy_mm, max_iter, randomizer)\n"
     "Internal use only."
     },
+    {"rmhcPositionSearchParallel", rmhcPositionSearchParallel, METH_VARARGS,
+        "rmhcPositionSearchParallel(startpos, map, scan, sigma_xy_mm, sigma_theta_degrees, max_iter, pool)\n"
+    "Internal use only."
+    },
     {NULL, NULL, 0, NULL}        /* Sentinel */
 };
 
@@ -870,6 +1501,7 @@ static void add_classes(PyObject * module)
     add_class(module, &pybreezyslam_MapType, "Map");
     add_class(module, &pybreezyslam_PositionType, "Position");
     add_class(module, &pybreezyslam_RandomizerType, "Randomizer");
+    add_class(module, &pybreezyslam_SearchPoolType, "SearchPool");
 }
 
 static int types_are_ready(void)
@@ -878,7 +1510,8 @@ return
     type_is_ready(&pybreezyslam_ScanType) &&
     type_is_ready(&pybreezyslam_MapType) &&
     type_is_ready(&pybreezyslam_PositionType) &&
-    type_is_ready(&pybreezyslam_RandomizerType);
+    type_is_ready(&pybreezyslam_RandomizerType) &&
+    type_is_ready(&pybreezyslam_SearchPoolType);
 }
 
 #if PY_MAJOR_VERSION < 3
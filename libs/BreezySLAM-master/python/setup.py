@@ -27,6 +27,12 @@ arch = machine()
 print(f"Arquitetura detectada: {arch}")
 
 if arch in ['i686', 'x86_64', 'AMD64']: # Adicionado AMD64 para garantir
+    # SSE3 é a base; os kernels AVX2/AVX-512 de coreslam_i686.c são compilados
+    # com atributos de target por função e escolhidos em tempo de execução,
+    # então o mesmo binário usa o melhor kernel de cada máquina (veja
+    # pybreezyslam.distanceKernel() e a variável BREEZYSLAM_KERNEL). Os kernels
+    # largos desligam a contração em FMA para arredondar igual ao SSE3;
+    # examples/kernel_check.py confere que todos dão o mesmo resultado num log.
     SIMD_FLAGS = ['-msse3']
     arch = 'i686'
 elif arch == 'armv7l':
@@ -44,14 +50,22 @@ SOURCES = [
     '../c/coreslam.c', 
     '../c/coreslam_' + arch + '.c',
     '../c/random.c',
-    '../c/ziggurat.c'
+    '../c/ziggurat.c',
+    '../c/rmhc_parallel.c',
+    '../c/map_update_parallel.c'
 ]
 
+# Busca RMHC paralela (rmhc_parallel.c) e atualização paralela do mapa
+# (map_update_parallel.c) usam POSIX threads fora do Windows
+if sys.platform != 'win32':
+    OPT_FLAGS.append('-pthread')
+
 # Define a extensão C, agora com os caminhos corretos para o linker
 module = Extension(
     'pybreezyslam', 
     sources=SOURCES, 
     extra_compile_args=['-std=gnu99'] + SIMD_FLAGS + OPT_FLAGS,
+    extra_link_args=['-pthread'] if sys.platform != 'win32' else [],
     
     # --- NOSSA CORREÇÃO PARA O LINKER (Aplicada aqui) ---
     library_dirs=[PYTHON_LIB_DIR],
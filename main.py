@@ -9,9 +9,9 @@ negócio complexa (navegação, SLAM, etc.), mas é responsável por:
    os diferentes componentes na sequência correta.
 """
 
+import argparse
 import math
 import os
-from PIL import Image
 from collections import deque
 import numpy as np
 import time
@@ -21,24 +21,26 @@ from src.hardware.serial_handler import SerialHandler
 from src.communication.mqtt_publisher import MqttPublisher
 from src.robot.state import RobotState
 from src.robot.chassis import Chassis
+from src.robot.scan import Scan
 from src.mapping.slam_manager import SLAMManager
+from src.mapping.submap_slam import SubmapSLAMManager
 from src.navigation.navigator import Navigator
 from src.odometry.laser_odometry import LaserOdometry
+from src.persistence import CheckpointManager, SessionRecorder
 from robot_specifications import (
     STALLED_DISTANCE_THRESHOLD_CM,
     MAP_COVERAGE_STABILITY_THRESHOLD,
     CYCLES_TO_CONFIRM_COMPLETION
 )
 
-def save_map_image(image: Image.Image, path: str):
+def save_map_image(slam_manager, path: str):
     """Função auxiliar para salvar a imagem do mapa no disco."""
     try:
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        image.save(path)
+        slam_manager.save_map(path)
     except Exception as e:
         print(f"[MAIN] Erro ao salvar a imagem do mapa: {e}")
 
-def main():
+def main(resume: bool = False):
     """
     Inicializa todos os subsistemas e executa o loop de controle principal do robô.
 
@@ -52,6 +54,10 @@ def main():
     6.  ATUALIZAÇÃO DE ESTADO: Corrige a pose do `RobotState` com a estimativa do SLAM.
     7.  PUBLICAÇÃO: Envia o mapa atualizado via MQTT.
     8.  VERIFICAÇÃO DE CONCLUSÃO: Checa se a missão de mapeamento terminou.
+    9.  CHECKPOINT: A cada N ciclos, salva o estado completo em segundo plano.
+
+    Args:
+        resume (bool): Se True, restaura o último checkpoint antes de iniciar o loop.
     """
     print("INICIANDO CÉREBRO AUTÔNOMO DO ROBÔ (ARQUITETURA HÍBRIDA)")
     try:
@@ -63,14 +69,46 @@ def main():
         robot_state = RobotState(*initial_pose_cm_rad)
         
         chassis = Chassis(serial_handler)
-        slam_manager = SLAMManager(settings.map_width_px, settings.map_size_meters)
+        if settings.slam_submaps:
+            slam_manager = SubmapSLAMManager(settings.map_width_px, settings.map_size_meters,
+                                             submap_size_meters=settings.slam_submap_size_meters,
+                                             scans_per_submap=settings.slam_scans_per_submap,
+                                             aggregation_window=settings.slam_aggregation_window,
+                                             use_keyframes=settings.slam_keyframes,
+                                             search_threads=settings.slam_search_threads,
+                                             map_update_threads=settings.slam_map_update_threads)
+        else:
+            slam_manager = SLAMManager(settings.map_width_px, settings.map_size_meters,
+                                       use_worker_process=settings.slam_worker_process,
+                                       aggregation_window=settings.slam_aggregation_window,
+                                       use_chunked_map=settings.slam_chunked_map,
+                                       chunk_size_pixels=settings.slam_chunk_size_px,
+                                       use_keyframes=settings.slam_keyframes,
+                                       search_threads=settings.slam_search_threads,
+                                       map_update_threads=settings.slam_map_update_threads)
         navigator = Navigator(danger_threshold_cm=50.0)
         laser_odometry = LaserOdometry()
+        use_map_odometry = settings.scan_to_map_odometry and not settings.slam_submaps
+        if settings.scan_to_map_odometry and settings.slam_submaps:
+            print("[MAIN] AVISO: SCAN_TO_MAP_ODOMETRY ignorado com SLAM_SUBMAPS.")
         
         # Buffers para a lógica de fim de missão
         odometry_history = deque(maxlen=30)
         last_map_coverage = 0
         consecutive_stable_cycles = 0
+
+        checkpoint_manager = CheckpointManager(settings.checkpoint_path,
+                                               settings.checkpoint_interval_cycles)
+        session_recorder = SessionRecorder(settings.session_record_path) if settings.session_record_path else None
+        if resume:
+            try:
+                mission = checkpoint_manager.restore(slam_manager, robot_state, navigator, mission_keys=(
+                    'odometry_history', 'last_map_coverage', 'consecutive_stable_cycles'))
+                odometry_history.extend(tuple(delta) for delta in mission['odometry_history'])
+                last_map_coverage = mission['last_map_coverage']
+                consecutive_stable_cycles = mission['consecutive_stable_cycles']
+            except Exception as e:
+                print(f"[MAIN] Não foi possível retomar do checkpoint ({e}). Iniciando do zero.")
         print("[MAIN] Todos os componentes foram inicializados com sucesso.")
 
     except Exception as e:
@@ -81,23 +119,27 @@ def main():
         # FASE 2: PRIMEIRO SCAN
         print("[MAIN] Realizando o primeiro scan para obter o estado inicial do ambiente")
         serial_handler.enviar_comando('e')
-        scan_data_cm = serial_handler.receber_scan_dados()
-        if not scan_data_cm:
+        # O scan é convertido uma única vez (`Scan`) e compartilhado por
+        # navegação, odometria e SLAM.
+        scan = Scan(serial_handler.receber_scan_dados())
+        if not scan:
             print("[MAIN] ERRO: Scan inicial falhou.")
             return
         
         # Inicializa o calculador de odometria com o primeiro scan.
-        laser_odometry.calculate_delta(scan_data_cm)
+        laser_odometry.calculate_delta(scan)
 
         # FASE 3: LOOP DE CONTROLE PRINCIPAL
+        cycle = 0
         while True:
+            cycle += 1
             pose_antes_da_correcao = robot_state.get_pose_cm_rad()
             x_cm, y_cm, theta_rad = pose_antes_da_correcao
             theta_deg = math.degrees(theta_rad)
             print(f"\n--- Novo Ciclo --- Pose Atual: {robot_state}")
 
             # 1. NAVEGAÇÃO (com memória espacial)
-            action = navigator.decide_next_action(scan_data_cm, robot_pose=(x_cm, y_cm, theta_deg))
+            action = navigator.decide_next_action(scan, robot_pose=(x_cm, y_cm, theta_deg))
             
             # 2. AÇÃO
             chassis.execute_action(action)
@@ -119,13 +161,26 @@ def main():
 
             # 4. PERCEPÇÃO (após movimento)
             serial_handler.enviar_comando('e')
-            scan_data_cm_atual = serial_handler.receber_scan_dados()
-            if not scan_data_cm_atual:
+            scan_atual = Scan(serial_handler.receber_scan_dados())
+            if not scan_atual:
                 print("[MAIN] AVISO: Falha no scan durante o loop.")
                 continue
 
+            # Refinamento opcional: casa o scan com o mapa a partir da pose do SLAM
+            # (o delta passa a ser relativo à pose do SLAM, e não à dos encoders)
+            odometry_heading_rad = theta
+            if use_map_odometry:
+                map_array, mm_per_pixel, map_origin_cm = slam_manager.get_map_frame()
+                slam_pose_cm_rad = slam_manager.get_corrected_pose_cm_rad()
+                global_odometry_delta = laser_odometry.calculate_delta_to_map(
+                    scan_atual, global_odometry_delta, slam_pose_cm_rad,
+                    map_array, mm_per_pixel, map_origin_cm)
+                odometry_heading_rad = slam_pose_cm_rad[2]
+
             # 5. MAPEAMENTO E LOCALIZAÇÃO (SLAM)
-            slam_manager.update(scan_data_cm_atual, global_odometry_delta)
+            if session_recorder:
+                session_recorder.record(scan_atual.readings, global_odometry_delta)
+            slam_manager.update(scan_atual, global_odometry_delta, odometry_heading_rad)
             corrected_pose_cm_rad = slam_manager.get_corrected_pose_cm_rad()
             
             # Bloco de diagnóstico para comparar a odometria ICP com a correção final do SLAM
@@ -139,23 +194,27 @@ def main():
             distancia_correcao = math.sqrt(dx_correcao**2 + dy_correcao**2)
             
             print(f"[DIAGNOSTICO] Odometria Encoders (dx, dy): ({dx_chute:.2f}, {dy_chute:.2f})")
-            print(f"[DIAGNOSTICO] ⛔ SLAM DESABILITADO - correção ignorada: ({dx_correcao:.2f}, {dy_correcao:.2f})")
-            print(f"[MAIN] 🎯 Usando encoders virtuais puros (sem SLAM)")
-            
-            corrected_pose_cm_rad = (
-                pose_depois_do_chute_x,
-                pose_depois_do_chute_y,
-                pose_depois_do_chute_theta
-            )
+            if settings.slam_submaps:
+                # Com submapas e fechamento de laço, a pose do SLAM é confiável
+                # e passa a corrigir a odometria.
+                print(f"[DIAGNOSTICO] Correção do SLAM (submapas): ({dx_correcao:.2f}, {dy_correcao:.2f})")
+            else:
+                print(f"[DIAGNOSTICO] ⛔ SLAM DESABILITADO - correção ignorada: ({dx_correcao:.2f}, {dy_correcao:.2f})")
+                print(f"[MAIN] 🎯 Usando encoders virtuais puros (sem SLAM)")
+
+                corrected_pose_cm_rad = (
+                    pose_depois_do_chute_x,
+                    pose_depois_do_chute_y,
+                    pose_depois_do_chute_theta
+                )
             
             # 6. ATUALIZAÇÃO DE ESTADO
             robot_state.update_pose(*corrected_pose_cm_rad)
-            print(f"[MAIN] Pose atualizada (ICP puro): {robot_state}")
+            print(f"[MAIN] Pose atualizada: {robot_state}")
 
             # 7. PUBLICAÇÃO
-            map_image = slam_manager.get_map_image()
             caminho_mapa = os.path.join(settings.map_output_dir, "map_slam_latest.png")
-            save_map_image(map_image, caminho_mapa)
+            save_map_image(slam_manager, caminho_mapa)
             mqtt_publisher.publicar_mapa(caminho_mapa)
 
             # 8. VERIFICAÇÃO DE CONCLUSÃO DA MISSÃO
@@ -163,8 +222,7 @@ def main():
                 total_frente_moved = sum(delta[0] for delta in odometry_history)
                 robot_is_stalled = abs(total_frente_moved) < STALLED_DISTANCE_THRESHOLD_CM
                 
-                map_array = np.array(map_image.convert('L'))
-                current_map_coverage = np.count_nonzero(map_array)
+                current_map_coverage = np.count_nonzero(slam_manager.get_map_array())
                 coverage_growth = current_map_coverage - last_map_coverage
                 map_is_stable = coverage_growth < MAP_COVERAGE_STABILITY_THRESHOLD
                 
@@ -179,8 +237,15 @@ def main():
                 if consecutive_stable_cycles >= CYCLES_TO_CONFIRM_COMPLETION:
                     print("\n" + "="*50); print("MISSÃO CONCLUÍDA"); print("="*50)
                     break
-            
-            scan_data_cm = scan_data_cm_atual
+
+            # 9. CHECKPOINT
+            checkpoint_manager.maybe_save(cycle, slam_manager, robot_state, navigator, {
+                'odometry_history': [list(delta) for delta in odometry_history],
+                'last_map_coverage': int(last_map_coverage),
+                'consecutive_stable_cycles': consecutive_stable_cycles,
+            })
+
+            scan = scan_atual
 
     except KeyboardInterrupt:
         print("\n[MAIN] Comando de encerramento recebido (Ctrl+C).")
@@ -191,7 +256,18 @@ def main():
             serial_handler.fechar_conexao()
         if 'mqtt_publisher' in locals():
             mqtt_publisher.publicar_status("OFFLINE")
+        if 'checkpoint_manager' in locals():
+            checkpoint_manager.wait()
+        if locals().get('session_recorder'):
+            print(f"[MAIN] Sessão gravada: {session_recorder.cycles} ciclos em {session_recorder.path}")
+            session_recorder.close()
+        if 'slam_manager' in locals():
+            print(f"[MAIN] Atualizações do SLAM: {slam_manager.keyframe_stats}")
+            slam_manager.close()
         print("\n--- PROGRAMA FINALIZADO ---")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Cérebro autônomo do robô de mapeamento.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Retoma a missão a partir do último checkpoint salvo.")
+    main(resume=parser.parse_args().resume)
\ No newline at end of file
@@ -23,7 +23,8 @@ RAIO_ROBO_CM = 4.0
 # PARÂMETROS DA SIMULAÇÃO FÍSICA
 # Controlam a precisão e o comportamento do motor de física da simulação.
 # ==============================================================================
-SUBPASSOS_FISICA = 10
+DESLIZAR_NAS_PAREDES = False
+MAX_CONTATOS_POR_FRAME = 3
 
 # ==============================================================================
 # PARÂMETROS DE NAVEGAÇÃO E MISSÃO
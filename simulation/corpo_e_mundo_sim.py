@@ -5,11 +5,19 @@ no mundo virtual, gerenciando sua pose, movimento e interações físicas.
 
 import math
 from simulation.planta_virtual import Planta
-from robot_specifications import (
-    VELOCIDADE_MAX_LINEAR_CM_S,
-    VELOCIDADE_MAX_ANGULAR_GRAUS_S,    
-    SUBPASSOS_FISICA
-)
+from simulation.corpos_em_lote import CorposEmLote
+
+
+def _campo_do_lote(nome: str) -> property:
+    """Cria uma property que lê/escreve a coluna `nome` na linha deste corpo."""
+    def getter(self):
+        return float(getattr(self.corpos, nome)[self.indice])
+
+    def setter(self, valor):
+        getattr(self.corpos, nome)[self.indice] = valor
+
+    return property(getter, setter)
+
 
 class CorpoRoboSimulado:
     """
@@ -21,21 +29,35 @@ class CorpoRoboSimulado:
     pelo FirmwareSimulado e interage com a Planta para colisões e leituras
     de sensor. Crucialmente, ela também simula "encoders de roda" ao acumular
     o deslocamento real a cada frame, fornecendo uma odometria precisa para o Cérebro.
+
+    O estado físico não fica em atributos Python: o corpo é uma "visão" sobre
+    uma linha de um `CorposEmLote`, o que permite integrar frotas inteiras em
+    um único passo vetorizado.
     """
     
-    def __init__(self):
-        """Inicializa o robô em uma posição padrão e zera suas velocidades e odometria."""
-        self.mundo = Planta()
-        self.x_cm, self.y_cm = 130, 140
-        self.angulo_rad = math.radians(180)
-        self.velocidade_linear = 0.0   # Percentual de -1.0 a 1.0
-        self.velocidade_angular = 0.0  # Percentual de -1.0 a 1.0
+    def __init__(self, corpos: CorposEmLote = None):
+        """
+        Inicializa o robô em uma posição padrão, parado e com a odometria zerada.
+
+        Args:
+            corpos (CorposEmLote): Armazenamento em lote (e mundo) compartilhado
+                                   onde este corpo ocupará uma linha. Se omitido,
+                                   um lote próprio com uma nova `Planta` é criado.
+        """
+        self.corpos = corpos if corpos is not None else CorposEmLote(Planta())
+        self.mundo = self.corpos.mundo
+        self.indice = self.corpos.adicionar_corpo(130, 140, math.radians(180))
         self.pontos_scan_vis = []
-        
-        # Atributos que simulam "encoders", acumulando o deslocamento real a cada frame.
-        self.delta_x_acumulado = 0.0
-        self.delta_y_acumulado = 0.0
-        self.delta_theta_acumulado = 0.0
+
+    # Pose, velocidades (percentual de -1.0 a 1.0) e "encoders" vivem no lote.
+    x_cm = _campo_do_lote('x_cm')
+    y_cm = _campo_do_lote('y_cm')
+    angulo_rad = _campo_do_lote('angulo_rad')
+    velocidade_linear = _campo_do_lote('velocidade_linear')
+    velocidade_angular = _campo_do_lote('velocidade_angular')
+    delta_x_acumulado = _campo_do_lote('delta_x_acumulado')
+    delta_y_acumulado = _campo_do_lote('delta_y_acumulado')
+    delta_theta_acumulado = _campo_do_lote('delta_theta_acumulado')
 
     def get_odometria_e_resetar(self) -> tuple[float, float, float]:
         """
@@ -44,11 +66,7 @@ class CorpoRoboSimulado:
         Este método é a interface para o Cérebro obter a odometria de alta precisão
         gerada pela simulação física.
         """
-        odometria = (self.delta_x_acumulado, self.delta_y_acumulado, self.delta_theta_acumulado)
-        self.delta_x_acumulado = 0.0
-        self.delta_y_acumulado = 0.0
-        self.delta_theta_acumulado = 0.0
-        return odometria
+        return self.corpos.get_odometria_e_resetar(self.indice)
     
     def set_velocidades(self, linear_percent: float, angular_percent: float):
         """Interface para o "controlador de motores", define as velocidades desejadas."""
@@ -71,53 +89,11 @@ class CorpoRoboSimulado:
         """
         O motor de física do robô, chamado a cada frame pelo loop principal.
 
-        Executa a simulação de movimento, considerando as colisões:
-        1.  Calcula a rotação e o deslocamento ideal para o intervalo de tempo `dt`.
-        2.  Divide o movimento em `SUBPASSOS_FISICA` para uma detecção de colisão precisa.
-        3.  Move o robô passo a passo, parando se colidir.
-        4.  Calcula o deslocamento real e o acumula para a odometria.
-        5.  Atualiza a pose "verdadeira" do robô.
+        Integra apenas a linha deste corpo no `CorposEmLote`. Para simular uma
+        frota inteira, chame `CorposEmLote.atualizar_fisica(dt)` uma única vez
+        por frame em vez de chamar este método para cada robô.
         """
-        x_inicial, y_inicial = self.x_cm, self.y_cm
-
-        # Rotação
-        rotacao = self.velocidade_angular * math.radians(VELOCIDADE_MAX_ANGULAR_GRAUS_S) * dt
-        self.angulo_rad = self.normalize_angle(self.angulo_rad + rotacao)
-        
-        # Deslocamento
-        deslocamento_desejado = self.velocidade_linear * VELOCIDADE_MAX_LINEAR_CM_S * dt
-        dx_total = deslocamento_desejado * math.cos(self.angulo_rad)
-        dy_total = deslocamento_desejado * math.sin(self.angulo_rad)
-        
-        x_final, y_final = self.x_cm, self.y_cm
-        for i in range(SUBPASSOS_FISICA):
-            prox_x = x_final + dx_total / SUBPASSOS_FISICA
-            prox_y = y_final + dy_total / SUBPASSOS_FISICA
-            if self.mundo.verificar_colisao_robo((prox_x, prox_y)):
-                break
-            x_final, y_final = prox_x, prox_y
-        
-        # Calcula o deslocamento que realmente ocorreu após a checagem de colisão.
-        dx_real = x_final - x_inicial
-        dy_real = y_final - y_inicial
-        
-        # Acumula o deslocamento real nos "encoders".
-        self.delta_x_acumulado += dx_real
-        self.delta_y_acumulado += dy_real
-        self.delta_theta_acumulado += rotacao
-        
-        # Atualiza a posição final do robô.
-        self.x_cm, self.y_cm = x_final, y_final
-        dx_real = x_final - x_inicial
-        dy_real = y_final - y_inicial
-        
-        # Acumula o deslocamento real nos "encoders".
-        self.delta_x_acumulado += dx_real
-        self.delta_y_acumulado += dy_real
-        self.delta_theta_acumulado += rotacao
-        
-        # Atualiza a posição final do robô.
-        self.x_cm, self.y_cm = x_final, y_final
+        self.corpos.atualizar_fisica(dt, linhas=slice(self.indice, self.indice + 1))
 
     def desenhar_na_tela(self, mapa_surface):
         """Delega a renderização para a classe Planta, fornecendo seu estado atual."""
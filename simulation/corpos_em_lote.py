@@ -0,0 +1,134 @@
+"""
+Define a classe CorposEmLote, o armazenamento "struct-of-arrays" dos corpos
+simulados, que integra a física de todos os robôs de uma frota em um único
+passo vetorizado.
+"""
+
+import numpy as np
+from robot_specifications import (
+    VELOCIDADE_MAX_LINEAR_CM_S,
+    VELOCIDADE_MAX_ANGULAR_GRAUS_S,
+    DESLIZAR_NAS_PAREDES,
+    MAX_CONTATOS_POR_FRAME
+)
+
+# Distância mínima mantida entre o robô e a parede após um contato, para que
+# erros de ponto flutuante não o deixem "dentro" da geometria.
+FOLGA_CONTATO_CM = 1e-3
+
+# Colunas do armazenamento: pose, velocidades (percentual de -1.0 a 1.0) e
+# os "encoders" que acumulam o deslocamento real de cada corpo.
+CAMPOS = (
+    'x_cm', 'y_cm', 'angulo_rad',
+    'velocidade_linear', 'velocidade_angular',
+    'delta_x_acumulado', 'delta_y_acumulado', 'delta_theta_acumulado'
+)
+
+
+class CorposEmLote:
+    """
+    Armazena o estado físico de N robôs em arrays NumPy (um array por campo).
+
+    ARQUITETURA:
+    Em vez de cada `CorpoRoboSimulado` integrar a si mesmo em Python escalar,
+    todos os corpos vivem como linhas deste armazenamento. O passo de física
+    (rotação, deslocamento, colisão contínua com a `Planta` e acumulação dos
+    encoders) é executado com operações vetorizadas sobre todas as linhas de
+    uma vez, tornando viável simular frotas com centenas de robôs.
+    `CorpoRoboSimulado` passa a ser apenas uma "visão" sobre uma linha.
+    """
+    def __init__(self, mundo, capacidade: int = 1):
+        """
+        Args:
+            mundo (Planta): O mundo compartilhado pelos corpos, usado nas colisões.
+            capacidade (int): Número de linhas pré-alocadas (cresce sob demanda).
+        """
+        self.mundo = mundo
+        self.quantidade = 0
+        for campo in CAMPOS:
+            setattr(self, campo, np.zeros(max(1, capacidade)))
+
+    def adicionar_corpo(self, x_cm: float, y_cm: float, angulo_rad: float) -> int:
+        """Adiciona um corpo parado na pose indicada e retorna o índice da sua linha."""
+        if self.quantidade == len(self.x_cm):
+            for campo in CAMPOS:
+                antigo = getattr(self, campo)
+                novo = np.zeros(len(antigo) * 2)
+                novo[:len(antigo)] = antigo
+                setattr(self, campo, novo)
+
+        indice = self.quantidade
+        self.quantidade += 1
+        for campo in CAMPOS:
+            getattr(self, campo)[indice] = 0.0
+        self.x_cm[indice], self.y_cm[indice], self.angulo_rad[indice] = x_cm, y_cm, angulo_rad
+        return indice
+
+    def get_odometria_e_resetar(self, indice: int) -> tuple[float, float, float]:
+        """Fornece os encoders acumulados de um corpo e zera seus contadores."""
+        odometria = (float(self.delta_x_acumulado[indice]),
+                     float(self.delta_y_acumulado[indice]),
+                     float(self.delta_theta_acumulado[indice]))
+        self.delta_x_acumulado[indice] = 0.0
+        self.delta_y_acumulado[indice] = 0.0
+        self.delta_theta_acumulado[indice] = 0.0
+        return odometria
+
+    def atualizar_fisica(self, dt: float, linhas=None):
+        """
+        O motor de física vetorizado, chamado a cada frame pelo loop principal.
+
+        Executa, para todas as linhas selecionadas de uma vez:
+        1.  Rotação e deslocamento ideal para o intervalo de tempo `dt`.
+        2.  Consulta em lote à `Planta` pelo instante exato de contato de cada robô.
+        3.  Movimento até o contato; com `DESLIZAR_NAS_PAREDES`, o restante do
+            movimento é projetado ao longo da parede (até `MAX_CONTATOS_POR_FRAME`).
+        4.  Acumulação do deslocamento real nos encoders e atualização da pose.
+
+        Args:
+            dt (float): Intervalo de tempo do frame, em segundos.
+            linhas: Índices (ou fatia) dos corpos a integrar. Padrão: todos.
+        """
+        if linhas is None:
+            linhas = slice(0, self.quantidade)
+
+        # Rotação
+        rotacao = self.velocidade_angular[linhas] * np.radians(VELOCIDADE_MAX_ANGULAR_GRAUS_S) * dt
+        angulo = (self.angulo_rad[linhas] + rotacao + np.pi) % (2 * np.pi) - np.pi
+        self.angulo_rad[linhas] = angulo
+
+        # Deslocamento
+        deslocamento_desejado = self.velocidade_linear[linhas] * VELOCIDADE_MAX_LINEAR_CM_S * dt
+        restante = np.stack([deslocamento_desejado * np.cos(angulo),
+                             deslocamento_desejado * np.sin(angulo)], axis=1)
+        inicial = np.stack([self.x_cm[linhas], self.y_cm[linhas]], axis=1)
+        final = inicial.copy()
+
+        # Apenas os corpos que ainda têm movimento a resolver participam das consultas.
+        ativos = np.flatnonzero(np.any(restante != 0, axis=1))
+        for _ in range(MAX_CONTATOS_POR_FRAME):
+            if ativos.size == 0:
+                break
+            t, normais, colidiu = self.mundo.calcular_tempo_de_impacto(final[ativos], restante[ativos])
+
+            # Avança até o contato, recuando uma folga mínima ao longo do movimento.
+            comprimento = np.linalg.norm(restante[ativos], axis=1)
+            t_seguro = np.where(colidiu, np.maximum(0.0, t - FOLGA_CONTATO_CM / comprimento), 1.0)
+            final[ativos] += restante[ativos] * t_seguro[:, None]
+            if not DESLIZAR_NAS_PAREDES:
+                break
+
+            # Remove do movimento restante a componente que empurra contra a parede.
+            ativos, t_seguro, normais = ativos[colidiu], t_seguro[colidiu], normais[colidiu]
+            sobra = restante[ativos] * (1.0 - t_seguro)[:, None]
+            contra_parede = np.sum(sobra * normais, axis=1)
+            restante[ativos] = sobra - contra_parede[:, None] * normais
+            ativos = ativos[np.linalg.norm(restante[ativos], axis=1) >= FOLGA_CONTATO_CM]
+
+        # Acumula o deslocamento real nos "encoders" e atualiza a pose final.
+        real = final - inicial
+        self.delta_x_acumulado[linhas] += real[:, 0]
+        self.delta_y_acumulado[linhas] += real[:, 1]
+        self.delta_theta_acumulado[linhas] += rotacao
+        self.x_cm[linhas] = final[:, 0]
+        self.y_cm[linhas] = final[:, 1]
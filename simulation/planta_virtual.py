@@ -6,6 +6,7 @@ de sensores.
 
 import pygame
 import math
+import numpy as np
 from robot_specifications import RAIO_ROBO_CM
 
 # Constantes de visualização
@@ -38,7 +39,7 @@ class Planta:
     ARQUITETURA:
     Esta classe encapsula toda a lógica do Pygame e do ambiente. Ela fornece
     uma API simples para o CorpoRoboSimulado interagir com o mundo através de
-    métodos como `verificar_colisao_robo` (para física) e `calcular_distancia`
+    métodos como `calcular_tempo_de_impacto` (para física) e `calcular_distancia`
     (para sensores), sem expor os detalhes de implementação.
     """
     def __init__(self):
@@ -71,6 +72,15 @@ class Planta:
             p1, p2, p3, p4 = (x, y), (x + w, y), (x + w, y + h), (x, y + h)
             self.paredes_linhas_cm.extend([ (p1, p2), (p2, p3), (p3, p4), (p4, p1) ])
 
+        # 3. Para a COLISÃO CONTÍNUA: os mesmos segmentos em arrays NumPy, com
+        #    direções, comprimentos e normais pré-calculados para consultas em lote.
+        segmentos = np.array(self.paredes_linhas_cm, dtype=float)
+        self._segmentos_a = segmentos[:, 0, :]
+        self._segmentos_e = segmentos[:, 1, :] - segmentos[:, 0, :]
+        self._segmentos_comp = np.hypot(self._segmentos_e[:, 0], self._segmentos_e[:, 1])
+        self._segmentos_n = np.stack([-self._segmentos_e[:, 1], self._segmentos_e[:, 0]], axis=1) / self._segmentos_comp[:, None]
+        self._extremidades = np.concatenate([segmentos[:, 0, :], segmentos[:, 1, :]])
+
     def verificar_colisao_robo(self, pos_robo_cm: tuple[float, float]) -> bool:
         """
         Motor de colisão principal. Verifica se a área circular do robô
@@ -86,6 +96,65 @@ class Planta:
         # Usa o método otimizado do Pygame para verificar a colisão com a lista de paredes.
         return robo_rect.collidelist(self.paredes_rect_cm) != -1
 
+    def calcular_tempo_de_impacto(self, pos_robos_cm: np.ndarray,
+                                  deslocamentos_cm: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Detecção de colisão contínua em lote. Varre o círculo de cada robô ao
+        longo do seu deslocamento e calcula analiticamente o primeiro instante
+        de contato com os segmentos das paredes (faces e cantos), para todos
+        os robôs de uma vez.
+
+        Args:
+            pos_robos_cm (np.ndarray): Posições iniciais, shape (N, 2).
+            deslocamentos_cm (np.ndarray): Deslocamentos desejados, shape (N, 2).
+
+        Returns:
+            tuple: (t, normais, colidiu), onde `t` (N,) em [0, 1] é a fração do
+                   deslocamento percorrida até o contato (1.0 se não houver
+                   colisão), `normais` (N, 2) é o vetor unitário da parede em
+                   direção ao robô e `colidiu` (N,) indica quais robôs tocaram
+                   uma parede.
+        """
+        r = RAIO_ROBO_CM
+        P = pos_robos_cm[:, None, :]
+        D = deslocamentos_cm[:, None, :]
+        A, E, comprimentos, normais_seg = self._segmentos_a, self._segmentos_e, self._segmentos_comp, self._segmentos_n
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 1. Contato com o interior dos segmentos (faces das paredes).
+            dist_inicial = np.einsum('nsk,sk->ns', P - A, normais_seg)
+            lado = np.where(dist_inicial < 0, -1.0, 1.0)
+            n_face = normais_seg[None, :, :] * lado[:, :, None]
+            dist_inicial = np.abs(dist_inicial)
+            aproximacao = np.einsum('nsk,nsk->ns', np.broadcast_to(D, n_face.shape), n_face)
+            t_face = np.maximum(0.0, (dist_inicial - r) / -aproximacao)
+            contato = P + t_face[:, :, None] * D - r * n_face
+            projecao = np.einsum('nsk,sk->ns', contato - A, E) / comprimentos
+            valido = (aproximacao < 0) & (projecao >= 0) & (projecao <= comprimentos) & (t_face < 1.0)
+            t_face = np.where(valido, t_face, np.inf)
+
+            # 2. Contato com as extremidades (cantos das paredes).
+            F = P - self._extremidades[None, :, :]
+            a = np.sum(D * D, axis=2)
+            b = np.einsum('nqk,nqk->nq', F, np.broadcast_to(D, F.shape))
+            c = np.sum(F * F, axis=2) - r * r
+            disc = b * b - a * c
+            t_canto = np.maximum(0.0, (-b - np.sqrt(disc)) / a)
+            valido = (b < 0) & (disc >= 0) & (t_canto < 1.0)
+            t_canto = np.where(valido, t_canto, np.inf)
+            ponto_canto = F + t_canto[:, :, None] * D
+            n_canto = ponto_canto / np.linalg.norm(ponto_canto, axis=2, keepdims=True)
+
+        # Escolhe, para cada robô, o contato mais próximo entre faces e cantos.
+        t_todos = np.concatenate([t_face, t_canto], axis=1)
+        n_todos = np.concatenate([n_face, n_canto], axis=1)
+        indice = np.argmin(t_todos, axis=1)
+        linhas = np.arange(t_todos.shape[0])
+        t = t_todos[linhas, indice]
+        colidiu = np.isfinite(t)
+        normais = np.where(colidiu[:, None], n_todos[linhas, indice], 0.0)
+        return np.where(colidiu, t, 1.0), normais, colidiu
+
     def desenhar(self, pos_robo_cm, angulo_robo_rad, pontos_scan_cm, mapa_surface):
         """Motor de renderização. Desenha o estado atual da simulação na tela."""
         self.tela.fill(COR_FUNDO)
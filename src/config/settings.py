@@ -32,6 +32,24 @@ class Settings(BaseSettings):
     map_height_px: int = 500
     map_output_dir: str = "output/maps"
     map_size_meters: int = 10
+    slam_worker_process: bool = False
+    slam_aggregation_window: int = 1
+    slam_keyframes: bool = True
+    slam_search_threads: int = 1
+    slam_map_update_threads: int = 1
+    slam_chunked_map: bool = False
+    slam_chunk_size_px: int = 64
+    slam_submaps: bool = False
+    slam_submap_size_meters: float = 8.0
+    slam_scans_per_submap: int = 40
+    scan_to_map_odometry: bool = False
+
+    # Checkpoints do estado completo do Cérebro (retomada com --resume)
+    checkpoint_path: str = "output/checkpoints/brain_checkpoint.npz"
+    checkpoint_interval_cycles: int = 10
+
+    # Gravação da sessão (scans + odometria) para replays offline; vazio = desligada
+    session_record_path: str = ""
 
 
     class Config:
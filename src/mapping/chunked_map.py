@@ -0,0 +1,127 @@
+"""
+Chunked Map - Armazenamento esparso do mapa de ocupação em blocos
+
+O mapa global é dividido em chunks quadrados de tamanho fixo, guardados em um
+dicionário indexado por (linha_chunk, coluna_chunk). Um chunk só é alocado
+quando contém algum pixel já observado (diferente de "desconhecido"), então a
+memória cresce com a área explorada e não com a área do retângulo envolvente.
+Os índices podem ser negativos: o mapa não tem limites fixos.
+
+O `SLAMManager` usa esta estrutura como armazenamento de fundo de uma janela
+densa (o mapa do BreezySLAM) que acompanha o robô.
+
+Autor: FLEET-MOTTU
+"""
+
+import numpy as np
+
+# Valor inicial dos pixels do BreezySLAM (nem livre, nem ocupado).
+UNKNOWN_PIXEL = 127
+
+
+class ChunkedMap:
+    """
+    Mapa esparso em chunks `uint8` de `chunk_size_pixels` x `chunk_size_pixels`,
+    endereçado em pixels globais (linha = y, coluna = x, como no BreezySLAM).
+    """
+    def __init__(self, chunk_size_pixels: int = 64):
+        """
+        Args:
+            chunk_size_pixels: Lado de cada chunk, em pixels
+        """
+        self.CHUNK_SIZE_PIXELS = chunk_size_pixels
+        self.chunks: dict[tuple[int, int], np.ndarray] = {}
+
+    @property
+    def memory_bytes(self) -> int:
+        """Memória ocupada pelos pixels dos chunks alocados."""
+        return len(self.chunks) * self.CHUNK_SIZE_PIXELS * self.CHUNK_SIZE_PIXELS
+
+    def _overlapping_chunks(self, origin_row: int, origin_col: int, height: int, width: int):
+        """
+        Itera sobre os chunks que cobrem a região e gera, para cada um, a chave
+        e os slices correspondentes dentro do chunk e dentro da região.
+        """
+        c = self.CHUNK_SIZE_PIXELS
+        for chunk_row in range(origin_row // c, -(-(origin_row + height) // c)):
+            y0 = max(origin_row, chunk_row * c)
+            y1 = min(origin_row + height, (chunk_row + 1) * c)
+            for chunk_col in range(origin_col // c, -(-(origin_col + width) // c)):
+                x0 = max(origin_col, chunk_col * c)
+                x1 = min(origin_col + width, (chunk_col + 1) * c)
+                in_chunk = (slice(y0 - chunk_row * c, y1 - chunk_row * c),
+                            slice(x0 - chunk_col * c, x1 - chunk_col * c))
+                in_region = (slice(y0 - origin_row, y1 - origin_row),
+                             slice(x0 - origin_col, x1 - origin_col))
+                yield (chunk_row, chunk_col), in_chunk, in_region
+
+    def write_region(self, region: np.ndarray, origin_row: int, origin_col: int):
+        """
+        Copia uma região densa (ex: a janela do SLAM) para os chunks.
+
+        Chunks ainda não alocados só são criados se a parte correspondente da
+        região tiver algum pixel já observado.
+        """
+        height, width = region.shape
+        for key, in_chunk, in_region in self._overlapping_chunks(origin_row, origin_col, height, width):
+            part = region[in_region]
+            chunk = self.chunks.get(key)
+            if chunk is None:
+                if not np.any(part != UNKNOWN_PIXEL):
+                    continue
+                chunk = np.full((self.CHUNK_SIZE_PIXELS, self.CHUNK_SIZE_PIXELS), UNKNOWN_PIXEL, dtype=np.uint8)
+                self.chunks[key] = chunk
+            chunk[in_chunk] = part
+
+    def read_region(self, out: np.ndarray, origin_row: int, origin_col: int):
+        """Preenche `out` com a região do mapa que começa em (origin_row, origin_col)."""
+        out.fill(UNKNOWN_PIXEL)
+        height, width = out.shape
+        for key, in_chunk, in_region in self._overlapping_chunks(origin_row, origin_col, height, width):
+            chunk = self.chunks.get(key)
+            if chunk is not None:
+                out[in_region] = chunk[in_chunk]
+
+    def bounds_pixels(self) -> tuple[int, int, int, int] | None:
+        """
+        Retorna o retângulo (linha_min, coluna_min, altura, largura) que envolve
+        todos os chunks alocados, ou None se o mapa estiver vazio.
+        """
+        if not self.chunks:
+            return None
+        c = self.CHUNK_SIZE_PIXELS
+        rows = [row for row, _ in self.chunks]
+        cols = [col for _, col in self.chunks]
+        return (min(rows) * c, min(cols) * c,
+                (max(rows) - min(rows) + 1) * c, (max(cols) - min(cols) + 1) * c)
+
+    def to_dense(self) -> tuple[np.ndarray, tuple[int, int]]:
+        """
+        Monta uma cópia densa do retângulo explorado (ex: para exportar uma imagem).
+
+        Returns:
+            tuple: (mapa `uint8`, (linha_origem, coluna_origem) em pixels globais)
+        """
+        bounds = self.bounds_pixels()
+        if bounds is None:
+            return np.full((0, 0), UNKNOWN_PIXEL, dtype=np.uint8), (0, 0)
+        origin_row, origin_col, height, width = bounds
+        dense = np.empty((height, width), dtype=np.uint8)
+        self.read_region(dense, origin_row, origin_col)
+        return dense, (origin_row, origin_col)
+
+    def to_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        """Serializa os chunks como (chaves `int64` (N, 2), dados `uint8` (N, C, C))."""
+        c = self.CHUNK_SIZE_PIXELS
+        keys = np.array(list(self.chunks.keys()), dtype=np.int64).reshape(-1, 2)
+        data = (np.stack(list(self.chunks.values())) if self.chunks
+                else np.empty((0, c, c), dtype=np.uint8))
+        return keys, data
+
+    def load_arrays(self, keys: np.ndarray, data: np.ndarray):
+        """Substitui o conteúdo pelos chunks serializados com `to_arrays`."""
+        if data.shape[1:] != (self.CHUNK_SIZE_PIXELS, self.CHUNK_SIZE_PIXELS):
+            raise ValueError(f"Chunks salvos têm dimensão {data.shape[1:]}, "
+                             f"esperado {self.CHUNK_SIZE_PIXELS}x{self.CHUNK_SIZE_PIXELS}")
+        self.chunks = {(int(row), int(col)): np.array(chunk, dtype=np.uint8)
+                       for (row, col), chunk in zip(keys, data)}
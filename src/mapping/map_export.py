@@ -0,0 +1,65 @@
+"""
+Exportação do mapa de ocupação para arquivos de imagem.
+
+PGM é escrito diretamente a partir do buffer NumPy: binário (P5) por padrão,
+com o mapa inteiro gravado em uma única chamada, ou ASCII (P2) quando pedido.
+Os demais formatos (PNG, ...) passam pelo Pillow. A escrita é atômica (arquivo
+temporário + `os.replace`), então quem lê o arquivo (ex: o publicador MQTT ou
+o dashboard) nunca vê uma imagem pela metade.
+"""
+
+import os
+import numpy as np
+from PIL import Image
+
+
+def write_pgm(path: str, map_array: np.ndarray, binary: bool = True):
+    """
+    Grava um mapa `uint8` (altura x largura) como PGM.
+
+    Args:
+        binary (bool): True para P5 (binário), False para P2 (ASCII, bem maior).
+    """
+    pixels = np.ascontiguousarray(map_array, dtype=np.uint8)
+    height, width = pixels.shape
+    with open(path, 'wb') as output:
+        if binary:
+            output.write(b'P5\n%d %d 255\n' % (width, height))
+            output.write(pixels.data)
+        else:
+            output.write(b'P2\n%d %d 255\n' % (width, height))
+            np.savetxt(output, pixels, fmt='%d', delimiter=' ')
+
+
+def read_pgm(path: str) -> np.ndarray:
+    """Lê um PGM P5 ou P2 (sem comentários no cabeçalho) como array `uint8` (altura x largura)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, width, height, maxval = data.split(maxsplit=4)[:4]
+    width, height = int(width), int(height)
+    if magic == b'P5':
+        # Um único byte de espaço separa o cabeçalho dos pixels binários
+        offset = len(data) - width * height
+        return np.frombuffer(data, dtype=np.uint8, offset=offset).reshape(height, width).copy()
+    if magic == b'P2':
+        values = np.array(data.split()[4:], dtype=np.int64)
+        return values.astype(np.uint8).reshape(height, width)
+    raise ValueError(f"{path} não é um PGM em tons de cinza")
+
+
+def save_map(path: str, map_array: np.ndarray, ascii_pgm: bool = False):
+    """
+    Salva o mapa no formato indicado pela extensão de `path` (.pgm via
+    `write_pgm`, demais formatos via Pillow), criando o diretório se preciso.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    root, extension = os.path.splitext(path)
+    tmp_path = f"{root}.tmp{extension}"
+    if extension.lower() == '.pgm':
+        write_pgm(tmp_path, map_array, binary=not ascii_pgm)
+    else:
+        Image.fromarray(np.ascontiguousarray(map_array), 'L').save(tmp_path)
+    os.replace(tmp_path, path)
@@ -0,0 +1,186 @@
+"""
+Varredura offline de parâmetros do SLAM sobre uma sessão gravada.
+
+Reproduz a sessão (ver `src.persistence.SessionRecorder`) em um `SLAMManager`
+para cada combinação de parâmetros da grade, em paralelo num pool de
+processos, e escreve uma tabela comparativa (CSV) com:
+- tempo: ms por atualização do SLAM
+- consistência da pose: RMS da correção que o SLAM aplica sobre a odometria a
+  cada ciclo (cm e graus); saltos grandes indicam uma pose instável
+- nitidez do mapa: afastamento médio do cinza "desconhecido" (127) nos pixels
+  observados, de 0 (borrado) a 1 (preto/branco nítido)
+
+Uso:
+    python -m src.mapping.param_sweep output/sessions/sessao.jsonl --workers 8 \
+        --map-quality 10 20 50 --hole-width-mm 600 1200
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.mapping.slam_manager import SLAMManager
+from src.persistence.session_recorder import load_session
+
+# Grade padrão: cada parâmetro do `SLAMManager` e os valores testados
+DEFAULT_GRID = {
+    'map_quality': [10, 20, 50],
+    'hole_width_mm': [600, 1200],
+    'sigma_xy_mm': [50, 100],
+    'sigma_theta_degrees': [10, 20],
+    'max_search_iter': [500, 1000],
+}
+
+RESULT_COLUMNS = ['ms_per_update', 'pose_residual_cm', 'pose_residual_deg', 'map_sharpness']
+
+# Sessão carregada uma vez por processo do pool
+_session = None
+
+
+def expand_grid(grid: dict) -> list[dict]:
+    """Produto cartesiano da grade: uma configuração (dict) por combinação."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def _load_worker_session(session_path: str):
+    global _session
+    _session = load_session(session_path)
+
+
+def _wrap_angle(angle_rad: float) -> float:
+    return (angle_rad + math.pi) % (2 * math.pi) - math.pi
+
+
+def evaluate(config: dict, manager_kwargs: dict, session=None) -> dict:
+    """
+    Reproduz a sessão em um `SLAMManager` com `config` e devolve as métricas.
+
+    Args:
+        config (dict): Parâmetros varridos (ex: `map_quality`, `sigma_xy_mm`).
+        manager_kwargs (dict): Parâmetros fixos do `SLAMManager` (tamanho do mapa, semente...).
+        session: Ciclos da sessão; por padrão, a sessão carregada no processo do pool.
+    """
+    cycles = session if session is not None else _session
+
+    # O SLAMManager registra cada ciclo com print; no replay isso é só ruído.
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager = SLAMManager(**manager_kwargs, **config)
+        elapsed = 0.0
+        residuals_cm = []
+        residuals_rad = []
+        try:
+            for scan_data_cm, odometry_delta in cycles:
+                x0, y0, theta0 = manager.get_corrected_pose_cm_rad()
+                start = time.perf_counter()
+                manager.update(scan_data_cm, odometry_delta)
+                elapsed += time.perf_counter() - start
+                x1, y1, theta1 = manager.get_corrected_pose_cm_rad()
+
+                dx, dy, dtheta = odometry_delta
+                residuals_cm.append(math.hypot(x1 - (x0 + dx), y1 - (y0 + dy)))
+                residuals_rad.append(_wrap_angle(theta1 - (theta0 + dtheta)))
+
+            map_array = manager.get_map_array()
+        finally:
+            manager.close()
+
+    observed = map_array[map_array != 127].astype(np.float64)
+    sharpness = float(np.mean(np.abs(observed - 127) / 128)) if observed.size else 0.0
+
+    return {
+        **config,
+        'ms_per_update': 1000 * elapsed / max(1, len(cycles)),
+        'pose_residual_cm': float(np.sqrt(np.mean(np.square(residuals_cm)))) if residuals_cm else 0.0,
+        'pose_residual_deg': math.degrees(float(np.sqrt(np.mean(np.square(residuals_rad))))) if residuals_rad else 0.0,
+        'map_sharpness': sharpness,
+    }
+
+
+def run_sweep(session_path: str, grid: dict, manager_kwargs: dict, workers: int | None = None) -> list[dict]:
+    """
+    Avalia todas as configurações da grade sobre a sessão, em paralelo.
+
+    Args:
+        workers (int | None): Processos do pool (None = nº de CPUs).
+
+    Returns:
+        list[dict]: Uma linha por configuração, com os parâmetros e as métricas.
+    """
+    configs = expand_grid(grid)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_worker_session,
+                             initargs=(session_path,)) as pool:
+        futures = [pool.submit(evaluate, config, manager_kwargs) for config in configs]
+        results = []
+        for i, future in enumerate(futures, 1):
+            results.append(future.result())
+            print(f"[SWEEP] {i}/{len(configs)} configurações avaliadas", end='\r', flush=True)
+    print()
+    return results
+
+
+def write_table(results: list[dict], path: str):
+    """Grava os resultados como CSV."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def print_table(results: list[dict], limit: int = 20):
+    """Imprime as primeiras `limit` linhas dos resultados em colunas alinhadas."""
+    columns = list(results[0])
+    rows = [[f"{row[c]:.3f}" if isinstance(row[c], float) else str(row[c]) for c in columns]
+            for row in results[:limit]]
+    widths = [max(len(c), *(len(r[i]) for r in rows)) for i, c in enumerate(columns)]
+    print('  '.join(c.rjust(w) for c, w in zip(columns, widths)))
+    for r in rows:
+        print('  '.join(v.rjust(w) for v, w in zip(r, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Varredura offline de parâmetros do SLAM sobre uma sessão gravada.")
+    parser.add_argument("session", help="Sessão gravada (SESSION_RECORD_PATH).")
+    for name, values in DEFAULT_GRID.items():
+        parser.add_argument("--" + name.replace('_', '-'), dest=name, nargs='+', type=type(values[0]),
+                            default=values, help=f"Valores testados (padrão: {values}).")
+    parser.add_argument("--workers", type=int, default=None, help="Processos do pool (padrão: nº de CPUs).")
+    parser.add_argument("--map-size-px", type=int, default=500)
+    parser.add_argument("--map-size-meters", type=int, default=10)
+    parser.add_argument("--no-keyframes", action="store_true", help="Atualiza o mapa a cada scan.")
+    parser.add_argument("--seed", type=int, default=9999, help="Semente do RMHC (mesma para todas as configurações).")
+    parser.add_argument("--sort", choices=RESULT_COLUMNS, default='pose_residual_cm',
+                        help="Métrica de ordenação da tabela (nitidez: decrescente; demais: crescente).")
+    parser.add_argument("--output", default=None, help="CSV de saída (padrão: <sessão>_sweep.csv).")
+    args = parser.parse_args()
+
+    grid = {name: getattr(args, name) for name in DEFAULT_GRID}
+    manager_kwargs = dict(map_size_pixels=args.map_size_px, map_size_meters=args.map_size_meters,
+                          use_keyframes=not args.no_keyframes, random_seed=args.seed)
+
+    n_configs = len(expand_grid(grid))
+    print(f"[SWEEP] {n_configs} configurações sobre {args.session}")
+    start = time.perf_counter()
+    results = run_sweep(args.session, grid, manager_kwargs, args.workers)
+    print(f"[SWEEP] Concluído em {time.perf_counter() - start:.1f}s")
+
+    results.sort(key=lambda row: -row[args.sort] if args.sort == 'map_sharpness' else row[args.sort])
+    output = args.output or os.path.splitext(args.session)[0] + "_sweep.csv"
+    write_table(results, output)
+    print_table(results)
+    print(f"[SWEEP] Tabela completa em {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Pose Graph - Grafo de poses 2D e otimizador por mínimos quadrados
+
+Cada nó é a pose global (x_mm, y_mm, theta_rad) da âncora de um submapa, e
+cada aresta é uma medida da pose relativa entre dois nós: odometria entre
+submapas consecutivos ou um fechamento de laço encontrado por casamento de
+submapas. O otimizador (Gauss-Newton) reancora os nós para minimizar o erro
+ponderado de todas as arestas, mantendo o primeiro nó fixo.
+
+As equações normais são montadas por blocos 3x3, sem a matriz densa 3n x 3n:
+- com o SciPy instalado, como matriz esparsa, resolvida por `spsolve`
+- sem ele, a cadeia de odometria (arestas entre nós consecutivos) forma uma
+  matriz tridiagonal por blocos, resolvida em O(n) pelo algoritmo de Thomas;
+  as demais arestas (fechamentos de laço) entram como correções de posto 3
+  pela identidade de Woodbury, com custo O(n · laços)
+
+Autor: FLEET-MOTTU
+"""
+
+import math
+import numpy as np
+
+try:
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.linalg import spsolve
+except ImportError:
+    coo_matrix = spsolve = None
+
+
+def _wrap_angle(theta_rad: float) -> float:
+    """Normaliza um ângulo para [-pi, pi)."""
+    return (theta_rad + math.pi) % (2 * math.pi) - math.pi
+
+
+def _rotation(theta_rad: float) -> np.ndarray:
+    c, s = math.cos(theta_rad), math.sin(theta_rad)
+    return np.array([[c, -s], [s, c]])
+
+
+def compose(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Compõe duas poses: a ⊕ b (b expressa no referencial de a)."""
+    xy = a[:2] + _rotation(a[2]) @ b[:2]
+    return np.array([xy[0], xy[1], _wrap_angle(a[2] + b[2])])
+
+
+def relative(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pose de b no referencial de a: a⁻¹ ⊕ b."""
+    xy = _rotation(a[2]).T @ (b[:2] - a[:2])
+    return np.array([xy[0], xy[1], _wrap_angle(b[2] - a[2])])
+
+
+class PoseGraph:
+    """
+    Grafo de poses 2D com arestas de pose relativa e otimização Gauss-Newton.
+
+    Sem o SciPy, o otimizador supõe que nós consecutivos são ligados por uma
+    aresta (a cadeia de odometria dos submapas), como o `SubmapSLAMManager` faz.
+    """
+    def __init__(self):
+        self.nodes: list[np.ndarray] = []
+        # (i, j, medida de j no referencial de i, matriz de informação 3x3)
+        self.edges: list[tuple[int, int, np.ndarray, np.ndarray]] = []
+
+    def add_node(self, pose: np.ndarray) -> int:
+        """Adiciona um nó com a estimativa inicial `pose` e retorna seu índice."""
+        self.nodes.append(np.asarray(pose, dtype=float).copy())
+        return len(self.nodes) - 1
+
+    def add_edge(self, i: int, j: int, measurement: np.ndarray, information: np.ndarray):
+        """Adiciona a medida da pose do nó j no referencial do nó i."""
+        self.edges.append((i, j, np.asarray(measurement, dtype=float), np.asarray(information, dtype=float)))
+
+    def copy(self) -> 'PoseGraph':
+        """Cópia independente dos nós (as arestas não são alteradas depois de criadas)."""
+        graph = PoseGraph()
+        graph.nodes = [node.copy() for node in self.nodes]
+        graph.edges = list(self.edges)
+        return graph
+
+    def _edge_error_and_jacobians(self, i: int, j: int, z: np.ndarray):
+        """Erro da aresta e suas jacobianas em relação aos nós i e j."""
+        xi, xj = self.nodes[i], self.nodes[j]
+        ri_t = _rotation(xi[2]).T
+        rz_t = _rotation(z[2]).T
+        dt = xj[:2] - xi[:2]
+
+        error = np.empty(3)
+        error[:2] = rz_t @ (ri_t @ dt - z[:2])
+        error[2] = _wrap_angle(xj[2] - xi[2] - z[2])
+
+        # Derivada de R_i^T em relação a theta_i.
+        c, s = math.cos(xi[2]), math.sin(xi[2])
+        dri_t = np.array([[-s, c], [-c, -s]])
+
+        a = np.zeros((3, 3))
+        a[:2, :2] = -rz_t @ ri_t
+        a[:2, 2] = rz_t @ dri_t @ dt
+        a[2, 2] = -1.0
+        b = np.zeros((3, 3))
+        b[:2, :2] = rz_t @ ri_t
+        b[2, 2] = 1.0
+        return error, a, b
+
+    def total_error(self) -> float:
+        """Soma dos erros quadráticos ponderados de todas as arestas."""
+        total = 0.0
+        for i, j, z, omega in self.edges:
+            error, _, _ = self._edge_error_and_jacobians(i, j, z)
+            total += float(error @ omega @ error)
+        return total
+
+    def optimize(self, max_iterations: int = 10, tolerance: float = 1e-4) -> int:
+        """
+        Otimiza as poses dos nós por Gauss-Newton, com o nó 0 fixo.
+
+        Returns:
+            int: Nº de iterações executadas.
+        """
+        n = len(self.nodes)
+        if n < 2 or not self.edges:
+            return 0
+
+        for iteration in range(1, max_iterations + 1):
+            step = self._solve_step(n)
+
+            for k in range(n):
+                self.nodes[k] = self.nodes[k] + step[3 * k:3 * k + 3]
+                self.nodes[k][2] = _wrap_angle(self.nodes[k][2])
+            if np.max(np.abs(step)) < tolerance:
+                break
+        return iteration
+
+    def _solve_step(self, n: int) -> np.ndarray:
+        """
+        Monta as equações normais H · passo = -g por blocos e as resolve.
+
+        H é guardado como a parte tridiagonal por blocos (`diagonal[k]` e
+        `upper[k]` = bloco (k, k+1)), que recebe as arestas entre nós
+        consecutivos, mais a lista das demais arestas linearizadas.
+        """
+        g = np.zeros((n, 3))
+        diagonal = np.zeros((n, 3, 3))
+        upper = np.zeros((n - 1, 3, 3))
+        others = []  # (i, j, A, B, omega) das arestas fora da cadeia
+        for i, j, z, omega in self.edges:
+            error, a, b = self._edge_error_and_jacobians(i, j, z)
+            g[i] += a.T @ omega @ error
+            g[j] += b.T @ omega @ error
+            if abs(i - j) == 1:
+                diagonal[i] += a.T @ omega @ a
+                diagonal[j] += b.T @ omega @ b
+                if i < j:
+                    upper[i] += a.T @ omega @ b
+                else:
+                    upper[j] += b.T @ omega @ a
+            else:
+                others.append((i, j, a, b, omega))
+
+        # Fixa o primeiro nó (remove a liberdade de gauge).
+        diagonal[0] += np.eye(3) * 1e9
+        g = g.ravel()
+
+        if spsolve is not None:
+            return self._solve_sparse(n, g, diagonal, upper, others)
+        return self._solve_chain_woodbury(n, g, diagonal, upper, others)
+
+    @staticmethod
+    def _solve_sparse(n: int, g: np.ndarray, diagonal: np.ndarray, upper: np.ndarray, others: list) -> np.ndarray:
+        """Resolve o sistema como matriz esparsa do SciPy (só os blocos não nulos)."""
+        rows, cols, values = [], [], []
+
+        def add_block(i: int, j: int, block: np.ndarray):
+            r, c = np.mgrid[3 * i:3 * i + 3, 3 * j:3 * j + 3]
+            rows.append(r.ravel())
+            cols.append(c.ravel())
+            values.append(block.ravel())
+
+        for k in range(n):
+            add_block(k, k, diagonal[k])
+        for k in range(n - 1):
+            add_block(k, k + 1, upper[k])
+            add_block(k + 1, k, upper[k].T)
+        for i, j, a, b, omega in others:
+            add_block(i, i, a.T @ omega @ a)
+            add_block(j, j, b.T @ omega @ b)
+            add_block(i, j, a.T @ omega @ b)
+            add_block(j, i, b.T @ omega @ a)
+
+        # Blocos repetidos são somados na conversão para CSC.
+        h = coo_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+                       shape=(3 * n, 3 * n)).tocsc()
+        return spsolve(h, -g)
+
+    @staticmethod
+    def _solve_chain_woodbury(n: int, g: np.ndarray, diagonal: np.ndarray, upper: np.ndarray,
+                              others: list) -> np.ndarray:
+        """
+        Resolve (T + Σ Jₑᵀ Ωₑ Jₑ) · passo = -g, com T tridiagonal por blocos
+        e Jₑ (3 x 3n) a jacobiana de cada aresta fora da cadeia, pela
+        identidade de Woodbury: T é resolvida pelo algoritmo de Thomas para
+        -g e para as colunas de U = [J₁ᵀ ... Jₖᵀ] de uma só vez, e resta um
+        sistema denso de 3k x 3k (k = nº de laços).
+        """
+        k = len(others)
+        rhs = np.zeros((n, 3, 1 + 3 * k))
+        rhs[:, :, 0] = -g.reshape(n, 3)
+        for e, (i, j, a, b, _) in enumerate(others):
+            rhs[i, :, 1 + 3 * e:4 + 3 * e] += a.T
+            rhs[j, :, 1 + 3 * e:4 + 3 * e] += b.T
+
+        # Thomas por blocos: eliminação para frente e substituição para trás.
+        pivots = np.empty((n, 3, 3))
+        pivots[0] = diagonal[0]
+        for m in range(1, n):
+            factor = np.linalg.solve(pivots[m - 1], upper[m - 1]).T  # Bᵀ · D'⁻¹ (D' simétrico)
+            pivots[m] = diagonal[m] - factor @ upper[m - 1]
+            rhs[m] -= factor @ rhs[m - 1]
+        solved = np.empty_like(rhs)
+        solved[n - 1] = np.linalg.solve(pivots[n - 1], rhs[n - 1])
+        for m in range(n - 2, -1, -1):
+            solved[m] = np.linalg.solve(pivots[m], rhs[m] - upper[m] @ solved[m + 1])
+
+        solved = solved.reshape(3 * n, 1 + 3 * k)
+        step = solved[:, 0]
+        if not k:
+            return step
+
+        # Woodbury: passo = T⁻¹(-g) - T⁻¹U (C⁻¹ + Uᵀ T⁻¹ U)⁻¹ Uᵀ T⁻¹(-g), C = diag(Ωₑ)
+        t_inv_u = solved[:, 1:]
+        capacitance = np.zeros((3 * k, 3 * k))
+        u_t_step = np.empty(3 * k)
+        for e, (i, j, a, b, omega) in enumerate(others):
+            block = slice(3 * e, 3 * e + 3)
+            capacitance[block, block] = np.linalg.inv(omega)
+            # Uᵀ · X só lê os blocos i e j de X (Jₑ = [.. A .. B ..])
+            capacitance[block] += a @ t_inv_u[3 * i:3 * i + 3] + b @ t_inv_u[3 * j:3 * j + 3]
+            u_t_step[block] = a @ step[3 * i:3 * i + 3] + b @ step[3 * j:3 * j + 3]
+        return step - t_inv_u @ np.linalg.solve(capacitance, u_t_step)
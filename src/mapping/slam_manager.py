@@ -5,6 +5,7 @@ Encapsula algoritmo RMHC-SLAM fornecendo interface limpa e proteções:
 - Limita deltas de odometria (15cm/20° por ciclo)
 - Clamping de pose para bounds do mapa
 - Conversão automática cm ↔ mm
+- Mapa opcional em chunks esparsos, para áreas maiores que a janela do SLAM
 
 Parâmetros Conservadores:
 - map_quality=20 (estabilidade > detalhes)
@@ -16,6 +17,7 @@ Autor: FLEET-MOTTU
 import sys
 import os
 import math
+import numpy as np
 from PIL import Image
 
 # Bloco de código para garantir que a biblioteca local BreezySLAM seja encontrada.
@@ -35,6 +37,11 @@ except ImportError as e:
     print("="*50)
     sys.exit(1)
 
+from src.mapping.slam_worker import SLAMWorkerClient
+from src.mapping.chunked_map import ChunkedMap
+from src.mapping.map_export import save_map
+from src.robot.scan import Scan, SCAN_SIZE, SERVO_ANGLES_DEG
+
 
 class SLAMManager:
     """
@@ -43,56 +50,178 @@ class SLAMManager:
     Traduz dados da aplicação (cm/rad) para BreezySLAM (mm/deg) e vice-versa.
     Limita deltas absurdos e clamps pose dentro dos bounds do mapa.
     """
-    def __init__(self, map_size_pixels: int = 500, map_size_meters: int = 25):
+    def __init__(self, map_size_pixels: int = 500, map_size_meters: int = 25, tile_size_pixels: int = 32,
+                 use_worker_process: bool = False, aggregation_window: int = 1,
+                 use_chunked_map: bool = False, chunk_size_pixels: int = 64,
+                 use_keyframes: bool = True, keyframe_distance_cm: float = 5.0,
+                 keyframe_rotation_deg: float = 5.0, keyframe_novelty_ratio: float = 0.2,
+                 search_threads: int = 1, map_update_threads: int = 1,
+                 map_quality: int = 20, hole_width_mm: int = 1200,
+                 sigma_xy_mm: float = 100, sigma_theta_degrees: float = 20,
+                 max_search_iter: int = 1000, random_seed: int | None = None):
         """
         Configura SLAM com parâmetros conservadores.
 
         Args:
             map_size_pixels: Resolução do mapa (largura = altura)
             map_size_meters: Dimensão física do mapa
+            tile_size_pixels: Lado dos tiles usados no rastreamento de mudanças
+            use_worker_process: Executa o BreezySLAM em um processo dedicado
+                (ver `SLAMWorkerClient`); `update` passa a ser não-bloqueante
+            aggregation_window: Nº de scans consecutivos fundidos, com compensação
+                de movimento, em um único scan virtual denso antes de cada
+                atualização do SLAM (1 = atualiza a cada scan)
+            use_chunked_map: O mapa do BreezySLAM passa a ser uma janela
+                móvel de `map_size_pixels` em torno do robô, apoiada em um
+                `ChunkedMap` esparso sem limites fixos; a pose deixa de ser
+                limitada aos bounds do mapa
+            chunk_size_pixels: Lado dos chunks do `ChunkedMap`
+            use_keyframes: Só atualiza o mapa em keyframes (scans após
+                deslocamento/rotação suficientes ou com conteúdo novo); os
+                demais só localizam, ou são ignorados se o robô não se moveu
+            keyframe_distance_cm: Deslocamento acumulado que gera um keyframe
+            keyframe_rotation_deg: Rotação acumulada que gera um keyframe
+            keyframe_novelty_ratio: Fração de raios alterados (em relação ao
+                último keyframe) que gera um keyframe mesmo sem movimento
+            search_threads: Nº de buscas RMHC independentes executadas em
+                paralelo (em C) a cada atualização; a melhor pose vence
+            map_update_threads: Nº de threads (em C) que dividem a escrita de
+                cada scan no mapa, por faixas de linhas; o mapa é o mesmo
+            map_quality: Velocidade (0-255) com que cada scan é integrado ao mapa
+            hole_width_mm: Largura dos obstáculos (paredes) no mapa
+            sigma_xy_mm: Desvio padrão da busca RMHC em posição
+            sigma_theta_degrees: Desvio padrão da busca RMHC em orientação
+            max_search_iter: Nº máximo de iterações da busca RMHC
+            random_seed: Semente do RMHC (None = relógio); fixe para replays
+                reproduzíveis (ver `src.mapping.param_sweep`)
         """
+        if use_chunked_map and use_worker_process:
+            raise ValueError("use_chunked_map não é suportado junto com use_worker_process")
+
         self.MAP_SIZE_PIXELS = map_size_pixels
         self.MAP_SIZE_METERS = map_size_meters
-        self.LIDAR_SCAN_SIZE = 19  # O sensor envia 19 leituras (0 a 180 graus, com passo de 10)
+        self.LIDAR_SCAN_SIZE = SCAN_SIZE  # O sensor envia 19 leituras (0 a 180 graus, com passo de 10)
+        self.LIDAR_MAX_RANGE_MM = 3000
+        self.HOLE_WIDTH_MM = hole_width_mm
+
+        # Janela de agregação: com mais de um scan por atualização, o BreezySLAM
+        # recebe um scan virtual com um raio por grau (0 a 180), daí o modelo
+        # de laser com 181 leituras. Graus sem nenhum raio medido recebem uma
+        # distância abaixo de hole_width/2, que o BreezySLAM ignora.
+        self.AGGREGATION_WINDOW = max(1, aggregation_window)
+        self.VIRTUAL_SCAN_SIZE = 181
+        self.UNMEASURED_MM = 1
+        self._scan_window = []
+
+        # Orientação do robô no referencial da odometria (o dos deltas globais),
+        # usada para extrair o avanço do robô de cada delta e para a
+        # compensação de movimento da janela de agregação.
+        self._odometry_heading_rad = 0.0
+
+        # Seleção de keyframes: movimento acumulado desde o último keyframe e
+        # seus raios, para medir a novidade dos scans seguintes.
+        self.USE_KEYFRAMES = use_keyframes
+        self.KEYFRAME_DISTANCE_CM = keyframe_distance_cm
+        self.KEYFRAME_ROTATION_RAD = math.radians(keyframe_rotation_deg)
+        self.KEYFRAME_NOVELTY_RATIO = keyframe_novelty_ratio
+        self.KEYFRAME_RANGE_CHANGE_CM = 10.0
+        self._keyframe_ranges_cm = None
+        self._distance_since_keyframe_cm = 0.0
+        self._rotation_since_keyframe_rad = 0.0
+        self.keyframe_stats = {"keyframe": 0, "localization_only": 0, "skipped": 0}
+        # Odometria (dx_cm, dy_cm, dtheta_rad) dos scans pulados, ainda não
+        # entregue ao SLAM: entra no próximo scan não pulado.
+        self._skipped_delta = (0.0, 0.0, 0.0)
 
         # Configura o modelo de sensor virtual que o BreezySLAM usará.
         # Parâmetros: (num_leituras, taxa_hz, angulo_span_graus, dist_max_mm)
         # Reduzido dist_max para 3000mm (3m) para evitar drift de long-range
-        laser = Laser(self.LIDAR_SCAN_SIZE, 10, 180, 3000)
+        laser_scan_size = self.LIDAR_SCAN_SIZE if self.AGGREGATION_WINDOW == 1 else self.VIRTUAL_SCAN_SIZE
+        laser_args = (laser_scan_size, 10, 180, self.LIDAR_MAX_RANGE_MM)
         
-        # Instancia o algoritmo de SLAM com parâmetros ULTRA conservadores
-        # para evitar motion blur e drift
-        self.slam = RMHC_SLAM(
-            laser, 
-            self.MAP_SIZE_PIXELS, 
-            map_size_meters,
-            map_quality=20,       # MUITO reduzido - prioriza estabilidade sobre detalhes
-            hole_width_mm=1200    # MUITO aumentado - ignora pequenas inconsistências
+        # Parâmetros ULTRA conservadores para evitar motion blur e drift
+        slam_kwargs = dict(
+            map_quality=map_quality,           # Padrão 20: MUITO reduzido - prioriza estabilidade sobre detalhes
+            hole_width_mm=self.HOLE_WIDTH_MM,  # Padrão 1200: MUITO aumentado - ignora pequenas inconsistências
+            sigma_xy_mm=sigma_xy_mm,
+            sigma_theta_degrees=sigma_theta_degrees,
+            max_search_iter=max_search_iter,
+            random_seed=random_seed,
+            search_threads=max(1, search_threads),
+            map_update_threads=max(1, map_update_threads)
         )
+
+        # Instancia o algoritmo de SLAM no próprio processo ou em um worker dedicado.
+        self.use_worker_process = use_worker_process
+        if use_worker_process:
+            self.slam = SLAMWorkerClient(laser_args, self.MAP_SIZE_PIXELS, map_size_meters, slam_kwargs)
+        else:
+            self.slam = RMHC_SLAM(Laser(*laser_args), self.MAP_SIZE_PIXELS, map_size_meters, **slam_kwargs)
         
+        # Buffer persistente do mapa: o BreezySLAM escreve nele in-place via `getmap`
+        # (que aceita qualquer buffer, inclusive arrays NumPy) e os consumidores o
+        # leem através de uma view somente-leitura, sem nenhuma cópia por ciclo.
+        self._map_buffer = np.zeros((self.MAP_SIZE_PIXELS, self.MAP_SIZE_PIXELS), dtype=np.uint8)
+        self._map_array = self._map_buffer.view()
+        self._map_array.flags.writeable = False
+
+        # Versionamento: o buffer só é atualizado quando o SLAM mudou desde a
+        # última leitura, e a imagem PIL só é construída sob demanda.
+        self.map_version = 0
+        self._buffer_version = -1
+        self._image_cache = None
+        self._image_version = -1
+
+        # Rastreamento de tiles alterados: o mapa é dividido em tiles e cada um
+        # guarda a versão do mapa em que mudou pela última vez. A cada `update`,
+        # a área alcançável pelo scan (footprint) marca os tiles candidatos, que
+        # são confirmados comparando com o último snapshot apenas nessa região.
+        self.TILE_SIZE_PIXELS = tile_size_pixels
+        self.TILES_PER_SIDE = -(-self.MAP_SIZE_PIXELS // self.TILE_SIZE_PIXELS)
+        self._tile_versions = np.zeros((self.TILES_PER_SIDE, self.TILES_PER_SIDE), dtype=np.int64)
+        self._pending_tiles = None  # (linha_min, linha_max, coluna_min, coluna_max) inclusive
+        self._tile_snapshot = np.array(self.get_map_array())
+
         # Limites rígidos para a pose (em mm)
         self.max_x_mm = map_size_meters * 1000
         self.max_y_mm = map_size_meters * 1000
         self.min_x_mm = 0
         self.min_y_mm = 0
 
-    def update(self, scan_data_cm: list[tuple[int, int]], odometry_delta: tuple[float, float, float]):
+        # Mapa em chunks: a janela densa do SLAM cobre a região global cuja
+        # origem (em pixels) é `_window_origin_px`. Quando o robô se aproxima da
+        # borda a ponto de o scan sair da janela, ela é gravada nos chunks e
+        # recentralizada; o custo por ciclo continua sendo o de uma janela.
+        self.chunked_map = ChunkedMap(chunk_size_pixels) if use_chunked_map else None
+        self._window_origin_px = (0, 0)  # (linha, coluna)
+        self._mm_per_pixel = self.MAP_SIZE_METERS * 1000 / self.MAP_SIZE_PIXELS
+
+    def update(self, scan_data_cm: Scan | list[tuple[int, int]], odometry_delta: tuple[float, float, float],
+               odometry_heading_rad: float | None = None):
         """
         Alimenta o algoritmo de SLAM com novos dados de sensor e odometria.
 
         Este método realiza a "tradução" dos dados:
-        1. Converte o scan de (ângulo, distância_cm) para uma lista de [distância_mm].
-        2. Converte o delta de odometria de (dx_cm, dy_cm, dtheta_rad) para (dx_mm, dy_mm, dtheta_deg).
-        3. Aplica limites ao delta de odometria para evitar drift.
-        """
-        # 1. Formata os dados do scan.
-        scan_distancias_mm = [0] * self.LIDAR_SCAN_SIZE
-        for angulo, dist_cm in scan_data_cm:
-            indice = angulo // 10
-            if 0 <= indice < self.LIDAR_SCAN_SIZE:
-                scan_distancias_mm[indice] = dist_cm * 10
-
-        # 2. Formata os dados da odometria com limitação.
+        1. Aplica limites ao delta de odometria para evitar drift.
+        2. Converte o delta de odometria de (dx_cm, dy_cm, dtheta_rad) para o
+           `pose_change` do BreezySLAM, (dxy_mm, dtheta_deg, dt_s).
+        3. Converte as distâncias por raio do `Scan` (ou da lista (ângulo,
+           distância_cm) do sensor) para [distância_mm], ou, com `AGGREGATION_WINDOW > 1`, acumula o scan até completar a janela.
+        Com `USE_KEYFRAMES`, scans redundantes são ignorados ou só localizam o
+        robô (ver `_classify_scan`); as contagens ficam em `keyframe_stats`. A
+        odometria de um scan ignorado não se perde: é somada à do próximo scan
+        que chega ao SLAM (ou à janela de agregação).
+
+        `odometry_heading_rad` é a orientação do robô, antes do delta, no
+        referencial em que o delta global foi calculado (a da odometria, não a
+        do SLAM). Se omitida, é integrada a partir dos próprios deltas.
+        """
+        if odometry_heading_rad is not None:
+            self._odometry_heading_rad = odometry_heading_rad
+        heading_before_rad = self._odometry_heading_rad
+        self._odometry_heading_rad += odometry_delta[2]
+
+        # 1. Formata os dados da odometria com limitação.
         delta_x_cm = odometry_delta[0]
         delta_y_cm = odometry_delta[1]
         delta_theta_rad = odometry_delta[2]
@@ -114,26 +243,402 @@ class SLAMManager:
             delta_theta_rad = MAX_DELTA_THETA_RAD if delta_theta_rad > 0 else -MAX_DELTA_THETA_RAD
             print(f"[SLAM] ⚠️ Rotação limitada para ±{math.degrees(MAX_DELTA_THETA_RAD):.0f}°")
         
-        delta_x_mm = delta_x_cm * 10
-        delta_y_mm = delta_y_cm * 10
-        delta_theta_deg = math.degrees(delta_theta_rad)
-        odometry_mm_deg = (delta_x_mm, delta_y_mm, delta_theta_deg)
+        scan = Scan.of(scan_data_cm)
+        scan_ranges_cm = scan.ranges_cm
+        scan_kind = self._classify_scan(scan_ranges_cm, delta_x_cm, delta_y_cm, delta_theta_rad)
+        self.keyframe_stats[scan_kind] += 1
+        if scan_kind == "skipped":
+            skipped_x_cm, skipped_y_cm, skipped_theta_rad = self._skipped_delta
+            self._skipped_delta = (skipped_x_cm + delta_x_cm, skipped_y_cm + delta_y_cm,
+                                   skipped_theta_rad + delta_theta_rad)
+            print(f"[SLAM] Scan redundante (robô parado): atualização pulada "
+                  f"({self.keyframe_stats['skipped']} pulados até agora).")
+            return
 
-        # 3. Executa o passo de atualização do SLAM.
+        # Entrega o movimento acumulado nos scans pulados (deltas globais: somam direto).
+        skipped_x_cm, skipped_y_cm, skipped_theta_rad = self._skipped_delta
+        delta_x_cm += skipped_x_cm
+        delta_y_cm += skipped_y_cm
+        delta_theta_rad += skipped_theta_rad
+        self._skipped_delta = (0.0, 0.0, 0.0)
+
+        if self.AGGREGATION_WINDOW > 1:
+            self._scan_window.append((scan, (delta_x_cm, delta_y_cm, delta_theta_rad),
+                                      self._odometry_heading_rad))
+            if len(self._scan_window) < self.AGGREGATION_WINDOW:
+                return
+            self._update_with_aggregated_scan()
+            return
+
+        # 2. Converte a odometria para as unidades do BreezySLAM.
+        odometry_mm_deg = self._to_pose_change(delta_x_cm, delta_y_cm, delta_theta_rad, heading_before_rad)
+
+        # 3. Formata os dados do scan (int32: lido pelo BreezySLAM sem conversão).
+        scan_distancias_mm = (scan_ranges_cm * 10).astype(np.int32)
+
+        # 4. Executa o passo de atualização do SLAM. Fora de keyframes, o
+        # RMHC só localiza o robô e o mapa fica intocado.
+        if scan_kind == "localization_only":
+            self.slam.update(scan_distancias_mm, odometry_mm_deg, should_update_map=False)
+            return
         self.slam.update(scan_distancias_mm, odometry_mm_deg)
+        self._after_slam_update()
+
+    def _classify_scan(self, ranges_cm: np.ndarray, delta_x_cm: float, delta_y_cm: float,
+                       delta_theta_rad: float) -> str:
+        """
+        Decide como o scan entra no SLAM:
+        - "keyframe": deslocamento/rotação desde o último keyframe acima dos
+          limiares, ou fração de raios alterados acima de `KEYFRAME_NOVELTY_RATIO`
+          (ex: um obstáculo novo com o robô parado); atualiza pose e mapa
+        - "skipped": robô parado e cena igual; nada a fazer (o movimento
+          acumulado nos scans pulados, somado ao deste, não passa de 0.5cm/0.5°,
+          para que um deslizamento lento não seja pulado indefinidamente)
+        - "localization_only": pequeno movimento sem novidade; só localiza
+          (com `AGGREGATION_WINDOW > 1`, entra na janela como um scan comum)
+        """
+        if not self.USE_KEYFRAMES:
+            return "keyframe"
+
+        delta_dist_cm = math.hypot(delta_x_cm, delta_y_cm)
+        self._distance_since_keyframe_cm += delta_dist_cm
+        self._rotation_since_keyframe_rad += abs(delta_theta_rad)
+
+        if self._keyframe_ranges_cm is None:
+            novel = True
+        else:
+            reference = self._keyframe_ranges_cm
+            changed = (ranges_cm > 0) != (reference > 0)
+            both = (ranges_cm > 0) & (reference > 0)
+            changed[both] = np.abs(ranges_cm[both] - reference[both]) > self.KEYFRAME_RANGE_CHANGE_CM
+            novel = changed.mean() >= self.KEYFRAME_NOVELTY_RATIO
+
+        if (novel or self._distance_since_keyframe_cm >= self.KEYFRAME_DISTANCE_CM or
+                self._rotation_since_keyframe_rad >= self.KEYFRAME_ROTATION_RAD):
+            self._keyframe_ranges_cm = ranges_cm
+            self._distance_since_keyframe_cm = 0.0
+            self._rotation_since_keyframe_rad = 0.0
+            return "keyframe"
+
+        skipped_x_cm, skipped_y_cm, skipped_theta_rad = self._skipped_delta
+        if (math.hypot(skipped_x_cm + delta_x_cm, skipped_y_cm + delta_y_cm) < 0.5 and
+                abs(skipped_theta_rad + delta_theta_rad) < math.radians(0.5)):
+            return "skipped"
+        return "localization_only"
+
+    def _to_pose_change(self, delta_x_cm: float, delta_y_cm: float, delta_theta_rad: float,
+                        heading_rad: float) -> tuple[float, float, float]:
+        """
+        Converte um delta global (dx_cm, dy_cm, dtheta_rad) para o `pose_change`
+        do BreezySLAM, (dxy_mm, dtheta_deg, dt_s). O modelo de movimento dele só
+        avança ao longo do heading, então dxy é o avanço local do robô: o delta
+        projetado na orientação `heading_rad` (antes do delta) do mesmo
+        referencial da odometria, e não na do SLAM, que pode divergir dela e
+        encolher o deslocamento. dt=0 desliga a correção de velocidade do scan,
+        já que o robô está parado durante a leitura.
+        """
+        dxy_mm = (delta_x_cm * math.cos(heading_rad) + delta_y_cm * math.sin(heading_rad)) * 10
+        return dxy_mm, math.degrees(delta_theta_rad), 0
+
+    def _update_with_aggregated_scan(self):
+        """
+        Funde os scans da janela em um único scan virtual e atualiza o SLAM.
+
+        Cada scan é levado ao referencial do robô no último scan da janela
+        usando a odometria acumulada entre eles (compensação de movimento), com
+        posições e orientações no referencial da odometria. Os pontos são
+        agrupados por grau no scan virtual de 181 raios (mantendo o obstáculo
+        mais próximo); graus em que um raio não teve retorno ficam com 0 (espaço
+        livre até o alcance máximo) e graus sem nenhum raio ficam com
+        `UNMEASURED_MM`, ignorados pelo BreezySLAM.
+        """
+        window, self._scan_window = self._scan_window, []
+        deltas = np.array([delta for _, delta, _ in window])
+        headings = np.array([heading for _, _, heading in window])
+
+        # Posição de cada scan relativa ao início da janela, no referencial da odometria.
+        positions = np.cumsum(deltas[:, :2], axis=0)
+        last_position, last_heading = positions[-1], headings[-1]
+        cos_last, sin_last = math.cos(last_heading), math.sin(last_heading)
+
+        virtual_scan = np.full(self.VIRTUAL_SCAN_SIZE, self.UNMEASURED_MM, dtype=np.int32)
+        nearest_mm = np.full(self.VIRTUAL_SCAN_SIZE, np.inf)
+        for (scan, _, _), position, heading in zip(window, positions, headings):
+            # Raios sem retorno (ou além do alcance) marcam espaço livre na sua
+            # direção; a translação é desprezível para a direção do raio.
+            no_return = scan.received & ((scan.ranges_cm == 0) | (scan.ranges_cm * 10 > self.LIDAR_MAX_RANGE_MM))
+            free_angles = SERVO_ANGLES_DEG[no_return] + math.degrees(heading - last_heading)
+            free_bins = np.rint(free_angles).astype(int)
+            free_bins = free_bins[(free_bins >= 0) & (free_bins < self.VIRTUAL_SCAN_SIZE)]
+            virtual_scan[free_bins[virtual_scan[free_bins] == self.UNMEASURED_MM]] = 0
+
+            valid = scan.range_mask() & (scan.ranges_cm * 10 <= self.LIDAR_MAX_RANGE_MM)
+            if not valid.any():
+                continue
+            points_mm = scan.points_cm[valid] * 10
+
+            # Referencial do scan -> odometria -> referencial do último scan.
+            cos_h, sin_h = math.cos(heading), math.sin(heading)
+            wx = (position[0] - last_position[0]) * 10 + cos_h * points_mm[:, 0] - sin_h * points_mm[:, 1]
+            wy = (position[1] - last_position[1]) * 10 + sin_h * points_mm[:, 0] + cos_h * points_mm[:, 1]
+            local_x = cos_last * wx + sin_last * wy
+            local_y = -sin_last * wx + cos_last * wy
+
+            bins = np.rint(np.degrees(np.arctan2(local_y, local_x)) + 90).astype(int)
+            ranges = np.hypot(local_x, local_y)
+            in_view = (bins >= 0) & (bins < self.VIRTUAL_SCAN_SIZE) & (ranges <= self.LIDAR_MAX_RANGE_MM)
+            # Um obstáculo por grau: o mais próximo
+            np.minimum.at(nearest_mm, bins[in_view], ranges[in_view])
+
+        # Odometria total: soma dos avanços de cada scan ao longo do próprio heading.
+        changes = [self._to_pose_change(*delta, heading - delta[2]) for _, delta, heading in window]
+        odometry_mm_deg = (sum(change[0] for change in changes), sum(change[1] for change in changes), 0)
+
+        obstacles = np.isfinite(nearest_mm)
+        if not obstacles.any():
+            # Sem obstáculos para casar com o mapa: aplica só a odometria.
+            self.slam.update(np.zeros(self.VIRTUAL_SCAN_SIZE, dtype=np.int32), odometry_mm_deg,
+                             should_update_map=False)
+            return
+        virtual_scan[obstacles] = nearest_mm[obstacles]
+
+        print(f"[SLAM] Scan virtual: {int(obstacles.sum())} obstáculos e "
+              f"{int((virtual_scan == 0).sum())} raios livres de {len(window)} scans agregados.")
+        self.slam.update(virtual_scan, odometry_mm_deg)
+        self._after_slam_update()
+
+    def _after_slam_update(self):
+        """Registra uma nova versão do mapa após uma atualização do SLAM."""
+        # No modo worker, a versão avança quando o worker aplica a atualização.
+        if not self.use_worker_process:
+            self.map_version += 1
+            self._mark_scan_footprint()
+            if self.chunked_map is not None:
+                self._recenter_window_if_needed()
+
+    def _recenter_window_if_needed(self):
+        """
+        Desloca a janela do SLAM quando o alcance do scan, a partir da pose
+        atual, ultrapassa alguma borda dela.
+
+        A janela atual é gravada nos chunks, a nova origem é escolhida (alinhada
+        aos chunks) para pôr o robô no centro, e o BreezySLAM recebe o novo
+        recorte do mapa e a pose deslocada para o novo referencial.
+        """
+        x_mm, y_mm, theta_deg = self.slam.getpos()
+        # Em janelas pequenas demais para o alcance do scan, limita a margem a
+        # um quarto da janela para não recentralizar a cada ciclo.
+        reach_px = (self.LIDAR_MAX_RANGE_MM + self.HOLE_WIDTH_MM / 2) / self._mm_per_pixel + 1
+        margin_px = min(reach_px, self.MAP_SIZE_PIXELS / 4)
+        col_px, row_px = x_mm / self._mm_per_pixel, y_mm / self._mm_per_pixel
+        if (margin_px <= col_px <= self.MAP_SIZE_PIXELS - margin_px and
+                margin_px <= row_px <= self.MAP_SIZE_PIXELS - margin_px):
+            return
+
+        self._sync_window_to_chunks()
+
+        c = self.chunked_map.CHUNK_SIZE_PIXELS
+        old_row, old_col = self._window_origin_px
+        half = self.MAP_SIZE_PIXELS // 2
+        new_row = int(round((old_row + row_px - half) / c)) * c
+        new_col = int(round((old_col + col_px - half) / c)) * c
+        self._window_origin_px = (new_row, new_col)
+
+        window = np.empty((self.MAP_SIZE_PIXELS, self.MAP_SIZE_PIXELS), dtype=np.uint8)
+        self.chunked_map.read_region(window, new_row, new_col)
+        self.slam.setmap(window)
+        self.slam.setpos(x_mm - (new_col - old_col) * self._mm_per_pixel,
+                         y_mm - (new_row - old_row) * self._mm_per_pixel, theta_deg)
+
+        # A janela inteira mudou: todos os tiles viram candidatos.
+        self.map_version += 1
+        self._pending_tiles = (0, self.TILES_PER_SIDE - 1, 0, self.TILES_PER_SIDE - 1)
+        print(f"[SLAM] Janela do mapa recentralizada na origem {self._window_origin_px} px "
+              f"({len(self.chunked_map.chunks)} chunks, {self.chunked_map.memory_bytes / 1e6:.1f} MB).")
+
+    def _sync_window_to_chunks(self):
+        """Grava o conteúdo atual da janela do SLAM nos chunks."""
+        self.chunked_map.write_region(self.get_map_array(), *self._window_origin_px)
+
+    def get_chunked_map(self) -> ChunkedMap:
+        """
+        Retorna o mapa global em chunks, já incluindo o conteúdo atual da janela
+        do SLAM (apenas com `use_chunked_map`).
+        """
+        if self.chunked_map is None:
+            raise RuntimeError("SLAMManager criado sem use_chunked_map")
+        self._sync_window_to_chunks()
+        return self.chunked_map
+
+    def _mark_scan_footprint(self):
+        """
+        Acumula os tiles que o último `update` pode ter alterado: o quadrado em
+        torno da pose atual com o alcance máximo do laser mais meia largura de
+        buraco (o comprimento máximo de um raio pintado pelo `map_update`).
+        """
+        x_mm, y_mm, _ = self.slam.getpos()
+        scale = self.MAP_SIZE_PIXELS / (self.MAP_SIZE_METERS * 1000)
+        reach_px = (self.LIDAR_MAX_RANGE_MM + self.HOLE_WIDTH_MM / 2) * scale + 1
+        last_tile = self.TILES_PER_SIDE - 1
+
+        def to_tile(pixel: float) -> int:
+            return max(0, min(last_tile, int(pixel // self.TILE_SIZE_PIXELS)))
+
+        footprint = (to_tile(y_mm * scale - reach_px), to_tile(y_mm * scale + reach_px),
+                     to_tile(x_mm * scale - reach_px), to_tile(x_mm * scale + reach_px))
+        if self._pending_tiles is None:
+            self._pending_tiles = footprint
+        else:
+            p = self._pending_tiles
+            self._pending_tiles = (min(p[0], footprint[0]), max(p[1], footprint[1]),
+                                   min(p[2], footprint[2]), max(p[3], footprint[3]))
+
+    def _track_changed_tiles(self):
+        """
+        Compara o buffer recém-atualizado com o snapshot apenas dentro do
+        footprint pendente e carimba a versão atual nos tiles que mudaram.
+        """
+        if self._pending_tiles is None:
+            return
+        row_min, row_max, col_min, col_max = self._pending_tiles
+        self._pending_tiles = None
+
+        t = self.TILE_SIZE_PIXELS
+        y0, y1 = row_min * t, min(self.MAP_SIZE_PIXELS, (row_max + 1) * t)
+        x0, x1 = col_min * t, min(self.MAP_SIZE_PIXELS, (col_max + 1) * t)
+        current = self._map_array[y0:y1, x0:x1]
+        snapshot = self._tile_snapshot[y0:y1, x0:x1]
+
+        # Reduz a máscara de diferenças pixel a pixel para uma máscara por tile.
+        diff = current != snapshot
+        diff = np.logical_or.reduceat(diff, np.arange(0, y1 - y0, t), axis=0)
+        diff = np.logical_or.reduceat(diff, np.arange(0, x1 - x0, t), axis=1)
+
+        self._tile_versions[row_min:row_max + 1, col_min:col_max + 1][diff] = self.map_version
+        snapshot[...] = current
+
+    def changed_tiles(self, since_version: int) -> tuple[int, list[tuple[int, int]]]:
+        """
+        Lista os tiles do mapa que mudaram depois de `since_version`.
+
+        Permite que consumidores (publicação, visualização, cobertura) processem
+        apenas a parte do mapa que mudou. Use `since_version=-1` para obter todos
+        os tiles, e guarde a versão retornada para a próxima consulta.
+
+        Returns:
+            tuple: (versão_atual, [(linha_tile, coluna_tile), ...])
+        """
+        self.get_map_array()
+        rows, cols = np.nonzero(self._tile_versions > since_version)
+        return self.map_version, list(zip(rows.tolist(), cols.tolist()))
+
+    def get_tile(self, tile_row: int, tile_col: int) -> np.ndarray:
+        """Retorna a view somente-leitura dos pixels de um tile do mapa."""
+        t = self.TILE_SIZE_PIXELS
+        return self.get_map_array()[tile_row * t:(tile_row + 1) * t, tile_col * t:(tile_col + 1) * t]
+
+    def get_raw_pose_mm_deg(self) -> tuple[float, float, float]:
+        """
+        Retorna a pose interna do SLAM, sem clamping, nas unidades do BreezySLAM
+        (com `use_chunked_map`, no referencial global e não no da janela).
+        """
+        x_mm, y_mm, theta_deg = self.slam.getpos()
+        row, col = self._window_origin_px
+        return x_mm + col * self._mm_per_pixel, y_mm + row * self._mm_per_pixel, theta_deg
+
+    @property
+    def window_origin_px(self) -> tuple[int, int]:
+        """Origem global (linha, coluna), em pixels, da janela do SLAM ((0, 0) sem `use_chunked_map`)."""
+        return self._window_origin_px
+
+    def check_restore(self, map_array: np.ndarray, pose_mm_deg: tuple[float, float, float],
+                      chunks: tuple[np.ndarray, np.ndarray] = None,
+                      window_origin_px: tuple[int, int] = None):
+        """
+        Valida um estado salvo para `restore` sem alterar nada; levanta
+        `ValueError` se ele for incompatível com a configuração atual.
+        """
+        if len(pose_mm_deg) != 3:
+            raise ValueError(f"Pose salva deveria ter 3 componentes, tem {len(pose_mm_deg)}")
+        if self.chunked_map is not None:
+            if chunks is None:
+                raise ValueError("Checkpoint sem chunks para um SLAMManager com use_chunked_map")
+            c = self.chunked_map.CHUNK_SIZE_PIXELS
+            if chunks[1].shape[1:] != (c, c):
+                raise ValueError(f"Chunks salvos têm dimensão {chunks[1].shape[1:]}, esperado {c}x{c}")
+            if window_origin_px is not None and len(window_origin_px) != 2:
+                raise ValueError(f"Origem da janela salva deveria ter 2 componentes, tem {len(window_origin_px)}")
+            return
+        if map_array.shape != (self.MAP_SIZE_PIXELS, self.MAP_SIZE_PIXELS):
+            raise ValueError(f"Mapa salvo tem dimensão {map_array.shape}, "
+                             f"esperado {self.MAP_SIZE_PIXELS}x{self.MAP_SIZE_PIXELS}")
+
+    def restore(self, map_array: np.ndarray, pose_mm_deg: tuple[float, float, float],
+                chunks: tuple[np.ndarray, np.ndarray] = None, window_origin_px: tuple[int, int] = None):
+        """
+        Restaura o mapa e a pose do SLAM a partir de um estado salvo
+        (ver `CheckpointManager`), continuando o mapeamento de onde parou.
+        O estado é validado (`check_restore`) antes de qualquer alteração.
+
+        Args:
+            map_array: Mapa `uint8` (altura x largura), como o de `get_map_array`
+            pose_mm_deg: Pose interna do SLAM, como a de `get_raw_pose_mm_deg`
+            chunks: Com `use_chunked_map`, os chunks salvos (`ChunkedMap.to_arrays`);
+                a janela é reconstruída a partir deles e `map_array` é ignorado
+            window_origin_px: Com `use_chunked_map`, a origem da janela salva
+                (`window_origin_px`), para retomar com o mesmo recorte; se
+                omitida, a recentralização escolhe uma janela em torno da pose
+        """
+        self.check_restore(map_array, pose_mm_deg, chunks, window_origin_px)
+        if self.chunked_map is not None:
+            self._scan_window = []
+            self._keyframe_ranges_cm = None
+            self._skipped_delta = (0.0, 0.0, 0.0)
+            self.chunked_map.load_arrays(*chunks)
+            # Sem a origem salva, começa com a janela na origem global e deixa a
+            # recentralização trazer o recorte certo para a pose salva.
+            row, col = (int(v) for v in window_origin_px) if window_origin_px is not None else (0, 0)
+            self._window_origin_px = (row, col)
+            window = np.empty((self.MAP_SIZE_PIXELS, self.MAP_SIZE_PIXELS), dtype=np.uint8)
+            self.chunked_map.read_region(window, row, col)
+            self.slam.setmap(window)
+            x_mm, y_mm, theta_deg = pose_mm_deg
+            self.slam.setpos(x_mm - col * self._mm_per_pixel, y_mm - row * self._mm_per_pixel, theta_deg)
+            self.map_version += 1
+            self._pending_tiles = (0, self.TILES_PER_SIDE - 1, 0, self.TILES_PER_SIDE - 1)
+            self._recenter_window_if_needed()
+            return
+
+        self._scan_window = []
+        self._keyframe_ranges_cm = None
+        self._skipped_delta = (0.0, 0.0, 0.0)
+        self.slam.setmap(np.ascontiguousarray(map_array, dtype=np.uint8))
+        self.slam.setpos(*pose_mm_deg)
+
+        # O mapa inteiro mudou: todos os tiles viram candidatos.
+        self._pending_tiles = (0, self.TILES_PER_SIDE - 1, 0, self.TILES_PER_SIDE - 1)
+        if not self.use_worker_process:
+            self.map_version += 1
+
+    def close(self):
+        """Libera os recursos do SLAM (encerra o processo worker, se houver)."""
+        if self.use_worker_process:
+            self.slam.close()
 
     def get_corrected_pose_cm_rad(self) -> tuple[float, float, float]:
         """
         Consulta o SLAM para obter a pose mais provável do robô e a retorna
         nas unidades padrão da nossa aplicação (cm e radianos).
         
-        Aplica limites rígidos (clamping) para evitar drift para fora do mapa.
+        Aplica limites rígidos (clamping) para evitar drift para fora do mapa
+        (exceto com `use_chunked_map`, em que o mapa não tem limites fixos).
         """
-        x_mm, y_mm, theta_deg = self.slam.getpos()
+        x_mm, y_mm, theta_deg = self.get_raw_pose_mm_deg()
         
         # Clamp para manter dentro dos limites do mapa
-        x_mm = max(self.min_x_mm, min(self.max_x_mm, x_mm))
-        y_mm = max(self.min_y_mm, min(self.max_y_mm, y_mm))
+        if self.chunked_map is None:
+            x_mm = max(self.min_x_mm, min(self.max_x_mm, x_mm))
+            y_mm = max(self.min_y_mm, min(self.max_y_mm, y_mm))
         
         # Normaliza theta para [-180, 180]
         while theta_deg > 180:
@@ -143,15 +648,67 @@ class SLAMManager:
         
         return x_mm / 10.0, y_mm / 10.0, math.radians(theta_deg)
 
+    def get_map_array(self) -> np.ndarray:
+        """
+        Retorna o mapa atual como uma view NumPy `uint8` (altura x largura)
+        somente-leitura sobre o buffer persistente. Com `use_chunked_map`, é a
+        janela em torno do robô (o mapa completo está em `get_chunked_map`).
+
+        O buffer é reaproveitado entre ciclos e atualizado in-place pelo
+        `getmap` do BreezySLAM apenas quando o mapa mudou. Quem precisar
+        guardar um snapshot deve fazer `.copy()`.
+        """
+        if self.use_worker_process and self.slam.map_version != self.map_version:
+            # A pose do worker pode já ter avançado além das atualizações
+            # refletidas no mapa lido, então o footprint não é confiável:
+            # todos os tiles viram candidatos.
+            self.map_version = self.slam.map_version
+            self._pending_tiles = (0, self.TILES_PER_SIDE - 1, 0, self.TILES_PER_SIDE - 1)
+
+        if self._buffer_version != self.map_version:
+            copied_version = self.slam.getmap(self._map_buffer)
+            # O worker pode ter publicado outra versão entre a leitura acima e a cópia
+            if self.use_worker_process:
+                self.map_version = copied_version
+            self._buffer_version = self.map_version
+            self._track_changed_tiles()
+        return self._map_array
+
+    def get_map_frame(self) -> tuple[np.ndarray, float, tuple[float, float]]:
+        """
+        Retorna o mapa atual (`get_map_array`), sua resolução (mm por pixel) e
+        a posição global (x_cm, y_cm) do pixel (0, 0) — diferente de zero só
+        com `use_chunked_map`, em que o mapa é a janela em torno do robô.
+        """
+        row, col = self._window_origin_px
+        return (self.get_map_array(), self._mm_per_pixel,
+                (col * self._mm_per_pixel / 10, row * self._mm_per_pixel / 10))
+
     def get_map_image(self) -> Image.Image:
         """
-        Extrai os dados brutos do mapa do SLAM e os converte em um objeto de
-        imagem da biblioteca PIL, pronto para ser salvo ou exibido.
+        Retorna o mapa como imagem PIL em tons de cinza ('L'), pronta para ser
+        salva ou exibida.
+
+        A imagem é construída preguiçosamente, apenas quando algum consumidor a
+        pede, e reaproveitada enquanto o mapa não mudar. Ela é um snapshot: não
+        compartilha memória com o buffer do mapa, que o próximo `getmap`
+        sobrescreve in-place.
         """
-        mapbytes = bytearray(self.MAP_SIZE_PIXELS * self.MAP_SIZE_PIXELS)
-        self.slam.getmap(mapbytes)
-        
-        return Image.frombuffer(
-            'L', (self.MAP_SIZE_PIXELS, self.MAP_SIZE_PIXELS), 
-            bytes(mapbytes), 'raw', 'L', 0, 1
-        ).convert("RGB")
\ No newline at end of file
+        map_array = self.get_map_array()
+        if self._image_version != self.map_version:
+            self._image_cache = Image.fromarray(map_array.copy(), 'L')
+            self._image_version = self.map_version
+        return self._image_cache
+
+    def save_map(self, path: str, ascii_pgm: bool = False):
+        """
+        Salva o mapa atual em disco; o formato vem da extensão (.pgm binário
+        por padrão, .png, ...). Ver `src.mapping.map_export.save_map`.
+
+        Com `use_chunked_map`, salva o mapa global inteiro (`ChunkedMap.to_dense`)
+        e não a janela móvel, cujo conteúdo salta a cada recentralização.
+        """
+        if self.chunked_map is not None:
+            save_map(path, self.get_chunked_map().to_dense()[0], ascii_pgm)
+            return
+        save_map(path, self.get_map_array(), ascii_pgm)
@@ -0,0 +1,255 @@
+"""
+SLAM Worker - Executa o BreezySLAM em um processo dedicado
+
+Move a busca RMHC e a atualização do mapa para fora do processo do Cérebro:
+- Scans e odometria chegam ao worker por uma fila curta (envio não-bloqueante);
+  com a fila cheia, o cliente retém o update e funde os seguintes nele
+- O mapa é escrito em `multiprocessing.shared_memory`, em buffer duplo: o
+  worker escreve no buffer de trás e só então o publica
+- A pose mais recente, a versão do mapa e o buffer publicado ficam em um
+  array compartilhado
+- Uma exceção no worker é devolvida ao Cérebro, que passa a levantar erro em
+  vez de seguir com uma pose parada
+
+Assim o loop de controle e os publicadores nunca esperam pelo SLAM, que passa
+a ocupar um núcleo próprio (ex: Raspberry Pi 4).
+
+Autor: FLEET-MOTTU
+"""
+
+import multiprocessing as mp
+import queue
+import time
+import traceback
+from multiprocessing import shared_memory
+
+# Índices do array compartilhado de estado publicado pelo worker.
+_X_MM, _Y_MM, _THETA_DEG, _VERSION, _BUFFER = range(5)
+
+
+def _run_worker(laser_args: tuple, map_size_pixels: int, map_size_meters: float, slam_kwargs: dict,
+                update_queue: mp.Queue, shm_name: str, state, error_queue: mp.Queue):
+    """
+    Ponto de entrada do processo do SLAM.
+
+    Consome comandos da fila até receber `None`: ("update", (scan_mm,
+    pose_change, scan_angles_degrees, should_update_map)), ("setmap", bytes)
+    ou ("setpos", pose). Após cada comando, publica mapa, pose e versão.
+
+    O mapa vai para o buffer que não está publicado e a troca acontece sob o
+    lock do estado, o mesmo que o cliente segura ao copiar: um leitor nunca vê
+    um mapa escrito pela metade.
+
+    Uma exceção encerra o worker; o traceback vai para `error_queue`, de onde
+    o cliente o lê ao perceber que o processo morreu.
+    """
+    try:
+        _serve(laser_args, map_size_pixels, map_size_meters, slam_kwargs, update_queue, shm_name, state)
+    except Exception:
+        error_queue.put(traceback.format_exc())
+        raise
+
+
+def _serve(laser_args: tuple, map_size_pixels: int, map_size_meters: float, slam_kwargs: dict,
+           update_queue: mp.Queue, shm_name: str, state):
+    """Laço de comandos do worker (ver `_run_worker`)."""
+    # Importado aqui: o processo filho resolve o caminho da biblioteca ao
+    # importar o pacote `src.mapping`.
+    from breezyslam.algorithms import RMHC_SLAM
+    from breezyslam.sensors import Laser
+
+    slam = RMHC_SLAM(Laser(*laser_args), map_size_pixels, map_size_meters, **slam_kwargs)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    # O BreezySLAM escreve o mapa direto na memória compartilhada, sem buffer intermediário.
+    map_size_bytes = map_size_pixels * map_size_pixels
+    shared_maps = [shm.buf[k * map_size_bytes:(k + 1) * map_size_bytes] for k in range(2)]
+    back = 1  # O buffer 0 (mapa inicial) começa publicado
+
+    try:
+        while True:
+            item = update_queue.get()
+            if item is None:
+                break
+            command, payload = item
+            if command == "update":
+                slam.update(*payload)
+            elif command == "setmap":
+                slam.setmap(payload)
+            elif command == "setpos":
+                slam.setpos(*payload)
+            slam.getmap(shared_maps[back])
+
+            # Pose, versão e buffer são publicados juntos, sob o lock do array, para
+            # que o leitor nunca veja uma pose de uma versão com o número de outra.
+            x_mm, y_mm, theta_deg = slam.getpos()
+            with state.get_lock():
+                state[_X_MM], state[_Y_MM], state[_THETA_DEG] = x_mm, y_mm, theta_deg
+                state[_VERSION] += 1
+                state[_BUFFER] = back
+            back = 1 - back
+    finally:
+        for shared_map in shared_maps:
+            shared_map.release()
+        shm.close()
+
+
+class SLAMWorkerClient:
+    """
+    Proxy, no processo do Cérebro, para o SLAM rodando no processo worker.
+
+    Expõe o mesmo subconjunto da interface do `RMHC_SLAM` usado pelo
+    `SLAMManager` (`update`, `getpos`, `getmap`, `setmap`, `setpos`), mais
+    `map_version` com o número de atualizações já aplicadas pelo worker.
+    `update` apenas enfileira o comando e retorna imediatamente.
+
+    A fila tem só `QUEUE_SIZE` posições: se o SLAM fica mais lento que o
+    loop, o atraso da pose não cresce sem limite. Com a fila cheia, o update
+    fica retido no cliente e os seguintes são fundidos nele (vale o scan mais
+    recente; as odometrias se somam, então nenhum deslocamento se perde).
+
+    Se o worker morre, as chamadas seguintes levantam `RuntimeError` (com o
+    traceback do worker, se houver) em vez de aceitar scans em silêncio.
+    Comandos bloqueantes desistem após `PUT_TIMEOUT_S` com `TimeoutError`.
+    """
+    QUEUE_SIZE = 2
+    PUT_TIMEOUT_S = 5.0
+
+    def __init__(self, laser_args: tuple, map_size_pixels: int, map_size_meters: float, slam_kwargs: dict):
+        """
+        Cria a memória compartilhada do mapa e inicia o processo worker.
+
+        Args:
+            laser_args: Parâmetros posicionais do `Laser` do BreezySLAM
+            map_size_pixels: Resolução do mapa (largura = altura)
+            map_size_meters: Dimensão física do mapa
+            slam_kwargs: Parâmetros nomeados do `RMHC_SLAM`
+        """
+        self._map_size_bytes = map_size_pixels * map_size_pixels
+        # Dois buffers do mapa (ver `_run_worker`), ambos começando desconhecidos.
+        self._shm = shared_memory.SharedMemory(create=True, size=2 * self._map_size_bytes)
+        self._shm.buf[:2 * self._map_size_bytes] = bytes([127]) * (2 * self._map_size_bytes)
+
+        # Pose inicial igual à do BreezySLAM: centro do mapa, orientação zero.
+        center_mm = 500 * map_size_meters
+        self._state = mp.Array('d', [center_mm, center_mm, 0.0, 0.0, 0.0])
+
+        self._queue = mp.Queue(maxsize=self.QUEUE_SIZE)
+        # Traceback enviado pelo worker ao morrer (lido uma vez, em `_check_alive`).
+        self._errors = mp.Queue()
+        self._worker_error = None
+        # Update retido enquanto a fila está cheia, e quantos updates já foram fundidos nele.
+        self._held_update = None
+        self.merged_updates = 0
+        self._process = mp.Process(
+            target=_run_worker,
+            args=(laser_args, map_size_pixels, map_size_meters, slam_kwargs,
+                  self._queue, self._shm.name, self._state, self._errors),
+            name="slam-worker",
+            daemon=True
+        )
+        self._process.start()
+        print(f"[SLAM] Worker iniciado no processo {self._process.pid}.")
+
+    @property
+    def map_version(self) -> int:
+        """Número de atualizações já aplicadas ao mapa pelo worker."""
+        return int(self._state[_VERSION])
+
+    def update(self, scans_mm, pose_change: tuple[float, float, float],
+               scan_angles_degrees=None, should_update_map: bool = True):
+        """
+        Enfileira um scan e sua odometria para o worker (não-bloqueante). Com
+        a fila cheia, funde o update no que está retido no cliente.
+        """
+        self._check_alive()
+        if self._held_update is not None:
+            _, held_change, _, held_should_update_map = self._held_update
+            pose_change = tuple(a + b for a, b in zip(held_change, pose_change))
+            should_update_map = should_update_map or held_should_update_map
+            self.merged_updates += 1
+        self._held_update = (scans_mm, pose_change, scan_angles_degrees, should_update_map)
+        self._try_send_held()
+
+    def _try_send_held(self):
+        """Envia o update retido se a fila tiver espaço (não-bloqueante)."""
+        if self._held_update is None:
+            return
+        try:
+            self._queue.put_nowait(("update", self._held_update))
+            self._held_update = None
+        except queue.Full:
+            pass
+
+    def _check_alive(self):
+        """Levanta `RuntimeError` se o processo worker já terminou."""
+        if self._process.is_alive():
+            return
+        if self._worker_error is None:
+            try:
+                self._worker_error = self._errors.get(timeout=0.5)
+            except queue.Empty:
+                self._worker_error = "sem traceback (processo finalizado externamente?)"
+        raise RuntimeError(f"Worker do SLAM encerrado (código {self._process.exitcode}): {self._worker_error}")
+
+    def _put(self, item, timeout: float):
+        """`put` bloqueante que desiste se o worker morrer ou após `timeout` segundos."""
+        deadline = time.monotonic() + timeout
+        while True:
+            self._check_alive()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Worker do SLAM não consumiu a fila em {timeout:.1f}s")
+            try:
+                self._queue.put(item, timeout=min(remaining, 0.1))
+                return
+            except queue.Full:
+                pass
+
+    def _put_in_order(self, command: tuple | None, timeout: float | None = None):
+        """Enfileira um comando que não pode ser descartado, depois do update retido (bloqueante)."""
+        timeout = self.PUT_TIMEOUT_S if timeout is None else timeout
+        if self._held_update is not None:
+            self._put(("update", self._held_update), timeout)
+            self._held_update = None
+        self._put(command, timeout)
+
+    def setmap(self, mapbytes):
+        """Enfileira a substituição do mapa do worker (ex: ao retomar de um checkpoint)."""
+        self._put_in_order(("setmap", bytes(mapbytes)))
+
+    def setpos(self, x_mm: float, y_mm: float, theta_degrees: float):
+        """Enfileira a redefinição da pose do worker."""
+        self._put_in_order(("setpos", (x_mm, y_mm, theta_degrees)))
+
+    def getpos(self) -> tuple[float, float, float]:
+        """Retorna a última pose publicada pelo worker (x_mm, y_mm, theta_degrees)."""
+        self._check_alive()
+        self._try_send_held()
+        with self._state.get_lock():
+            return self._state[_X_MM], self._state[_Y_MM], self._state[_THETA_DEG]
+
+    def getmap(self, mapbytes) -> int:
+        """
+        Copia o mapa publicado mais recente para `mapbytes` (bytearray ou array
+        NumPy) e retorna a versão copiada. A cópia é feita sob o lock do
+        estado: o worker não consegue publicar outro buffer (e depois
+        sobrescrever este) no meio dela.
+        """
+        self._check_alive()
+        self._try_send_held()
+        with self._state.get_lock():
+            start = int(self._state[_BUFFER]) * self._map_size_bytes
+            memoryview(mapbytes).cast('B')[:] = self._shm.buf[start:start + self._map_size_bytes]
+            return int(self._state[_VERSION])
+
+    def close(self, timeout: float = 2.0):
+        """Encerra o worker (processando o que ainda estiver na fila) e libera a memória compartilhada."""
+        try:
+            self._put_in_order(None, timeout=timeout)
+        except (ValueError, RuntimeError, TimeoutError) as e:
+            print(f"[SLAM] Worker não encerrou normalmente: {e}")
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._shm.close()
+        self._shm.unlink()
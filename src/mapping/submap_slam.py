@@ -0,0 +1,486 @@
+"""
+Submap SLAM - Camada de submapas com fechamento de laço sobre o SLAMManager
+
+O mapa global é dividido em submapas locais de tamanho fixo. Apenas o submapa
+ativo roda o BreezySLAM (um `SLAMManager` pequeno), então o custo por
+atualização é limitado pelo tamanho do submapa, não pela área explorada:
+- Cada submapa tem uma âncora (pose global do seu centro), que é um nó do
+  `PoseGraph`; submapas consecutivos são ligados pela pose final do robô
+- Ao finalizar um submapa, uma thread em segundo plano procura fechamentos de
+  laço casando seus obstáculos com os de submapas antigos próximos
+- Cada laço encontrado vira uma aresta e o grafo é otimizado, reancorando
+  todos os submapas (inclusive o ativo, corrigindo a pose global do robô)
+- A otimização e a repintura dos submapas finalizados rodam na thread de
+  busca, sobre uma cópia do grafo; o thread de controle só troca as âncoras e
+  a camada pronta, sem custo proporcional ao nº de submapas
+
+Autor: FLEET-MOTTU
+"""
+
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+from src.mapping.slam_manager import SLAMManager
+from src.mapping.map_export import save_map
+from src.mapping.pose_graph import PoseGraph, compose, relative
+from src.robot.scan import Scan
+
+# Pixels mais escuros que este valor são considerados obstáculos no casamento.
+OBSTACLE_PIXEL = 100
+UNKNOWN_PIXEL = 127
+
+# Matrizes de informação (inverso da covariância) das arestas do grafo.
+ODOMETRY_INFORMATION = np.diag([1 / 100.0**2, 1 / 100.0**2, 1 / math.radians(3)**2])
+LOOP_CLOSURE_INFORMATION = np.diag([1 / 50.0**2, 1 / 50.0**2, 1 / math.radians(2)**2])
+
+# Janela de busca do casamento de submapas em torno da estimativa do grafo.
+LOOP_SEARCH_XY_MM = 600.0
+LOOP_SEARCH_THETA_DEG = 8.0
+LOOP_MIN_SCORE = 0.5
+LOOP_MIN_POINTS = 30
+LOOP_MAX_POINTS = 500
+
+
+class Submap:
+    """
+    Um submapa: o nó do grafo que guarda sua âncora e, enquanto ativo, o
+    `SLAMManager` local; ao ser finalizado, a grade congelada e os pontos de
+    obstáculo usados no casamento. O referencial local tem origem no centro
+    da grade.
+    """
+    def __init__(self, node_id: int, slam: SLAMManager = None, grid: np.ndarray = None):
+        self.node_id = node_id
+        self.slam = slam
+        self.grid = grid
+        self.points_mm = None
+        self.scan_count = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.grid is not None
+
+
+def obstacle_points(grid: np.ndarray, mm_per_pixel: float) -> np.ndarray:
+    """Centros dos pixels de obstáculo de uma grade, em mm no referencial local (N, 2)."""
+    rows, cols = np.nonzero(grid < OBSTACLE_PIXEL)
+    if len(rows) > LOOP_MAX_POINTS:
+        keep = np.linspace(0, len(rows) - 1, LOOP_MAX_POINTS).astype(int)
+        rows, cols = rows[keep], cols[keep]
+    half_height, half_width = grid.shape[0] / 2, grid.shape[1] / 2
+    return np.column_stack(((cols + 0.5 - half_width) * mm_per_pixel,
+                            (rows + 0.5 - half_height) * mm_per_pixel))
+
+
+def _search_pose(score_map: np.ndarray, points_mm: np.ndarray, center: np.ndarray, mm_per_pixel: float,
+                 xy_range_mm: float, xy_step_mm: float, theta_range_deg: float, theta_step_deg: float):
+    """
+    Avalia todas as poses da grade de busca em torno de `center` e retorna a
+    de maior média de `score_map` sob os pontos transformados.
+
+    Returns:
+        tuple: (pose, score, True se a melhor pose está na borda da busca em x/y)
+    """
+    height, width = score_map.shape
+    offsets = np.arange(-xy_range_mm, xy_range_mm + 1e-6, xy_step_mm)
+    off_x, off_y = np.meshgrid(offsets, offsets)
+    off_x, off_y = off_x.ravel()[:, None], off_y.ravel()[:, None]
+
+    best = (center, -1.0, False)
+    for dtheta in np.radians(np.arange(-theta_range_deg, theta_range_deg + 1e-6, theta_step_deg)):
+        theta = center[2] + dtheta
+        c, s = math.cos(theta), math.sin(theta)
+        px = center[0] + c * points_mm[:, 0] - s * points_mm[:, 1]
+        py = center[1] + s * points_mm[:, 0] + c * points_mm[:, 1]
+
+        cols = np.floor((px + off_x) / mm_per_pixel + width / 2).astype(int)
+        rows = np.floor((py + off_y) / mm_per_pixel + height / 2).astype(int)
+        inside = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+        values = np.zeros(cols.shape)
+        values[inside] = score_map[rows[inside], cols[inside]]
+        scores = values.mean(axis=1)
+
+        k = int(np.argmax(scores))
+        if scores[k] > best[1]:
+            dx, dy = off_x[k, 0], off_y[k, 0]
+            on_border = max(abs(dx), abs(dy)) >= offsets[-1] - 1e-6
+            best = (np.array([center[0] + dx, center[1] + dy, theta]), float(scores[k]), on_border)
+    return best
+
+
+def match_points_to_grid(grid: np.ndarray, points_mm: np.ndarray, initial: np.ndarray,
+                         mm_per_pixel: float) -> tuple[np.ndarray, float]:
+    """
+    Busca a pose relativa que melhor encaixa pontos de obstáculo (de outro
+    submapa) nos obstáculos de `grid`, em torno de `initial`.
+
+    A busca grossa usa os obstáculos dilatados em 1 pixel e dá o score (fração
+    dos pontos sobre obstáculos); o refinamento usa a escuridão dos pixels,
+    que desempata os platôs da busca grossa. Um ótimo na borda da janela de
+    busca é ambíguo (o verdadeiro pode estar fora dela) e recebe score 0.
+
+    Returns:
+        tuple: (melhor pose (x_mm, y_mm, theta_rad), score em [0, 1])
+    """
+    mask = grid < OBSTACLE_PIXEL
+    dilated = mask.copy()
+    dilated[1:, :] |= mask[:-1, :]
+    dilated[:-1, :] |= mask[1:, :]
+    dilated[:, 1:] |= mask[:, :-1]
+    dilated[:, :-1] |= mask[:, 1:]
+
+    coarse_step_mm = 2 * mm_per_pixel
+    pose, score, on_border = _search_pose(dilated.astype(float), points_mm, initial, mm_per_pixel,
+                                          LOOP_SEARCH_XY_MM, coarse_step_mm, LOOP_SEARCH_THETA_DEG, 1.0)
+    if on_border:
+        return pose, 0.0
+
+    darkness = (255.0 - grid) / 255.0
+    pose, _, _ = _search_pose(darkness, points_mm, pose, mm_per_pixel,
+                              coarse_step_mm, mm_per_pixel / 2, 1.0, 0.25)
+    return pose, score
+
+
+class SubmapSLAMManager:
+    """
+    Substituto do `SLAMManager` baseado em submapas e grafo de poses.
+
+    Expõe a mesma interface usada pelo loop principal e pelo
+    `CheckpointManager` (`update`, `get_corrected_pose_cm_rad`,
+    `get_map_array`, `get_map_image`, `save_map`, `get_raw_pose_mm_deg`,
+    `restore`, `close`), com o mapa global montado a partir dos submapas reancorados.
+    """
+    def __init__(self, map_size_pixels: int = 500, map_size_meters: int = 25,
+                 submap_size_meters: float = 8.0, scans_per_submap: int = 40,
+                 loop_closure_radius_mm: float = 4000.0, aggregation_window: int = 1,
+                 use_keyframes: bool = True, search_threads: int = 1, map_update_threads: int = 1):
+        """
+        Args:
+            map_size_pixels: Resolução do mapa global montado (largura = altura)
+            map_size_meters: Dimensão física do mapa global
+            submap_size_meters: Lado de cada submapa (mesma resolução do global)
+            scans_per_submap: Nº máximo de scans integrados em um submapa
+            loop_closure_radius_mm: Distância máxima entre âncoras para tentar
+                casar dois submapas
+            aggregation_window: Repassado ao `SLAMManager` de cada submapa
+            use_keyframes: Repassado ao `SLAMManager` de cada submapa
+            search_threads: Repassado ao `SLAMManager` de cada submapa
+            map_update_threads: Repassado ao `SLAMManager` de cada submapa
+        """
+        self.MAP_SIZE_PIXELS = map_size_pixels
+        self.MAP_SIZE_METERS = map_size_meters
+        self.MM_PER_PIXEL = map_size_meters * 1000 / map_size_pixels
+        self.SUBMAP_SIZE_PIXELS = int(round(submap_size_meters * 1000 / self.MM_PER_PIXEL))
+        self.SUBMAP_SIZE_METERS = self.SUBMAP_SIZE_PIXELS * self.MM_PER_PIXEL / 1000
+        self.SCANS_PER_SUBMAP = scans_per_submap
+        self.LOOP_CLOSURE_RADIUS_MM = loop_closure_radius_mm
+        self.AGGREGATION_WINDOW = aggregation_window
+        self.USE_KEYFRAMES = use_keyframes
+        self.SEARCH_THREADS = search_threads
+        self.MAP_UPDATE_THREADS = map_update_threads
+        self._finished_keyframe_stats = {"keyframe": 0, "localization_only": 0, "skipped": 0}
+
+        self.graph = PoseGraph()
+        self.submaps: list[Submap] = []
+        self._active = None
+
+        # Compatibilidade com o `CheckpointManager` (o mapa global é denso).
+        self.chunked_map = None
+
+        # Busca de laços e otimização em segundo plano. O lock protege as
+        # alterações do grafo (nós e arestas novos, troca das âncoras) e o
+        # resultado da última otimização, aplicado no thread de controle;
+        # `_graph_generation` muda quando o grafo é recriado (`restore`).
+        self._loop_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="loop-closure")
+        self._graph_lock = threading.Lock()
+        self._graph_generation = 0
+        self._optimized = None
+
+        # Mapa global: camada com os submapas finalizados (refeita só quando o
+        # grafo é otimizado) + o submapa ativo pintado por cima sob demanda.
+        self.map_version = 0
+        self._finished_layer = np.full((map_size_pixels, map_size_pixels), UNKNOWN_PIXEL, dtype=np.uint8)
+        self._finished_layer_dirty = False
+        self._map_array = None
+        self._map_array_version = -1
+        self._image_cache = None
+        self._image_version = -1
+
+        center_mm = 500 * map_size_meters
+        self._start_submap(self.graph.add_node(np.array([center_mm, center_mm, 0.0])))
+
+    def _start_submap(self, node_id: int):
+        """Cria o submapa ativo ancorado no nó `node_id`."""
+        slam = SLAMManager(self.SUBMAP_SIZE_PIXELS, self.SUBMAP_SIZE_METERS,
+                           aggregation_window=self.AGGREGATION_WINDOW, use_keyframes=self.USE_KEYFRAMES,
+                           search_threads=self.SEARCH_THREADS,
+                           map_update_threads=self.MAP_UPDATE_THREADS)
+        self._active = Submap(node_id, slam=slam)
+        with self._graph_lock:
+            self.submaps.append(self._active)
+
+    def _active_relative_pose(self) -> np.ndarray:
+        """Pose do robô no referencial (centrado) do submapa ativo: (x_mm, y_mm, theta_rad)."""
+        x_mm, y_mm, theta_deg = self._active.slam.get_raw_pose_mm_deg()
+        half_mm = self.SUBMAP_SIZE_METERS * 500
+        return np.array([x_mm - half_mm, y_mm - half_mm, math.radians(theta_deg)])
+
+    def _global_pose(self) -> np.ndarray:
+        """Pose global do robô: âncora do submapa ativo ⊕ pose local."""
+        return compose(self.graph.nodes[self._active.node_id], self._active_relative_pose())
+
+    def update(self, scan_data_cm: Scan | list[tuple[int, int]], odometry_delta: tuple[float, float, float],
+               odometry_heading_rad: float | None = None):
+        """
+        Integra um scan e a odometria global (dx_cm, dy_cm, dtheta_rad) no
+        submapa ativo, aplica os fechamentos de laço já encontrados e finaliza
+        o submapa quando ele fica cheio ou o robô se afasta do seu centro.
+        `odometry_heading_rad` é repassado ao `SLAMManager.update` do submapa.
+        """
+        # A odometria chega no referencial do mapa global; o SLAM local a
+        # espera no referencial do submapa ativo.
+        anchor_theta = self.graph.nodes[self._active.node_id][2]
+        c, s = math.cos(anchor_theta), math.sin(anchor_theta)
+        dx_cm, dy_cm, dtheta_rad = odometry_delta
+        if odometry_heading_rad is not None:
+            odometry_heading_rad -= anchor_theta
+        self._active.slam.update(scan_data_cm, (c * dx_cm + s * dy_cm, -s * dx_cm + c * dy_cm, dtheta_rad),
+                                 odometry_heading_rad)
+        self._active.scan_count += 1
+
+        self._apply_loop_closures()
+
+        # Finaliza antes que o alcance do laser saia da grade do submapa.
+        max_offset_mm = max(self.SUBMAP_SIZE_METERS * 250,
+                            self.SUBMAP_SIZE_METERS * 500 - self._active.slam.LIDAR_MAX_RANGE_MM)
+        offset_mm = math.hypot(*self._active_relative_pose()[:2])
+        if self._active.scan_count >= self.SCANS_PER_SUBMAP or offset_mm > max_offset_mm:
+            self._finish_active_submap()
+        self.map_version += 1
+
+    def _finish_active_submap(self):
+        """
+        Congela o submapa ativo, cria o próximo ancorado na pose atual do robô
+        e agenda a busca de fechamentos de laço em segundo plano.
+        """
+        finished = self._active
+        end_pose = self._active_relative_pose()
+        finished.grid = finished.slam.get_map_array().copy()
+        finished.points_mm = obstacle_points(finished.grid, self.MM_PER_PIXEL)
+        for kind, count in finished.slam.keyframe_stats.items():
+            self._finished_keyframe_stats[kind] += count
+        finished.slam.close()
+        finished.slam = None
+        self._paint_submap(self._finished_layer, finished, finished.grid)
+
+        with self._graph_lock:
+            node_id = self.graph.add_node(compose(self.graph.nodes[finished.node_id], end_pose))
+            self.graph.add_edge(finished.node_id, node_id, end_pose, ODOMETRY_INFORMATION)
+        self._start_submap(node_id)
+
+        anchor = self.graph.nodes[finished.node_id]
+        candidates = [sub for sub in self.submaps
+                      if sub.finished and sub.node_id < finished.node_id - 1 and
+                      np.hypot(*(self.graph.nodes[sub.node_id][:2] - anchor[:2])) <=
+                      self.LOOP_CLOSURE_RADIUS_MM + sub.grid.shape[0] * self.MM_PER_PIXEL / 2]
+        if candidates and len(finished.points_mm) >= LOOP_MIN_POINTS:
+            poses = {sub.node_id: self.graph.nodes[sub.node_id].copy() for sub in candidates}
+            self._loop_executor.submit(self._search_loop_closures, finished, candidates, anchor.copy(), poses,
+                                       self._graph_generation)
+
+    def _search_loop_closures(self, submap: Submap, candidates: list[Submap], anchor: np.ndarray, poses: dict,
+                              generation: int):
+        """
+        (Thread de busca) Casa o submapa recém-finalizado com cada candidato;
+        se algum laço é aceito, adiciona as arestas ao grafo, otimiza uma
+        cópia dele e repinta nela os submapas finalizados. O resultado é
+        publicado para `_apply_loop_closures`.
+        """
+        try:
+            closures = []
+            for candidate in candidates:
+                initial = relative(poses[candidate.node_id], anchor)
+                pose, score = match_points_to_grid(candidate.grid, submap.points_mm, initial, self.MM_PER_PIXEL)
+                if score >= LOOP_MIN_SCORE:
+                    closures.append((candidate.node_id, submap.node_id, pose, score))
+            if not closures:
+                return
+
+            with self._graph_lock:
+                if generation != self._graph_generation:
+                    return
+                for i, j, pose, score in closures:
+                    self.graph.add_edge(i, j, pose, LOOP_CLOSURE_INFORMATION)
+                    print(f"[SLAM] 🔁 Laço fechado entre submapas {i} e {j} (score {score:.2f}).")
+                graph = self.graph.copy()
+                finished = [sub for sub in self.submaps if sub.finished]
+
+            iterations = graph.optimize()
+            layer = np.full((self.MAP_SIZE_PIXELS, self.MAP_SIZE_PIXELS), UNKNOWN_PIXEL, dtype=np.uint8)
+            for sub in finished:
+                self._paint_submap(layer, sub, sub.grid, graph.nodes[sub.node_id])
+
+            with self._graph_lock:
+                if generation == self._graph_generation:
+                    # Um resultado mais novo já inclui as arestas dos anteriores.
+                    self._optimized = (graph, iterations, graph.total_error(), layer,
+                                       {sub.node_id for sub in finished})
+        except Exception as e:
+            print(f"[SLAM] Erro na busca de fechamento de laço: {e}")
+
+    def _apply_loop_closures(self):
+        """
+        Aplica a última otimização publicada pela thread de busca: troca as
+        âncoras e a camada de submapas finalizados. Os nós criados depois da
+        cópia otimizada (encadeados pela odometria a partir do último nó dela)
+        acompanham a correção desse nó.
+        """
+        with self._graph_lock:
+            result, self._optimized = self._optimized, None
+            if result is None:
+                return
+            graph, iterations, error, layer, painted = result
+            nodes = self.graph.nodes
+            count = len(graph.nodes)
+            last_before, last_after = nodes[count - 1], graph.nodes[count - 1]
+            for k in range(count, len(nodes)):
+                nodes[k] = compose(last_after, relative(last_before, nodes[k]))
+            nodes[:count] = graph.nodes
+
+        # Submapas finalizados depois da cópia ainda não estão na camada.
+        for submap in self.submaps:
+            if submap.finished and submap.node_id not in painted:
+                self._paint_submap(layer, submap, submap.grid)
+        self._finished_layer = layer
+        print(f"[SLAM] Grafo otimizado em {iterations} iterações "
+              f"({count} submapas, erro {error:.2f}).")
+
+    def _paint_submap(self, layer: np.ndarray, submap: Submap, grid: np.ndarray, anchor: np.ndarray = None):
+        """
+        Pinta a grade de um submapa no mapa global, pela sua âncora (a atual,
+        se `anchor` não é dada).
+
+        Cada pixel global coberto busca o pixel correspondente do submapa
+        (mapeamento inverso, vizinho mais próximo) e fica com o valor mais
+        confiante, isto é, o mais distante de "desconhecido".
+        """
+        if anchor is None:
+            anchor = self.graph.nodes[submap.node_id]
+        height, width = grid.shape
+        radius_px = math.hypot(height, width) / 2 + 1
+        center_col, center_row = anchor[0] / self.MM_PER_PIXEL, anchor[1] / self.MM_PER_PIXEL
+        r0, r1 = max(0, int(center_row - radius_px)), min(self.MAP_SIZE_PIXELS, int(center_row + radius_px) + 1)
+        c0, c1 = max(0, int(center_col - radius_px)), min(self.MAP_SIZE_PIXELS, int(center_col + radius_px) + 1)
+        if r0 >= r1 or c0 >= c1:
+            return
+
+        rows, cols = np.mgrid[r0:r1, c0:c1]
+        gx = (cols + 0.5) * self.MM_PER_PIXEL - anchor[0]
+        gy = (rows + 0.5) * self.MM_PER_PIXEL - anchor[1]
+        c, s = math.cos(anchor[2]), math.sin(anchor[2])
+        local_cols = np.floor((c * gx + s * gy) / self.MM_PER_PIXEL + width / 2).astype(int)
+        local_rows = np.floor((-s * gx + c * gy) / self.MM_PER_PIXEL + height / 2).astype(int)
+        inside = (local_cols >= 0) & (local_cols < width) & (local_rows >= 0) & (local_rows < height)
+
+        values = np.full(rows.shape, UNKNOWN_PIXEL, dtype=np.uint8)
+        values[inside] = grid[local_rows[inside], local_cols[inside]]
+        region = layer[r0:r1, c0:c1]
+        more_confident = (np.abs(values.astype(np.int16) - UNKNOWN_PIXEL) >
+                          np.abs(region.astype(np.int16) - UNKNOWN_PIXEL))
+        region[more_confident] = values[more_confident]
+
+    @property
+    def keyframe_stats(self) -> dict:
+        """Contagens de keyframes, scans só de localização e scans pulados de todos os submapas."""
+        return {kind: count + self._active.slam.keyframe_stats[kind]
+                for kind, count in self._finished_keyframe_stats.items()}
+
+    def get_corrected_pose_cm_rad(self) -> tuple[float, float, float]:
+        """Retorna a pose global do robô, já corrigida pelo grafo, em cm e radianos."""
+        x_mm, y_mm, theta_rad = self._global_pose()
+        return x_mm / 10.0, y_mm / 10.0, theta_rad
+
+    def get_raw_pose_mm_deg(self) -> tuple[float, float, float]:
+        """Retorna a pose global do robô nas unidades do BreezySLAM."""
+        x_mm, y_mm, theta_rad = self._global_pose()
+        return float(x_mm), float(y_mm), math.degrees(theta_rad)
+
+    def check_restore(self, map_array: np.ndarray, pose_mm_deg: tuple[float, float, float],
+                      chunks: tuple[np.ndarray, np.ndarray] = None, window_origin_px: tuple[int, int] = None):
+        """Valida um estado salvo para `restore` sem alterar nada (ver `SLAMManager.check_restore`)."""
+        if chunks is not None or window_origin_px is not None:
+            raise ValueError("SubmapSLAMManager não suporta checkpoints de mapa em chunks")
+        if len(pose_mm_deg) != 3:
+            raise ValueError(f"Pose salva deveria ter 3 componentes, tem {len(pose_mm_deg)}")
+        if map_array.shape != (self.MAP_SIZE_PIXELS, self.MAP_SIZE_PIXELS):
+            raise ValueError(f"Mapa salvo tem dimensão {map_array.shape}, "
+                             f"esperado {self.MAP_SIZE_PIXELS}x{self.MAP_SIZE_PIXELS}")
+
+    def restore(self, map_array: np.ndarray, pose_mm_deg: tuple[float, float, float],
+                chunks: tuple[np.ndarray, np.ndarray] = None, window_origin_px: tuple[int, int] = None):
+        """
+        Recomeça o grafo a partir de um mapa global salvo: ele vira um submapa
+        fixo (nó 0, candidato a fechamentos de laço) e um novo submapa ativo é
+        ancorado na pose salva.
+        """
+        self.check_restore(map_array, pose_mm_deg, chunks, window_origin_px)
+        self._active.slam.close()
+
+        graph = PoseGraph()
+        center_mm = 500 * self.MAP_SIZE_METERS
+        prior = Submap(graph.add_node(np.array([center_mm, center_mm, 0.0])), grid=map_array.copy())
+        prior.points_mm = obstacle_points(prior.grid, self.MM_PER_PIXEL)
+
+        x_mm, y_mm, theta_deg = pose_mm_deg
+        pose = np.array([x_mm, y_mm, math.radians(theta_deg)])
+        node_id = graph.add_node(pose)
+        graph.add_edge(prior.node_id, node_id, relative(graph.nodes[prior.node_id], pose), ODOMETRY_INFORMATION)
+
+        # Buscas ainda em andamento se referem ao grafo antigo e são descartadas.
+        with self._graph_lock:
+            self.graph = graph
+            self.submaps = [prior]
+            self._graph_generation += 1
+            self._optimized = None
+        self._start_submap(node_id)
+        self._finished_layer_dirty = True
+        self.map_version += 1
+
+    def close(self):
+        """Encerra a thread de busca de laços e o SLAM do submapa ativo."""
+        self._loop_executor.shutdown(wait=False, cancel_futures=True)
+        if self._active.slam is not None:
+            self._active.slam.close()
+
+    def get_map_array(self) -> np.ndarray:
+        """
+        Retorna o mapa global (`uint8`, altura x largura, somente-leitura)
+        montado a partir dos submapas em suas âncoras atuais.
+        """
+        if self._map_array_version != self.map_version:
+            if self._finished_layer_dirty:
+                self._finished_layer.fill(UNKNOWN_PIXEL)
+                for submap in self.submaps:
+                    if submap.finished:
+                        self._paint_submap(self._finished_layer, submap, submap.grid)
+                self._finished_layer_dirty = False
+            composite = self._finished_layer.copy()
+            self._paint_submap(composite, self._active, self._active.slam.get_map_array())
+            composite.flags.writeable = False
+            self._map_array = composite
+            self._map_array_version = self.map_version
+        return self._map_array
+
+    def get_map_image(self) -> Image.Image:
+        """Retorna o mapa global como imagem PIL em tons de cinza ('L'), em cache por versão."""
+        map_array = self.get_map_array()
+        if self._image_version != self.map_version:
+            self._image_cache = Image.fromarray(map_array, 'L')
+            self._image_version = self.map_version
+        return self._image_cache
+
+    def save_map(self, path: str, ascii_pgm: bool = False):
+        """Salva o mapa global em disco (.pgm binário por padrão, .png, ...)."""
+        save_map(path, self.get_map_array(), ascii_pgm)
@@ -0,0 +1,103 @@
+"""
+Testes de regressão do `PoseGraph`: o passo de Gauss-Newton montado por blocos
+(SciPy esparso ou Thomas + Woodbury) deve coincidir com a solução densa das
+equações normais completas, que era a implementação original.
+
+Rodar com: python -m pytest src/mapping/test_pose_graph.py
+"""
+
+import math
+import numpy as np
+import pytest
+
+from src.mapping import pose_graph
+from src.mapping.pose_graph import PoseGraph, compose, relative, _wrap_angle
+
+ODOMETRY_INFORMATION = np.diag([1 / 100.0 ** 2, 1 / 100.0 ** 2, 1 / math.radians(3) ** 2])
+LOOP_INFORMATION = np.diag([1 / 50.0 ** 2, 1 / 50.0 ** 2, 1 / math.radians(2) ** 2])
+
+
+def _build_graph(n: int, loops: int, seed: int) -> PoseGraph:
+    """
+    Trajetória em arco com odometria ruidosa entre nós consecutivos (algumas
+    arestas no sentido inverso) e `loops` fechamentos de laço entre nós distantes.
+    """
+    rng = np.random.default_rng(seed)
+    truth = [np.zeros(3)]
+    for _ in range(1, n):
+        truth.append(compose(truth[-1], np.array([1000.0, 0.0, 0.3])))
+
+    graph = PoseGraph()
+    graph.add_node(truth[0])
+    for k in range(1, n):
+        z = relative(truth[k - 1], truth[k]) + rng.normal(0, [50, 50, 0.03])
+        graph.add_node(compose(graph.nodes[-1], z))
+        if k % 7 == 3:
+            graph.add_edge(k, k - 1, relative(truth[k], truth[k - 1]), ODOMETRY_INFORMATION)
+        else:
+            graph.add_edge(k - 1, k, z, ODOMETRY_INFORMATION)
+    while loops:
+        i, j = sorted(rng.choice(n, 2, replace=False))
+        if j - i < 2:
+            continue
+        z = relative(truth[i], truth[j]) + rng.normal(0, [20, 20, 0.01])
+        graph.add_edge(i, j, z, LOOP_INFORMATION)
+        loops -= 1
+    return graph
+
+
+def _dense_optimize(graph: PoseGraph, max_iterations: int = 10, tolerance: float = 1e-4) -> int:
+    """Gauss-Newton de referência, com as equações normais densas 3n x 3n."""
+    n = len(graph.nodes)
+    for iteration in range(1, max_iterations + 1):
+        h = np.zeros((3 * n, 3 * n))
+        g = np.zeros(3 * n)
+        for i, j, z, omega in graph.edges:
+            error, a, b = graph._edge_error_and_jacobians(i, j, z)
+            si, sj = slice(3 * i, 3 * i + 3), slice(3 * j, 3 * j + 3)
+            h[si, si] += a.T @ omega @ a
+            h[si, sj] += a.T @ omega @ b
+            h[sj, si] += b.T @ omega @ a
+            h[sj, sj] += b.T @ omega @ b
+            g[si] += a.T @ omega @ error
+            g[sj] += b.T @ omega @ error
+        h[:3, :3] += np.eye(3) * 1e9
+        step = np.linalg.solve(h, -g)
+        for k in range(n):
+            graph.nodes[k] = graph.nodes[k] + step[3 * k:3 * k + 3]
+            graph.nodes[k][2] = _wrap_angle(graph.nodes[k][2])
+        if np.max(np.abs(step)) < tolerance:
+            break
+    return iteration
+
+
+@pytest.fixture(params=["woodbury", "sparse"])
+def solver(request, monkeypatch):
+    """Roda cada teste com os dois caminhos de solução do `PoseGraph`."""
+    if request.param == "woodbury":
+        monkeypatch.setattr(pose_graph, "spsolve", None)
+    elif pose_graph.spsolve is None:
+        pytest.skip("SciPy não instalado")
+    return request.param
+
+
+@pytest.mark.parametrize("n, loops", [(2, 0), (5, 1), (40, 0), (40, 5), (200, 20)])
+def test_optimize_matches_dense_solve(solver, n, loops):
+    graph = _build_graph(n, loops, seed=n + loops)
+    reference = graph.copy()
+
+    iterations = graph.optimize()
+    reference_iterations = _dense_optimize(reference)
+
+    assert iterations == reference_iterations
+    for node, expected in zip(graph.nodes, reference.nodes):
+        np.testing.assert_allclose(node, expected, rtol=0, atol=1e-6)
+    assert graph.total_error() == pytest.approx(reference.total_error(), rel=1e-9)
+
+
+def test_loop_closures_reduce_error(solver):
+    graph = _build_graph(60, 8, seed=3)
+    error_before = graph.total_error()
+    graph.optimize()
+    assert graph.total_error() < error_before * 0.5
+    np.testing.assert_allclose(graph.nodes[0], np.zeros(3), atol=1e-6)
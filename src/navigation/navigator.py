@@ -17,6 +17,12 @@ import random
 import numpy as np
 from collections import deque
 from robot_specifications import FORWARD_CONFIDENCE_THRESHOLD_CM
+from src.robot.scan import Scan, SERVO_ANGLES_DEG
+
+# Setores do scan por ângulo do servo: direita [0, 70), frente [70, 110], esquerda (110, 180]
+SECTOR_RIGHT = SERVO_ANGLES_DEG < 70
+SECTOR_FRONT = (SERVO_ANGLES_DEG >= 70) & (SERVO_ANGLES_DEG <= 110)
+SECTOR_LEFT = SERVO_ANGLES_DEG > 110
 
 class Navigator:
     """
@@ -57,6 +63,40 @@ class Navigator:
         self.commitment_counter = 0
         self.COMMITMENT_CYCLES = 2  # Nº de ciclos para se "comprometer" com uma virada.
 
+    def get_memory_state(self) -> dict:
+        """
+        Exporta a memória do navegador (grid de visitas, histórico e estado
+        anti-loop/compromisso) para ser salva em um checkpoint.
+        """
+        return {
+            'visit_grid': self.visit_grid.copy(),
+            'position_history': [list(pos) for pos in self.position_history],
+            'last_loop_escape_time': self.last_loop_escape_time,
+            'consecutive_loop_escapes': self.consecutive_loop_escapes,
+            'committed_action': self.committed_action,
+            'commitment_counter': self.commitment_counter,
+        }
+
+    def check_memory_state(self, state: dict):
+        """Valida, sem alterar nada, uma memória para `restore_memory_state` (levanta `ValueError`)."""
+        missing = set(self.get_memory_state()) - set(state)
+        if missing:
+            raise ValueError(f"Memória do navegador salva sem os campos {sorted(missing)}")
+        if state['visit_grid'].shape != self.visit_grid.shape:
+            raise ValueError(f"Grid de visitas salvo tem dimensão {state['visit_grid'].shape}, "
+                             f"esperado {self.visit_grid.shape}")
+
+    def restore_memory_state(self, state: dict):
+        """Restaura a memória exportada por `get_memory_state`."""
+        self.check_memory_state(state)
+        self.visit_grid = np.array(state['visit_grid'], dtype=int)
+        self.position_history = deque((tuple(pos) for pos in state['position_history']),
+                                      maxlen=self.position_history.maxlen)
+        self.last_loop_escape_time = state['last_loop_escape_time']
+        self.consecutive_loop_escapes = state['consecutive_loop_escapes']
+        self.committed_action = state['committed_action']
+        self.commitment_counter = state['commitment_counter']
+
     def _pos_to_grid(self, x_cm: float, y_cm: float) -> tuple:
         """Converte posição em cm para índice de célula do grid."""
         col = int(x_cm / self.grid_size_cm)
@@ -139,12 +179,12 @@ class Navigator:
         
         return bonus
 
-    def decide_next_action(self, scan_data_cm: list[tuple[int, int]], robot_pose: tuple = None) -> dict:
+    def decide_next_action(self, scan_data_cm: Scan | list[tuple[int, int]], robot_pose: tuple = None) -> dict:
         """
         Analisa o scan atual e retorna um dicionário de ação para o Chassis.
         
         Args:
-            scan_data_cm: Lista de (angulo, distancia_cm)
+            scan_data_cm: `Scan` do ciclo (ou a lista de (angulo, distancia_cm))
             robot_pose: Tupla (x_cm, y_cm, theta_deg) - pose atual do robô
         """
         # Atualiza memória espacial se pose fornecida
@@ -159,7 +199,8 @@ class Navigator:
             self.commitment_counter -= 1
             return self.committed_action
 
-        if not scan_data_cm:
+        scan = Scan.of(scan_data_cm)
+        if not scan:
             return self._commit_action({'command': 'q', 'speed': 0, 'duration': 0})
 
         # 2. DETECÇÃO DE LOOP: Se preso em loop, força exploração aleatória
@@ -186,10 +227,8 @@ class Navigator:
             self.consecutive_loop_escapes = 0
 
         # 3. LÓGICA DE EVASÃO: Verifica perigo iminente no cone frontal.
-        distancia_perigo = 1000
-        for angulo, dist_cm in scan_data_cm:
-            if 70 <= angulo <= 110 and dist_cm > 0:
-                distancia_perigo = min(distancia_perigo, dist_cm)
+        frente = scan.ranges_cm[SECTOR_FRONT & scan.range_mask()]
+        distancia_perigo = float(min(1000, frente.min())) if frente.size else 1000
 
         if distancia_perigo < self.DANGER_THRESHOLD_CM:
             print(f"[NAVIGATOR] 🚨 PERIGO IMINENTE! Obstáculo a {distancia_perigo:.1f}cm.")
@@ -204,11 +243,10 @@ class Navigator:
                 return self._commit_action({'command': 'd', 'speed': 200, 'duration': 3.0}, commit_turns=True)
 
         # 4. LÓGICA DE EXPLORAÇÃO COM MEMÓRIA: Se não há perigo, busca o melhor caminho.
-        max_dist_direita, max_dist_frente, max_dist_esquerda = 0, 0, 0
-        for angulo, dist_cm in scan_data_cm:
-            if 0 <= angulo < 70: max_dist_direita = max(max_dist_direita, dist_cm)
-            elif 70 <= angulo <= 110: max_dist_frente = max(max_dist_frente, dist_cm)
-            else: max_dist_esquerda = max(max_dist_esquerda, dist_cm)
+        # Raios sem leitura valem 0 em `ranges_cm`, então não afetam os máximos
+        max_dist_direita = float(scan.ranges_cm[SECTOR_RIGHT].max())
+        max_dist_frente = float(scan.ranges_cm[SECTOR_FRONT].max())
+        max_dist_esquerda = float(scan.ranges_cm[SECTOR_LEFT].max())
 
         # Adiciona bonus de exploração baseado em memória espacial
         if robot_pose is not None:
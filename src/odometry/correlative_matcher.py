@@ -0,0 +1,206 @@
+"""
+Casamento correlativo scan-para-mapa (correlative scan matching).
+
+Em vez de alinhar dois scans esparsos entre si (ICP), alinha o scan atual ao
+mapa do SLAM. A cada chamada:
+1. Um recorte do mapa em torno da pose prevista vira um campo de
+   verossimilhança: cada célula vale a ocupação do obstáculo mais forte nas
+   redondezas, atenuada por uma gaussiana da distância até ele.
+2. Tabelas de múltipla resolução são pré-calculadas sobre o campo: a célula
+   (r, c) do nível h guarda o máximo do campo no bloco 2^h x 2^h que começa
+   nela, ou seja, um limite superior do score de qualquer translação dentro
+   do bloco.
+3. Para cada ângulo da janela angular, os pontos do scan são rotacionados uma
+   única vez (tabela de pontos por ângulo) e a janela (x, y) é explorada por
+   branch-and-bound: candidatos grossos são ordenados pelo limite superior e
+   só os que ainda podem superar o melhor score são refinados.
+
+A busca é exaustiva dentro da janela (o resultado é o mesmo da força bruta),
+mas avalia uma fração pequena dos candidatos, com custo limitado pelo tamanho
+da janela e pelo nº de pontos do scan.
+"""
+
+import math
+from typing import NamedTuple
+import numpy as np
+
+
+class MatchResult(NamedTuple):
+    """Resultado de `CorrelativeScanMatcher.match`, no referencial do mapa."""
+    x_mm: float
+    y_mm: float
+    theta_rad: float
+    score: float            # Verossimilhança média dos pontos (0 a 1)
+    predicted_score: float  # Mesma medida na pose prevista, para comparação
+    candidates: int         # Nº de candidatos (x, y, θ) avaliados, em todos os níveis
+
+
+class CorrelativeScanMatcher:
+    """
+    Busca a pose (x, y, θ) que melhor encaixa os pontos do scan no mapa,
+    dentro de janelas em torno da pose prevista.
+    """
+    def __init__(self, linear_window_mm: float = 200.0, angular_window_deg: float = 15.0,
+                 angular_step_deg: float | None = None, sigma_mm: float | None = None,
+                 levels: int = 3, occupied_threshold: int = 127):
+        """
+        Args:
+            linear_window_mm: Meia-largura da janela de busca em x e em y.
+            angular_window_deg: Meia-largura da janela angular.
+            angular_step_deg: Passo angular; None = o que desloca o ponto mais
+                distante do scan em cerca de um pixel.
+            sigma_mm: Desvio da gaussiana do campo de verossimilhança
+                (None = um pixel do mapa).
+            levels: Níveis de resolução acima do pixel (o mais grosso tem
+                passo de 2^levels pixels).
+            occupied_threshold: Pixels do mapa (0 = obstáculo, 127 = desconhecido,
+                255 = livre) abaixo deste valor contam como ocupados, com
+                ocupação proporcional à distância até ele.
+        """
+        self.linear_window_mm = linear_window_mm
+        self.angular_window_deg = angular_window_deg
+        self.angular_step_deg = angular_step_deg
+        self.sigma_mm = sigma_mm
+        self.levels = levels
+        self.occupied_threshold = occupied_threshold
+
+    def _likelihood_field(self, crop: np.ndarray, sigma_px: float) -> np.ndarray:
+        """Campo de verossimilhança (float32, 0 a 1) de um recorte do mapa."""
+        occupancy = np.clip((self.occupied_threshold - crop.astype(np.float32)) / self.occupied_threshold, 0, 1)
+        field = occupancy.copy()
+        radius = max(1, int(math.ceil(2 * sigma_px)))
+        height, width = field.shape
+        # Máximo das ocupações vizinhas ponderadas pela gaussiana (kernel
+        # simétrico: cada deslocamento é aplicado como uma fatia do recorte)
+        for dr in range(-radius, radius + 1):
+            for dc in range(-radius, radius + 1):
+                d2 = dr * dr + dc * dc
+                if d2 == 0 or d2 > radius * radius:
+                    continue
+                weight = math.exp(-d2 / (2 * sigma_px * sigma_px))
+                target = field[max(0, dr):height + min(0, dr), max(0, dc):width + min(0, dc)]
+                source = occupancy[max(0, -dr):height + min(0, -dr), max(0, -dc):width + min(0, -dc)]
+                np.maximum(target, source * weight, out=target)
+        return field
+
+    def _precompute_levels(self, field: np.ndarray) -> list[np.ndarray]:
+        """
+        Tabelas de limite superior: nível h = máximo do campo no bloco
+        2^h x 2^h a partir de cada célula (na borda, só a parte do bloco
+        dentro do recorte).
+        """
+        tables = [field]
+        for h in range(1, self.levels + 1):
+            half = 1 << (h - 1)
+            previous = tables[-1]
+            table = previous.copy()
+            np.maximum(table[:-half, :], previous[half:, :], out=table[:-half, :])
+            rows = table.copy()
+            np.maximum(table[:, :-half], rows[:, half:], out=table[:, :-half])
+            tables.append(table)
+        return tables
+
+    def match(self, points_mm: np.ndarray, map_array: np.ndarray, mm_per_pixel: float,
+              predicted_pose: tuple[float, float, float]) -> MatchResult | None:
+        """
+        Alinha o scan ao mapa.
+
+        Args:
+            points_mm: Pontos do scan (Nx2, mm) no referencial do robô.
+            map_array: Mapa do SLAM (uint8, linha = y, coluna = x).
+            mm_per_pixel: Resolução do mapa.
+            predicted_pose: Pose prevista (x_mm, y_mm, theta_rad) no referencial
+                do mapa, ex: a última pose do SLAM mais a odometria.
+
+        Returns:
+            MatchResult | None: A melhor pose, ou None se o recorte em torno da
+            pose prevista não tem obstáculos (nada com que casar).
+        """
+        points_mm = np.asarray(points_mm, dtype=np.float64).reshape(-1, 2)
+        if len(points_mm) == 0:
+            return None
+        x0, y0, theta0 = predicted_pose
+        max_range_mm = float(np.max(np.hypot(points_mm[:, 0], points_mm[:, 1])))
+
+        # Passo angular: ~1 pixel de deslocamento no ponto mais distante
+        if self.angular_step_deg is not None:
+            angular_step = math.radians(self.angular_step_deg)
+        else:
+            angular_step = math.acos(max(-1.0, 1 - mm_per_pixel ** 2 / (2 * max(max_range_mm, mm_per_pixel) ** 2)))
+        n_angles = int(math.ceil(math.radians(self.angular_window_deg) / angular_step))
+        window_px = int(math.ceil(self.linear_window_mm / mm_per_pixel))
+
+        # Recorte local: alcance do scan + janela + o bloco do nível mais grosso
+        top = 1 << self.levels
+        reach_px = int(math.ceil(max_range_mm / mm_per_pixel)) + window_px + top + 1
+        center_row, center_col = int(round(y0 / mm_per_pixel)), int(round(x0 / mm_per_pixel))
+        size = 2 * reach_px + 1
+        crop = np.full((size, size), 255, dtype=np.uint8)
+        r0, c0 = center_row - reach_px, center_col - reach_px
+        rows = slice(max(0, r0), min(map_array.shape[0], r0 + size))
+        cols = slice(max(0, c0), min(map_array.shape[1], c0 + size))
+        if rows.start < rows.stop and cols.start < cols.stop:
+            crop[rows.start - r0:rows.stop - r0, cols.start - c0:cols.stop - c0] = map_array[rows, cols]
+        if not (crop < self.occupied_threshold).any():
+            return None
+
+        sigma_px = (self.sigma_mm / mm_per_pixel) if self.sigma_mm else 1.0
+        tables = self._precompute_levels(self._likelihood_field(crop, sigma_px))
+
+        # Tabela de pontos por ângulo, em pixels do recorte (centro = pose prevista,
+        # deslocado de -window_px para que as translações sejam índices >= 0)
+        angles = theta0 + angular_step * np.arange(-n_angles, n_angles + 1)
+        cos_a, sin_a = np.cos(angles)[:, None], np.sin(angles)[:, None]
+        px, py = points_mm[:, 0], points_mm[:, 1]
+        sub_x = (x0 / mm_per_pixel) - center_col
+        sub_y = (y0 / mm_per_pixel) - center_row
+        point_cols = np.rint((cos_a * px - sin_a * py) / mm_per_pixel + sub_x).astype(np.intp) + reach_px - window_px
+        point_rows = np.rint((sin_a * px + cos_a * py) / mm_per_pixel + sub_y).astype(np.intp) + reach_px - window_px
+        n_points = len(points_mm)
+        span = 2 * window_px  # Translações válidas: 0..span em cada eixo
+
+        # Índices lineares nas tabelas achatadas: uma única indexação por
+        # consulta (translação (linha, coluna) = deslocamento linha * size + coluna)
+        flat_tables = [table.ravel() for table in tables]
+        point_index = point_rows * size + point_cols
+
+        def scores(level: int, angle, offsets: np.ndarray) -> np.ndarray:
+            """Soma da tabela do nível nos pontos do(s) ângulo(s), para cada translação."""
+            return flat_tables[level][point_index[angle][..., None, :] + offsets[:, None]].sum(axis=-1)
+
+        # Candidatos do nível mais grosso, para todos os ângulos de uma vez
+        grid = np.arange(0, span + 1, top)
+        coarse_cols, coarse_rows = (a.ravel() for a in np.meshgrid(grid, grid))
+        bounds = scores(self.levels, slice(None), coarse_rows * size + coarse_cols)  # (ângulos, translações)
+        order = np.argsort(bounds, axis=None)
+        evaluated = bounds.size
+        # Pilha em ordem crescente: o candidato mais promissor sai primeiro
+        angle_idx, offset_idx = np.unravel_index(order, bounds.shape)
+        stack = list(zip(bounds.ravel()[order].tolist(), [self.levels] * len(order), angle_idx.tolist(),
+                         coarse_rows[offset_idx].tolist(), coarse_cols[offset_idx].tolist()))
+
+        # Filhos de um bloco: os 4 sub-blocos (linha, coluna) de meio lado
+        quadrants = [(0, 0), (0, 1), (1, 0), (1, 1)]
+        best_score, best = -1.0, None
+        while stack:
+            bound, level, angle, row, col = stack.pop()
+            if bound <= best_score:
+                continue
+            if level == 0:
+                best_score, best = bound, (angle, row, col)
+                continue
+            half = 1 << (level - 1)
+            children = [(row + dr * half, col + dc * half) for dr, dc in quadrants
+                        if row + dr * half <= span and col + dc * half <= span]
+            child_bounds = scores(level - 1, angle, np.array([r * size + c for r, c in children])).tolist()
+            evaluated += len(children)
+            for child_bound, (child_row, child_col) in sorted(zip(child_bounds, children)):
+                if child_bound > best_score:
+                    stack.append((child_bound, level - 1, angle, child_row, child_col))
+
+        predicted_score = float(scores(0, n_angles, np.array([window_px * size + window_px]))[0]) / n_points
+        angle, row_offset, col_offset = best
+        return MatchResult(x0 + (col_offset - window_px) * mm_per_pixel,
+                           y0 + (row_offset - window_px) * mm_per_pixel,
+                           (float(angles[angle]) + math.pi) % (2 * math.pi) - math.pi,
+                           best_score / n_points, predicted_score, evaluated)
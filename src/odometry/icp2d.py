@@ -0,0 +1,233 @@
+"""
+ICP (Iterative Closest Point) 2D nativo em NumPy.
+
+Alinha a nuvem de pontos de um scan (`current`) à do scan anterior
+(`reference`), encontrando a rotação e a translação que levam os pontos atuais
+para o referencial anterior, isto é, o movimento do robô entre os scans.
+
+Feito para as nuvens pequenas do sensor (~19 pontos): os vizinhos mais
+próximos saem de uma matriz de distâncias por força bruta, em buffers
+pré-alocados reaproveitados entre chamadas; para nuvens grandes, usa um
+KD-tree do SciPy, se estiver instalado. Dois modos de erro:
+- "point_to_point": solução fechada (Kabsch 2D) a cada iteração
+- "point_to_line": minimiza a distância de cada ponto à reta local do scan de
+  referência (normais estimadas pelos vizinhos), convergindo em menos
+  iterações em ambientes com paredes
+"""
+
+import math
+from typing import NamedTuple
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+# A partir deste nº de pontos de referência, o KD-tree (se disponível) é mais
+# rápido que a matriz de distâncias completa.
+KDTREE_MIN_POINTS = 256
+
+
+def estimate_normals(points: np.ndarray, neighbors: int = 3) -> np.ndarray:
+    """Normal da reta local (PCA dos `neighbors` vizinhos mais próximos) de cada ponto (Nx2)."""
+    m = len(points)
+    k = min(neighbors, m)
+    diff = points[:, None, :] - points[None, :, :]
+    dist2 = np.einsum('ijk,ijk->ij', diff, diff)
+    nearest = np.argpartition(dist2, k - 1, axis=1)[:, :k] if k < m else np.broadcast_to(np.arange(m), (m, m))
+    local = points[nearest] - points[nearest].mean(axis=1, keepdims=True)
+    sxx = np.einsum('nk,nk->n', local[:, :, 0], local[:, :, 0])
+    syy = np.einsum('nk,nk->n', local[:, :, 1], local[:, :, 1])
+    sxy = np.einsum('nk,nk->n', local[:, :, 0], local[:, :, 1])
+    # Eixo principal da covariância 2x2 em forma fechada; a normal é perpendicular a ele
+    phi = 0.5 * np.arctan2(2 * sxy, sxx - syy)
+    return np.column_stack((-np.sin(phi), np.cos(phi)))
+
+
+class ICPResult(NamedTuple):
+    """Resultado de `ICP2D.align`."""
+    dx: float               # Translação (mesma unidade dos pontos)
+    dy: float
+    dtheta: float           # Rotação (rad)
+    rmse: float             # Erro RMS ponto-a-ponto das correspondências aceitas
+    inlier_ratio: float     # Fração dos pontos atuais com correspondência aceita
+    iterations: int
+    converged: bool
+
+
+class ICP2D:
+    """
+    Solucionador ICP 2D reutilizável (mantém os buffers entre chamadas).
+    """
+    def __init__(self, max_correspondence_distance: float = 25.0, max_iterations: int = 30,
+                 min_change: float = 1e-3, mode: str = "point_to_line", normal_neighbors: int = 3):
+        """
+        Args:
+            max_correspondence_distance: Distância máxima entre pares aceitos.
+            max_iterations: Limite de iterações.
+            min_change: Convergência: incremento de translação e de rotação
+                (rad) abaixo deste valor.
+            mode: "point_to_line" ou "point_to_point".
+            normal_neighbors: Vizinhos (incluindo o ponto) usados na normal
+                de cada ponto de referência, no modo "point_to_line".
+        """
+        if mode not in ("point_to_line", "point_to_point"):
+            raise ValueError(f"Modo de ICP desconhecido: {mode}")
+        self.max_correspondence_distance = max_correspondence_distance
+        self.max_iterations = max_iterations
+        self.min_change = min_change
+        self.mode = mode
+        self.normal_neighbors = normal_neighbors
+        self._capacity = 0
+        self._reserve(32)
+
+    def _reserve(self, n: int):
+        """Garante buffers para nuvens de até `n` pontos."""
+        if n <= self._capacity:
+            return
+        self._capacity = max(n, 2 * self._capacity)
+        cap = self._capacity
+        self._moved = np.empty((cap, 2))
+        self._diff = np.empty((cap, cap, 2))
+        self._dist2 = np.empty((cap, cap))
+        self._index = np.empty(cap, dtype=np.intp)
+        self._best2 = np.empty(cap)
+
+    def _nearest(self, points: np.ndarray, reference: np.ndarray, tree) -> tuple[np.ndarray, np.ndarray]:
+        """Índice e distância² do vizinho mais próximo em `reference` de cada ponto."""
+        n, m = len(points), len(reference)
+        if tree is not None:
+            dist, index = tree.query(points)
+            return index, dist * dist
+        diff = self._diff[:n, :m]
+        dist2 = self._dist2[:n, :m]
+        np.subtract(points[:, None, :], reference[None, :, :], out=diff)
+        np.einsum('ijk,ijk->ij', diff, diff, out=dist2)
+        index = self._index[:n]
+        np.argmin(dist2, axis=1, out=index)
+        best2 = self._best2[:n]
+        best2[:] = dist2[np.arange(n), index]
+        return index, best2
+
+    def align(self, reference: np.ndarray, current: np.ndarray,
+              initial_guess: tuple[float, float, float] = (0.0, 0.0, 0.0),
+              normals: np.ndarray | None = None, nearest=None) -> ICPResult:
+        """
+        Alinha `current` a `reference` (arrays Nx2), partindo de `initial_guess`
+        (dx, dy, dtheta), ex: o delta dos encoders no referencial do robô.
+
+        Para referências reaproveitadas entre chamadas (ex: `KeyframeCloud`),
+        as estruturas podem vir prontas: `normals` (Nx2, modo "point_to_line")
+        e `nearest(points) -> (índices, distâncias²)`, no lugar da busca interna.
+
+        Returns:
+            ICPResult: (dx, dy, dtheta) leva os pontos atuais ao referencial de
+            `reference`: p_ref ≈ R(dtheta) · p_atual + (dx, dy).
+        """
+        reference = np.asarray(reference, dtype=np.float64)
+        current = np.asarray(current, dtype=np.float64)
+        n = len(current)
+        self._reserve(max(n, len(reference)))
+
+        if nearest is None:
+            tree = cKDTree(reference) if cKDTree is not None and len(reference) >= KDTREE_MIN_POINTS else None
+
+            def nearest(points: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+                return self._nearest(points, reference, tree)
+        if self.mode != "point_to_line" or len(reference) < 2:
+            normals = None
+        elif normals is None:
+            normals = estimate_normals(reference, self.normal_neighbors)
+
+        tx, ty, theta = (float(v) for v in initial_guess)
+        moved = self._moved[:n]
+        max_d2 = self.max_correspondence_distance ** 2
+        converged = False
+        inliers = np.zeros(n, dtype=bool)
+        best2 = np.zeros(n)
+        iteration = 0
+
+        for iteration in range(1, self.max_iterations + 1):
+            c, s = math.cos(theta), math.sin(theta)
+            np.multiply(current[:, 0:1], (c, s), out=moved)
+            moved += current[:, 1:2] * (-s, c)
+            moved += (tx, ty)
+
+            index, best2 = nearest(moved)
+
+            # Rejeição: fora da distância máxima ou muito acima da mediana dos pares
+            inliers = best2 <= max_d2
+            accepted = best2[inliers]
+            if len(accepted) >= 3:
+                median2 = np.partition(accepted, len(accepted) // 2)[len(accepted) // 2]
+                inliers &= best2 <= max(9.0 * median2, 1e-6)
+            if inliers.sum() < 3:
+                break
+
+            p = moved[inliers]
+            q = reference[index[inliers]]
+            if normals is not None:
+                step = self._point_to_line_step(p, q, normals[index[inliers]])
+            else:
+                step = None
+            if step is None:
+                step = self._point_to_point_step(p, q)
+            dtx, dty, dtheta = step
+
+            # Compõe o incremento (aplicado sobre os pontos já movidos)
+            c, s = math.cos(dtheta), math.sin(dtheta)
+            tx, ty = c * tx - s * ty + dtx, s * tx + c * ty + dty
+            theta = (theta + dtheta + math.pi) % (2 * math.pi) - math.pi
+
+            if math.hypot(dtx, dty) < self.min_change and abs(dtheta) < self.min_change:
+                converged = True
+                break
+
+        n_inliers = int(inliers.sum())
+        rmse = float(math.sqrt(best2[inliers].mean())) if n_inliers else float('inf')
+        return ICPResult(tx, ty, theta, rmse, n_inliers / max(1, n), iteration, converged)
+
+    @staticmethod
+    def _point_to_point_step(p: np.ndarray, q: np.ndarray) -> tuple[float, float, float]:
+        """Rotação e translação ótimas (Kabsch 2D, forma fechada) que levam p a q."""
+        p_mean = p.mean(axis=0)
+        q_mean = q.mean(axis=0)
+        pc = p - p_mean
+        qc = q - q_mean
+        sxx = pc[:, 0] @ qc[:, 0]
+        syy = pc[:, 1] @ qc[:, 1]
+        sxy = pc[:, 0] @ qc[:, 1]
+        syx = pc[:, 1] @ qc[:, 0]
+        dtheta = math.atan2(sxy - syx, sxx + syy)
+        c, s = math.cos(dtheta), math.sin(dtheta)
+        return (q_mean[0] - (c * p_mean[0] - s * p_mean[1]),
+                q_mean[1] - (s * p_mean[0] + c * p_mean[1]),
+                dtheta)
+
+    @staticmethod
+    def _point_to_line_step(p: np.ndarray, q: np.ndarray, normals: np.ndarray):
+        """
+        Passo de Gauss-Newton linearizado minimizando Σ (n · (R p + t - q))².
+        Retorna None se o sistema for mal condicionado (ex: uma única parede).
+        """
+        residual = np.einsum('ij,ij->i', normals, p - q)
+        jacobian = np.empty((len(p), 3))
+        jacobian[:, :2] = normals
+        jacobian[:, 2] = normals[:, 1] * p[:, 0] - normals[:, 0] * p[:, 1]
+        (a, b, c), (_, d, e), (_, _, f) = (jacobian.T @ jacobian).tolist()
+        g1, g2, g3 = (-jacobian.T @ residual).tolist()
+
+        # Sistema 3x3 simétrico resolvido por cofatores (evita o custo do LAPACK
+        # em matrizes tão pequenas); determinante ~0 = sem restrição em alguma direção
+        # (det / produto da diagonal ∈ [0, 1] pela desigualdade de Hadamard,
+        # independente da escala de cada eixo)
+        c11, c12, c13 = d * f - e * e, c * e - b * f, b * e - c * d
+        det = a * c11 + b * c12 + c * c13
+        diagonal = a * d * f
+        if diagonal <= 0 or det <= 1e-6 * diagonal:
+            return None
+        c22, c23, c33 = a * f - c * c, b * c - a * e, a * d - b * b
+        return ((c11 * g1 + c12 * g2 + c13 * g3) / det,
+                (c12 * g1 + c22 * g2 + c23 * g3) / det,
+                (c13 * g1 + c23 * g2 + c33 * g3) / det)
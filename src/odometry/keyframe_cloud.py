@@ -0,0 +1,163 @@
+"""
+Nuvem de pontos local dos últimos keyframes, para o ICP da `LaserOdometry`.
+
+Em vez de casar cada scan só com a varredura anterior (19 pontos esparsos), o
+scan é casado com os pontos dos últimos K keyframes, todos no referencial
+comum da odometria. As estruturas de busca são mantidas incrementalmente:
+- os pontos e as normais ficam num buffer circular pré-alocado, um bloco
+  fixo por keyframe; a entrada de um keyframe sobrescreve só o bloco do mais
+  antigo, sem reconcatenar a nuvem. Blocos incompletos são preenchidos com
+  um ponto "infinitamente" distante, que nunca vira correspondência
+- as normais são reestimadas sobre a nuvem só quando um keyframe entra, e as
+  normas² dos pontos ficam em cache: a busca por força bruta vira um único
+  produto de matrizes por iteração do ICP (|q|² + |p|² - 2 q·p)
+- com o SciPy instalado e nuvens grandes, cada keyframe tem seu próprio
+  KD-tree, construído na entrada e descartado na saída; a busca consulta os
+  K trees em vez de reconstruir um único a cada scan
+"""
+
+import math
+import numpy as np
+
+from src.odometry.icp2d import KDTREE_MIN_POINTS, cKDTree, estimate_normals
+from src.robot.scan import SCAN_SIZE
+
+# Coordenada dos pontos de preenchimento (bem além de qualquer distância máxima de correspondência)
+_FAR = 1e9
+
+
+class KeyframeCloud:
+    """
+    Buffer circular dos últimos `max_keyframes` keyframes (pontos Nx2 no
+    referencial da odometria), com normais e índice de vizinhos em cache.
+    """
+    def __init__(self, max_keyframes: int = 5, points_per_keyframe: int = SCAN_SIZE,
+                 normal_neighbors: int = 3):
+        """
+        Args:
+            max_keyframes: Nº de keyframes mantidos (o mais antigo sai quando um novo entra).
+            points_per_keyframe: Máximo de pontos por keyframe (tamanho do bloco).
+            normal_neighbors: Vizinhos usados na normal de cada ponto.
+        """
+        self.max_keyframes = max_keyframes
+        self.points_per_keyframe = points_per_keyframe
+        self.normal_neighbors = normal_neighbors
+        size = max_keyframes * points_per_keyframe
+        self._points = np.full((size, 2), _FAR)
+        self._normals = np.zeros((size, 2))
+        self._norms2 = np.einsum('ij,ij->i', self._points, self._points)
+        self._counts = [0] * max_keyframes
+        self._trees = [None] * max_keyframes
+        self._poses = [None] * max_keyframes
+        self._next_slot = 0
+        self._last_slot = None
+        self._capacity = 0
+        self._reserve(points_per_keyframe)
+
+    def _reserve(self, n: int):
+        """Garante buffers da busca por força bruta para `n` pontos consultados."""
+        if n <= self._capacity:
+            return
+        self._capacity = n
+        size = len(self._points)
+        self._dist2 = np.empty((n, size))
+        self._index = np.empty(n, dtype=np.intp)
+        self._best2 = np.empty(n)
+
+    def __len__(self) -> int:
+        """Nº de keyframes na nuvem."""
+        return sum(1 for count in self._counts if count)
+
+    @property
+    def n_points(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def points(self) -> np.ndarray:
+        """Pontos da nuvem (inclui os de preenchimento); índices de `nearest` referem-se a este array."""
+        return self._points
+
+    @property
+    def normals(self) -> np.ndarray:
+        return self._normals
+
+    @property
+    def last_pose(self) -> tuple[float, float, float] | None:
+        """Pose (x, y, theta) do keyframe mais recente."""
+        return self._poses[self._last_slot] if self._last_slot is not None else None
+
+    def add(self, points: np.ndarray, pose: tuple[float, float, float]):
+        """
+        Insere um keyframe: `points` (Nx2, referencial do robô) levados ao
+        referencial da odometria pela `pose` (x, y, theta) do robô.
+        """
+        n = len(points)
+        if n > self.points_per_keyframe:
+            raise ValueError(f"Keyframe com {n} pontos; máximo {self.points_per_keyframe}")
+        x, y, theta = pose
+        c, s = math.cos(theta), math.sin(theta)
+        world = points @ np.array([[c, s], [-s, c]]) + (x, y)
+
+        slot = self._next_slot
+        block = slice(slot * self.points_per_keyframe, (slot + 1) * self.points_per_keyframe)
+        self._points[block] = _FAR
+        self._normals[block] = 0.0
+        self._points[block][:n] = world
+        self._counts[slot] = n
+        self._norms2[block] = np.einsum('ij,ij->i', self._points[block], self._points[block])
+        self._update_normals()
+        self._poses[slot] = (float(x), float(y), float(theta))
+        self._trees[slot] = cKDTree(world) if cKDTree is not None and n else None
+
+        self._last_slot = slot
+        self._next_slot = (slot + 1) % self.max_keyframes
+
+    def _update_normals(self):
+        """
+        Reestima as normais sobre a nuvem inteira (vizinhos de keyframes
+        diferentes preenchem os vãos de uma varredura esparsa); só roda quando
+        um keyframe entra, não a cada alinhamento.
+        """
+        valid = self._points[:, 0] < _FAR
+        if valid.sum() >= 2:
+            self._normals[valid] = estimate_normals(self._points[valid], self.normal_neighbors)
+
+    def clear(self):
+        """Remove todos os keyframes."""
+        self._points[:] = _FAR
+        self._normals[:] = 0.0
+        self._norms2[:] = 2 * _FAR ** 2
+        self._counts = [0] * self.max_keyframes
+        self._trees = [None] * self.max_keyframes
+        self._poses = [None] * self.max_keyframes
+        self._next_slot = 0
+        self._last_slot = None
+
+    def nearest(self, query: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Índice (em `points`) e distância² do ponto da nuvem mais próximo de cada ponto de `query`."""
+        n = len(query)
+        if cKDTree is not None and self.n_points >= KDTREE_MIN_POINTS:
+            best2 = np.full(n, np.inf)
+            index = np.zeros(n, dtype=np.intp)
+            for slot, tree in enumerate(self._trees):
+                if tree is None:
+                    continue
+                dist, local = tree.query(query)
+                closer = dist * dist < best2
+                best2[closer] = dist[closer] ** 2
+                index[closer] = slot * self.points_per_keyframe + local[closer]
+            return index, best2
+
+        # |q - p|² = |q|² + |p|² - 2 q·p; |q|² não muda o argmin e só entra no fim
+        self._reserve(n)
+        dist2 = self._dist2[:n]
+        np.matmul(query, self._points.T, out=dist2)
+        dist2 *= -2
+        dist2 += self._norms2
+        index = self._index[:n]
+        np.argmin(dist2, axis=1, out=index)
+        best2 = self._best2[:n]
+        best2[:] = dist2[np.arange(n), index]
+        best2 += np.einsum('ij,ij->i', query, query)
+        np.maximum(best2, 0.0, out=best2)
+        return index, best2
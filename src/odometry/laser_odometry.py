@@ -11,138 +11,143 @@ para o algoritmo de SLAM principal.
 
 import numpy as np
 import math
-import sys
-import io
-from simpleicp import SimpleICP, PointCloud
+
+from src.odometry.icp2d import ICP2D
+from src.odometry.keyframe_cloud import KeyframeCloud
+from src.odometry.correlative_matcher import CorrelativeScanMatcher
+from src.robot.scan import Scan
+
+def _compose(a: tuple[float, float, float], b: tuple[float, float, float]) -> tuple[float, float, float]:
+    """Compõe duas poses (x, y, theta): a ⊕ b (b expressa no referencial de a)."""
+    c, s = math.cos(a[2]), math.sin(a[2])
+    return (a[0] + c * b[0] - s * b[1], a[1] + s * b[0] + c * b[1],
+            (a[2] + b[2] + math.pi) % (2 * math.pi) - math.pi)
+
+
+def _relative(a: tuple[float, float, float], b: tuple[float, float, float]) -> tuple[float, float, float]:
+    """Pose de b no referencial de a: a⁻¹ ⊕ b."""
+    c, s = math.cos(a[2]), math.sin(a[2])
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    return (c * dx + s * dy, -s * dx + c * dy, (b[2] - a[2] + math.pi) % (2 * math.pi) - math.pi)
+
 
 class LaserOdometry:
     """
     Calcula a odometria do robô via alinhamento de scans (Scan Matching).
 
     Esta classe encapsula a lógica do algoritmo ICP (Iterative Closest Point)
-    usando a biblioteca `simpleicp`. Ela funciona como uma "caixa-preta" que
-    responde à pergunta: "Dado o scan anterior e o atual, qual foi o movimento
-    relativo (translação e rotação) que ocorreu?".
+    usando o `ICP2D` nativo (NumPy, 2D). Ela funciona como uma "caixa-preta" que
+    responde à pergunta: "Dados os scans recentes (keyframes) e o atual, qual
+    foi o movimento relativo (translação e rotação) que ocorreu?".
     """
     def __init__(self):
         """
         Inicializa o solucionador ICP e o estado interno da classe.
 
         O objeto `icp_solver` é criado uma vez e reutilizado a cada ciclo para
-        maior eficiência. `previous_scan_points` armazena a "imagem" do mundo
-        do ciclo anterior para comparação.
+        maior eficiência (seus buffers são pré-alocados). `keyframes` é a
+        nuvem local dos últimos keyframes, no referencial da odometria em que
+        `pose` (x_cm, y_cm, theta_rad) é acumulada; `previous_scan_points`
+        armazena a "imagem" do mundo do ciclo anterior para comparação, e
+        `last_result` o `ICPResult` do último alinhamento (qualidade do ajuste).
+        `map_matcher` alinha o scan ao mapa do SLAM (`calculate_delta_to_map`),
+        com o último resultado em `last_map_match`.
         """
         self.previous_scan_points = None
+        self.last_result = None
+        self.pose = (0.0, 0.0, 0.0)
+        # Nuvem local: últimos 5 keyframes, um a cada 10cm ou 10° de movimento.
+        self.keyframes = KeyframeCloud(max_keyframes=5)
+        self.KEYFRAME_DISTANCE_CM = 10.0
+        self.KEYFRAME_ROTATION_RAD = math.radians(10)
+        self.last_map_match = None
+        # Scan-para-mapa: janela de ±20cm/±15° em torno da pose prevista.
+        self.map_matcher = CorrelativeScanMatcher(linear_window_mm=200.0, angular_window_deg=15.0)
+        self.MIN_MAP_MATCH_SCORE = 0.25 # Abaixo disso o casamento é considerado ambíguo
+        # O casamento só substitui os encoders se melhorar o score da pose prevista nesta proporção
+        self.MIN_MAP_MATCH_GAIN = 1.5
         # Instancia o solucionador ICP, que manterá seu estado e configurações.
-        self.icp_solver = SimpleICP()
+        self.icp_solver = ICP2D(
+            max_correspondence_distance=25.0,  # cm - tolerante a pequenas inconsistências
+            max_iterations=30,
+            min_change=0.001
+        )
 
-    def _scan_to_points(self, scan_data_cm: list[tuple[int, int]]) -> np.ndarray:
+    def _scan_to_points(self, scan: Scan) -> np.ndarray:
         """
-        Converte os dados brutos do sensor (formato polar) para uma nuvem de
-        pontos cartesiana (formato X, Y, Z), que é o formato exigido pelo
-        algoritmo ICP.
+        Seleciona, na nuvem de pontos cartesiana 2D já calculada pelo `Scan`
+        (Nx2, em cm), os pontos usados pelo ICP.
         """
-        points = []
-        distances = []
-        
-        for angulo_graus, dist_cm in scan_data_cm:
-            # Filtra leituras inválidas para não poluir o cálculo do ICP.
-            # Limitado a 300cm (3m) para evitar drift de long-range
-            if 5 < dist_cm < 300:
-                distances.append(dist_cm)
-                # Converte o ângulo do servo (0-180) para um ângulo matemático (-90 a +90).
-                angulo_rad = math.radians(angulo_graus - 90)
-                x = dist_cm * math.cos(angulo_rad)
-                y = dist_cm * math.sin(angulo_rad)
-                # A biblioteca simpleicp opera em 3D, então adicionamos z=0 por compatibilidade.
-                points.append([x, y, 0.0])
-        
-        if not points:
-            return np.array([])
-        
+        # Filtra leituras inválidas para não poluir o cálculo do ICP.
+        # Limitado a 300cm (3m) para evitar drift de long-range
+        valid = scan.range_mask(5, 300)
+
         # Filtro de outliers: remove pontos muito distantes da mediana
-        # (ajuda a remover leituras espúrias que causam drift)
-        # Apenas aplica se tiver pontos suficientes
-        if len(distances) > 10:  # Aumentado de 5 para 10
-            median_dist = np.median(distances)
-            std_dist = np.std(distances)
-            filtered_points = []
-            for i, dist in enumerate(distances):
-                # Critério mais liberal: aceita pontos dentro de 3 desvios padrão
-                # OU dentro de 3x a mediana (o que for maior)
-                max_dev = max(std_dist * 3, median_dist * 2.0)
-                if abs(dist - median_dist) < max_dev:
-                    filtered_points.append(points[i])
-            
-            # Só usa o filtro se ainda sobrar pelo menos 8 pontos
-            if len(filtered_points) >= 8:
-                return np.array(filtered_points)
-        
-        return np.array(points)
+        # (ajuda a remover leituras espúrias que causam drift), se tiver mais
+        # de 10 pontos e ainda sobrarem pelo menos 8
+        return scan.points_cm[scan.outlier_mask(valid)]
 
-    def calculate_delta(self, current_scan_cm: list[tuple[int, int]]) -> tuple[float, float, float]:
+    def calculate_delta(self, current_scan_cm: Scan | list[tuple[int, int]],
+                        initial_guess: tuple[float, float, float] | None = None) -> tuple[float, float, float]:
         """
         Calcula o delta de odometria local (dx, dy, d_theta) a partir do scan atual.
 
         Este é o método público principal. Ele orquestra o processo de scan matching:
         1. Converte o scan atual para uma nuvem de pontos.
-        2. Usa o algoritmo ICP para encontrar a matriz de transformação (H) que
-           melhor alinha a nuvem de pontos anterior com a atual.
-        3. Extrai os parâmetros de translação (dx, dy) e rotação (d_theta) da matriz H.
-        4. Armazena a nuvem de pontos atual para ser usada no próximo ciclo.
+        2. Usa o algoritmo ICP para encontrar a pose que melhor alinha a nuvem
+           atual com a nuvem local de keyframes (`keyframes`), partindo da
+           última pose mais `initial_guess`.
+        3. Extrai o delta (dx, dy, d_theta) entre a pose anterior e a nova.
+        4. Se o robô se afastou o bastante do último keyframe, o scan atual
+           entra na nuvem (e o keyframe mais antigo sai).
+
+        Args:
+            current_scan_cm: `Scan` do ciclo (ou a lista (ângulo, distância) do sensor).
+            initial_guess: Delta local (dx, dy, d_theta) dos encoders, usado
+                como ponto de partida do ICP (None = sem movimento).
 
         Returns:
             tuple[float, float, float]: O deslocamento no referencial LOCAL do robô
-                                        (dx, dy, d_theta) em cm e radianos.
+                                        (dx, dy, d_theta) em cm e radianos. A qualidade
+                                        do ajuste fica em `last_result`.
         """
-        current_scan_points = self._scan_to_points(current_scan_cm)
+        current_scan_points = self._scan_to_points(Scan.of(current_scan_cm))
+        self.last_result = None
 
-        # Guarda de segurança para o primeiro ciclo ou para scans com poucos pontos válidos.
-        # O ICP precisa de um mínimo de pontos (6 para 3D) para funcionar de forma confiável.
-        if self.previous_scan_points is None or current_scan_points.shape[0] < 6:
-            self.previous_scan_points = current_scan_points
+        # Guarda de segurança para scans com poucos pontos válidos: o ICP precisa
+        # de um mínimo de pontos para funcionar de forma confiável.
+        if current_scan_points.shape[0] < 6:
             return (0.0, 0.0, 0.0)
 
-        if self.previous_scan_points.shape[0] < 6:
-            self.previous_scan_points = current_scan_points
+        # Primeiro ciclo: o scan vira o primeiro keyframe.
+        if len(self.keyframes) == 0:
+            self._reset_keyframes(current_scan_points)
             return (0.0, 0.0, 0.0)
 
         # Verifica se os scans são muito similares (robô não se moveu)
         # Calcula a diferença média entre os pontos
-        if self.previous_scan_points.shape[0] == current_scan_points.shape[0]:
+        if (self.previous_scan_points is not None and
+                self.previous_scan_points.shape[0] == current_scan_points.shape[0]):
             diff = np.linalg.norm(current_scan_points - self.previous_scan_points, axis=1)
             mean_diff = np.mean(diff)
             if mean_diff < 1.0:  # Menos de 1cm de diferença média
                 self.previous_scan_points = current_scan_points
                 return (0.0, 0.0, 0.0)
+        self.previous_scan_points = current_scan_points
 
-        # Prepara os dados no formato que a biblioteca `simpleicp` exige.
-        pc_fix = PointCloud(self.previous_scan_points, columns=["x", "y", "z"])
-        pc_mov = PointCloud(current_scan_points, columns=["x", "y", "z"])
-
-        # Executa o algoritmo de alinhamento com tratamento de erro.
-        # Redireciona stdout para suprimir logs verbosos do SimpleICP
-        try:
-            old_stdout = sys.stdout
-            sys.stdout = io.StringIO()  # Captura output do ICP
-            
-            self.icp_solver.add_point_clouds(pc_fix, pc_mov)
-            H, _, _, _ = self.icp_solver.run(
-                max_overlap_distance=25,   # Aumentado de 10 para 25 (mais tolerante)
-                max_iterations=30,         # Reduzido de 50 para 30 (mais rápido)
-                min_change=0.001           # Aumentado de 0.0001 para 0.001 (menos iterações desnecessárias)
-            )
-        except Exception as e:
-            print(f"[ICP ODOM] ERRO no matching: {e}. Retornando delta zero.", file=old_stdout)
-            self.previous_scan_points = current_scan_points
+        # Executa o alinhamento: leva os pontos atuais ao referencial da nuvem,
+        # partindo da pose atual composta com o delta dos encoders.
+        guess = _compose(self.pose, initial_guess or (0.0, 0.0, 0.0))
+        result = self.icp_solver.align(self.keyframes.points, current_scan_points, guess,
+                                       normals=self.keyframes.normals, nearest=self.keyframes.nearest)
+        self.last_result = result
+        if result.inlier_ratio == 0:
+            print("[ICP ODOM] ERRO no matching: nenhuma correspondência. Retornando delta zero.")
+            self._reset_keyframes(current_scan_points)
             return (0.0, 0.0, 0.0)
-        finally:
-            sys.stdout = old_stdout  # Restaura stdout
 
-        # Extrai os resultados da matriz de transformação homogênea 4x4.
-        dx = H[0, 3]  # Translação em X (tx)
-        dy = H[1, 3]  # Translação em Y (ty)
-        d_theta = math.atan2(H[1, 0], H[0, 0]) # Rotação em torno de Z
+        new_pose = (result.dx, result.dy, result.dtheta)
+        dx, dy, d_theta = _relative(self.pose, new_pose)
 
         # Filtro de sanidade: limita movimentos muito grandes que indicam erro de matching
         # Em um ciclo típico, o robô não deve se mover mais que 20cm ou girar mais que 30°
@@ -154,12 +159,71 @@ class LaserOdometry:
         if total_translation > max_translation or abs(d_theta) > max_rotation:
             print(f"[ICP ODOM] AVISO: Movimento anômalo detectado e filtrado "
                   f"(dx={dx:.2f}, dy={dy:.2f}, dθ={math.degrees(d_theta):.2f}°)")
-            # Retorna movimento zero quando detecta anomalia
-            self.previous_scan_points = current_scan_points
+            # Retorna movimento zero quando detecta anomalia e recomeça a nuvem
+            # a partir do scan atual
+            self._reset_keyframes(current_scan_points)
             return (0.0, 0.0, 0.0)
 
-        # Armazena o scan atual para ser o "scan anterior" no próximo ciclo.
-        self.previous_scan_points = current_scan_points
-
-        print(f"[ICP ODOM] Delta Calculado: (dx={dx:.2f}, dy={dy:.2f}, dθ={math.degrees(d_theta):.2f}°)")
-        return (dx, dy, d_theta)
\ No newline at end of file
+        self.pose = new_pose
+        kx, ky, ktheta = _relative(self.keyframes.last_pose, new_pose)
+        if math.hypot(kx, ky) >= self.KEYFRAME_DISTANCE_CM or abs(ktheta) >= self.KEYFRAME_ROTATION_RAD:
+            self.keyframes.add(current_scan_points, new_pose)
+
+        print(f"[ICP ODOM] Delta Calculado: (dx={dx:.2f}, dy={dy:.2f}, dθ={math.degrees(d_theta):.2f}°, "
+              f"rmse={result.rmse:.2f}cm, inliers={100 * result.inlier_ratio:.0f}%, "
+              f"keyframes={len(self.keyframes)})")
+        return (dx, dy, d_theta)
+
+    def _reset_keyframes(self, points: np.ndarray):
+        """Descarta a nuvem local e recomeça com `points` como único keyframe, na pose atual."""
+        self.keyframes.clear()
+        self.keyframes.add(points, self.pose)
+        self.previous_scan_points = points
+
+    def calculate_delta_to_map(self, scan: Scan | list[tuple[int, int]],
+                               odometry_delta: tuple[float, float, float],
+                               slam_pose_cm_rad: tuple[float, float, float], map_array: np.ndarray,
+                               mm_per_pixel: float, map_origin_cm: tuple[float, float] = (0.0, 0.0),
+                               max_range_cm: float = 300.0) -> tuple[float, float, float]:
+        """
+        Refina o delta de odometria GLOBAL (dx, dy, d_theta) casando o scan atual
+        com o mapa do SLAM (`CorrelativeScanMatcher`), em vez do scan anterior.
+
+        A pose prevista é a pose do SLAM antes da atualização mais o delta dos
+        encoders; o casamento busca a melhor pose numa janela em torno dela, e o
+        delta devolvido leva a pose do SLAM até a pose casada. Sem obstáculos no
+        mapa local ou com score baixo, devolve o delta dos encoders inalterado.
+
+        Args:
+            scan: `Scan` do ciclo (ou a lista (ângulo, distância) do sensor).
+            odometry_delta: Delta global (dx_cm, dy_cm, dtheta_rad) dos encoders.
+            slam_pose_cm_rad: Pose do SLAM antes da atualização, no referencial global.
+            map_array: Mapa do SLAM (ex: `SLAMManager.get_map_frame`).
+            mm_per_pixel: Resolução do mapa.
+            map_origin_cm: Posição global (x_cm, y_cm) do pixel (0, 0) do mapa.
+            max_range_cm: Leituras mais distantes são ignoradas.
+        """
+        scan = Scan.of(scan)
+        points_mm = scan.points_cm[scan.range_mask(5, max_range_cm)] * 10
+        origin_x_cm, origin_y_cm = map_origin_cm
+        slam_x_cm, slam_y_cm, slam_theta_rad = slam_pose_cm_rad
+        dx, dy, d_theta = odometry_delta
+        predicted = ((slam_x_cm + dx - origin_x_cm) * 10, (slam_y_cm + dy - origin_y_cm) * 10,
+                     slam_theta_rad + d_theta)
+
+        result = self.map_matcher.match(points_mm, map_array, mm_per_pixel, predicted)
+        self.last_map_match = result
+        if (result is None or result.score < self.MIN_MAP_MATCH_SCORE or
+                result.score < self.MIN_MAP_MATCH_GAIN * result.predicted_score):
+            score = (f"score {result.score:.2f}, prevista {result.predicted_score:.2f}"
+                     if result is not None else "sem mapa")
+            print(f"[MAP ODOM] Casamento descartado ({score}). Usando a odometria dos encoders.")
+            return odometry_delta
+
+        matched_dx = result.x_mm / 10 + origin_x_cm - slam_x_cm
+        matched_dy = result.y_mm / 10 + origin_y_cm - slam_y_cm
+        matched_dtheta = (result.theta_rad - slam_theta_rad + math.pi) % (2 * math.pi) - math.pi
+        print(f"[MAP ODOM] Delta casado com o mapa: (dx={matched_dx:.2f}, dy={matched_dy:.2f}, "
+              f"dθ={math.degrees(matched_dtheta):.2f}°, score={result.score:.2f}, "
+              f"{result.candidates} candidatos)")
+        return (matched_dx, matched_dy, matched_dtheta)
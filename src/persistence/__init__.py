@@ -0,0 +1,2 @@
+from .checkpoint_manager import CheckpointManager
+from .session_recorder import SessionRecorder, load_session
\ No newline at end of file
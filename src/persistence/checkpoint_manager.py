@@ -0,0 +1,150 @@
+"""
+Define a classe CheckpointManager, responsável por salvar e restaurar o
+"cérebro" completo do robô (mapa e pose do SLAM, pose do RobotState, memória
+do Navigator e contadores da missão).
+
+ARQUITETURA:
+O snapshot do estado é tirado no loop de controle (apenas cópias em memória,
+baratas), enquanto a compressão e a escrita em disco acontecem em uma thread
+em segundo plano. A escrita é atômica (arquivo temporário + `os.replace`),
+então um crash no meio da gravação nunca corrompe o último checkpoint válido.
+"""
+
+import json
+import os
+import threading
+import time
+import numpy as np
+
+CHECKPOINT_FORMAT_VERSION = 1
+
+
+class CheckpointManager:
+    """
+    Gerencia checkpoints periódicos e comprimidos do estado do Cérebro e a
+    retomada rápida (`--resume`) a partir do último checkpoint salvo.
+    """
+    def __init__(self, path: str, interval_cycles: int = 10):
+        """
+        Args:
+            path (str): Caminho do arquivo de checkpoint (.npz).
+            interval_cycles (int): Salva a cada N ciclos do loop de controle.
+        """
+        self.path = path
+        self.interval_cycles = max(1, interval_cycles)
+        self._writer = None
+
+    def maybe_save(self, cycle: int, slam_manager, robot_state, navigator, mission: dict):
+        """
+        Salva um checkpoint em segundo plano se o ciclo atual for múltiplo do
+        intervalo e nenhuma gravação anterior ainda estiver em andamento.
+        """
+        if cycle % self.interval_cycles != 0:
+            return
+        if self._writer is not None and self._writer.is_alive():
+            print("[CHECKPOINT] Gravação anterior ainda em andamento, pulando este ciclo.")
+            return
+        self.save(slam_manager, robot_state, navigator, mission)
+
+    def save(self, slam_manager, robot_state, navigator, mission: dict):
+        """
+        Tira o snapshot do estado (no thread atual) e o grava em disco em uma
+        thread em segundo plano.
+
+        Args:
+            mission (dict): Contadores da missão mantidos pelo loop principal
+                            (devem ser serializáveis em JSON).
+        """
+        navigator_state = navigator.get_memory_state()
+        arrays = {
+            'slam_map': slam_manager.get_map_array().copy(),
+            'visit_grid': navigator_state.pop('visit_grid'),
+        }
+        window_origin_px = None
+        if slam_manager.chunked_map is not None:
+            arrays['chunk_keys'], arrays['chunk_data'] = slam_manager.get_chunked_map().to_arrays()
+            window_origin_px = list(slam_manager.window_origin_px)
+        meta = {
+            'format_version': CHECKPOINT_FORMAT_VERSION,
+            'saved_at': time.time(),
+            'slam_pose_mm_deg': list(slam_manager.get_raw_pose_mm_deg()),
+            'slam_window_origin_px': window_origin_px,
+            'robot_pose_cm_rad': list(robot_state.get_pose_cm_rad()),
+            'navigator': navigator_state,
+            'mission': mission,
+        }
+        self._writer = threading.Thread(target=self._write, args=(arrays, meta),
+                                        name="checkpoint-writer", daemon=True)
+        self._writer.start()
+
+    def _write(self, arrays: dict, meta: dict):
+        """Comprime e grava o checkpoint de forma atômica."""
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "wb") as f:
+                np.savez_compressed(f, meta=np.array(json.dumps(meta)), **arrays)
+            os.replace(temp_path, self.path)
+            print(f"[CHECKPOINT] Estado salvo em '{self.path}'.")
+        except Exception as e:
+            print(f"[CHECKPOINT] Erro ao salvar checkpoint: {e}")
+
+    def wait(self, timeout: float = 5.0):
+        """Aguarda a conclusão da gravação em andamento (ex: ao encerrar)."""
+        if self._writer is not None:
+            self._writer.join(timeout)
+
+    def restore(self, slam_manager, robot_state, navigator, mission_keys: tuple[str, ...] = ()) -> dict:
+        """
+        Carrega o último checkpoint e restaura SLAM, pose e memória do navegador.
+
+        Todas as seções do checkpoint são validadas antes de qualquer
+        alteração: se uma delas for incompatível, nenhum componente é tocado
+        e o Cérebro pode seguir do zero com o estado intacto.
+
+        Args:
+            mission_keys: Contadores da missão que o chamador vai ler; a
+                ausência de algum deles também invalida o checkpoint.
+
+        Returns:
+            dict: Os contadores da missão salvos, para o loop principal.
+
+        Raises:
+            FileNotFoundError: Se não houver checkpoint salvo.
+            ValueError: Se o checkpoint for incompatível com a configuração atual.
+        """
+        inicio = time.perf_counter()
+        with np.load(self.path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('format_version') != CHECKPOINT_FORMAT_VERSION:
+                raise ValueError(f"Versão de checkpoint não suportada: {meta.get('format_version')}")
+            try:
+                slam_map = data['slam_map']
+                chunks = (data['chunk_keys'], data['chunk_data']) if 'chunk_keys' in data else None
+                navigator_state = dict(meta['navigator'], visit_grid=data['visit_grid'])
+                slam_pose = tuple(meta['slam_pose_mm_deg'])
+                # Ausente em checkpoints antigos: a janela é recentralizada na pose
+                window_origin_px = meta.get('slam_window_origin_px')
+                robot_pose = tuple(meta['robot_pose_cm_rad'])
+                mission = meta['mission']
+            except KeyError as e:
+                raise ValueError(f"Checkpoint incompleto: falta {e}") from None
+
+        # 1. Valida tudo...
+        slam_manager.check_restore(slam_map, slam_pose, chunks, window_origin_px)
+        if len(robot_pose) != 3:
+            raise ValueError(f"Pose do robô salva deveria ter 3 componentes, tem {len(robot_pose)}")
+        navigator.check_memory_state(navigator_state)
+        missing = set(mission_keys) - set(mission)
+        if missing:
+            raise ValueError(f"Contadores da missão ausentes no checkpoint: {sorted(missing)}")
+
+        # 2. ...e só então altera os componentes.
+        slam_manager.restore(slam_map, slam_pose, chunks, window_origin_px)
+        robot_state.update_pose(*robot_pose)
+        navigator.restore_memory_state(navigator_state)
+
+        idade_s = time.time() - meta['saved_at']
+        print(f"[CHECKPOINT] Estado restaurado em {(time.perf_counter() - inicio) * 1000:.0f}ms "
+              f"(checkpoint de {idade_s:.0f}s atrás).")
+        return mission
@@ -0,0 +1,63 @@
+"""
+Define a classe SessionRecorder, que grava as entradas do SLAM de uma sessão
+(scan e delta de odometria global de cada ciclo) para replays offline, como as
+varreduras de parâmetros de `src.mapping.param_sweep`.
+
+O formato é JSON Lines, uma linha por ciclo:
+    {"scan": [[angulo_graus, distancia_cm], ...], "odometry": [dx_cm, dy_cm, dtheta_rad]}
+Cada linha é gravada e descarregada no fim do ciclo, então uma sessão
+interrompida por um crash continua legível até o último ciclo completo.
+"""
+
+import json
+import os
+
+
+class SessionRecorder:
+    """Grava, ciclo a ciclo, exatamente o que o loop principal entrega ao `SLAMManager.update`."""
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Caminho do arquivo da sessão (.jsonl); é sobrescrito.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._file = open(path, 'w', encoding='utf-8')
+        self.cycles = 0
+
+    def record(self, scan_data_cm: list[tuple[int, int]], odometry_delta: tuple[float, float, float]):
+        """Acrescenta um ciclo à sessão."""
+        entry = {
+            'scan': [[int(angulo), int(dist_cm)] for angulo, dist_cm in scan_data_cm],
+            'odometry': [float(value) for value in odometry_delta],
+        }
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        self.cycles += 1
+
+    def close(self):
+        """Fecha o arquivo da sessão."""
+        if not self._file.closed:
+            self._file.close()
+
+
+def load_session(path: str) -> list[tuple[list[tuple[int, int]], tuple[float, float, float]]]:
+    """
+    Lê uma sessão gravada por `SessionRecorder` como lista de
+    (scan_data_cm, odometry_delta), pronta para `SLAMManager.update`. Uma
+    última linha truncada (crash durante a gravação) é ignorada.
+    """
+    cycles = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            scan = [(angulo, dist_cm) for angulo, dist_cm in entry['scan']]
+            cycles.append((scan, tuple(entry['odometry'])))
+    return cycles
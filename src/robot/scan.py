@@ -0,0 +1,88 @@
+"""
+Define a classe Scan, a representação compartilhada de uma varredura do sensor.
+
+O sensor entrega sempre as mesmas 19 leituras (servo de 0 a 180 graus, passo de
+10). Cada varredura é convertida uma única vez em arrays NumPy indexados pelo
+raio, e as tabelas de seno/cosseno dos ângulos fixos do servo são calculadas
+na importação do módulo. `Navigator`, `SLAMManager` e `LaserOdometry` consomem
+o mesmo objeto em vez de percorrer a lista (ângulo, distância) cada um.
+"""
+
+import math
+import numpy as np
+
+SCAN_STEP_DEG = 10
+SCAN_SIZE = 19  # Leituras por varredura (0 a 180 graus)
+
+# Ângulo do servo de cada raio (0-180) e ângulo matemático no referencial do
+# robô (-90 a +90 graus, 0 = frente).
+SERVO_ANGLES_DEG = np.arange(SCAN_SIZE) * SCAN_STEP_DEG
+BEAM_ANGLES_RAD = np.radians(SERVO_ANGLES_DEG - 90)
+BEAM_COS = np.cos(BEAM_ANGLES_RAD)
+BEAM_SIN = np.sin(BEAM_ANGLES_RAD)
+BEAM_UNIT = np.column_stack((BEAM_COS, BEAM_SIN))
+
+
+class Scan:
+    """
+    Uma varredura como arrays por raio: `ranges_cm` (0 = sem leitura) e os
+    pontos cartesianos `points_cm` (Nx2, referencial do robô), ambos
+    somente-leitura. `readings` guarda a lista original recebida do sensor.
+    """
+    __slots__ = ('readings', 'ranges_cm', 'received', 'points_cm')
+
+    def __init__(self, scan_data_cm: list[tuple[int, int]]):
+        """
+        Args:
+            scan_data_cm: Lista de (angulo_graus, distancia_cm) do sensor.
+                Leituras fora dos ângulos do servo são descartadas.
+        """
+        self.readings = scan_data_cm
+        self.ranges_cm = np.zeros(SCAN_SIZE)
+        self.received = np.zeros(SCAN_SIZE, dtype=bool)
+        if len(scan_data_cm):
+            data = np.asarray(scan_data_cm, dtype=np.int64).reshape(-1, 2)
+            indices = data[:, 0] // SCAN_STEP_DEG
+            inside = (indices >= 0) & (indices < SCAN_SIZE)
+            # Com ângulos repetidos, vale a última leitura
+            self.ranges_cm[indices[inside]] = data[inside, 1]
+            self.received[indices[inside]] = True
+        self.points_cm = self.ranges_cm[:, None] * BEAM_UNIT
+        for array in (self.ranges_cm, self.received, self.points_cm):
+            array.flags.writeable = False
+
+    @classmethod
+    def of(cls, scan) -> 'Scan':
+        """Aceita um `Scan` já construído ou uma lista (ângulo, distância)."""
+        return scan if isinstance(scan, cls) else cls(scan)
+
+    def __len__(self) -> int:
+        return int(self.received.sum())
+
+    def __bool__(self) -> bool:
+        return bool(self.received.any())
+
+    def range_mask(self, min_cm: float = 0, max_cm: float = np.inf) -> np.ndarray:
+        """Raios com leitura estritamente entre `min_cm` e `max_cm`."""
+        return self.received & (self.ranges_cm > min_cm) & (self.ranges_cm < max_cm)
+
+    def outlier_mask(self, mask: np.ndarray, min_points: int = 10, min_kept: int = 8) -> np.ndarray:
+        """
+        Restringe `mask` removendo leituras muito distantes da mediana das
+        distâncias (fora de max(3 desvios padrão, 2x a mediana)). Só filtra com
+        mais de `min_points` leituras e se sobrarem ao menos `min_kept`.
+        """
+        distances = self.ranges_cm[mask]
+        n = len(distances)
+        if n <= min_points:
+            return mask
+        # Mediana e desvio padrão à mão: np.median/np.std custam mais que o
+        # próprio cálculo em arrays de ~19 elementos
+        half = n // 2
+        ordered = np.partition(distances, (half - 1, half))
+        median = ordered[half] if n % 2 else (ordered[half - 1] + ordered[half]) / 2
+        centered = distances - distances.sum() / n
+        std = math.sqrt(centered @ centered / n)
+        max_dev = max(std * 3, median * 2.0)
+        keep = mask & (np.abs(self.ranges_cm - median) < max_dev)
+        return keep if keep.sum() >= min_kept else mask